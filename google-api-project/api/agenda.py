@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from django.utils import timezone
+from .models import AgendaEntry, CalendarEvent
+from .recurrence import cached_occurrences
+
+# これより長い単発イベントは spanning 行にする。通常の行は「開始日時が期間の開始 - この幅以降」だけを
+# インデックスの範囲走査で読むので、変更したら rebuild_agenda で作り直す
+AGENDA_MAX_SPAN = timedelta(days=1)
+REBUILD_BATCH_SIZE = 2000
+
+
+def _datetime(event, name):
+    # 文字列のまま save() されたインスタンスもあるのでフィールドで変換する
+    return CalendarEvent._meta.get_field(name).to_python(getattr(event, name))
+
+
+def entry_values(event):
+    """イベントから予定表の行に写す値"""
+    start_time = _datetime(event, "start_time")
+    end_time = _datetime(event, "end_time")
+    return {
+        "title": event.title,
+        "start_time": start_time,
+        "end_time": end_time,
+        "recurrence": event.recurrence,
+        "until": _datetime(event, "recurrence_end") if event.recurrence else end_time,
+        "spanning": bool(event.recurrence) or end_time - start_time > AGENDA_MAX_SPAN,
+    }
+
+
+def event_saved(event, created):
+    """作成者の行を upsert し、参加者の行を更新（作成時は参加者がまだ居ないので作成者の 1 文のみ）"""
+    values = entry_values(event)
+    if event.created_by_id:
+        AgendaEntry.objects.bulk_create(
+            [AgendaEntry(user_id=event.created_by_id, event_id=event.pk, is_owner=True, **values)],
+            update_conflicts=True,
+            unique_fields=["user", "event_id"],
+            update_fields=[*values, "is_owner", "updated_at"],
+        )
+    if not created:
+        AgendaEntry.objects.filter(event_id=event.pk, is_owner=False).update(
+            **values, updated_at=timezone.now()
+        )
+
+
+def participants_added(event_ids, user_ids):
+    links_added([(event_id, user_id) for event_id in event_ids for user_id in user_ids])
+
+
+def links_added(links):
+    """(event_id, user_id) の参加者の行を追加（作成者自身が参加者に加わっても作成者の行はそのまま）"""
+    users_by_event = defaultdict(list)
+    for event_id, user_id in links:
+        users_by_event[event_id].append(user_id)
+    if not users_by_event:
+        return
+    events = CalendarEvent.objects.filter(pk__in=users_by_event).only(
+        "id", "title", "start_time", "end_time", "recurrence", "recurrence_end"
+    )
+    AgendaEntry.objects.bulk_create(
+        [
+            AgendaEntry(user_id=user_id, event_id=event.pk, is_owner=False, **entry_values(event))
+            for event in events
+            for user_id in users_by_event[event.pk]
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def participants_removed(event_ids=None, user_ids=None):
+    """参加者の行を削除（None は全件。作成者の行は残す）"""
+    entries = AgendaEntry.objects.filter(is_owner=False)
+    if event_ids is not None:
+        entries = entries.filter(event_id__in=event_ids)
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+
+
+def links_removed(links):
+    """(event_id, user_id) の参加者の行を削除"""
+    links = list(links)
+    if links:
+        AgendaEntry.objects.filter(is_owner=False).filter(
+            reduce(or_, (Q(event_id=event_id, user_id=user_id) for event_id, user_id in links))
+        ).delete()
+
+
+def events_deleted(event_ids):
+    AgendaEntry.objects.filter(event_id__in=event_ids).delete()
+
+
+def agenda(user, window_start, window_end):
+    """期間内の発生を開始順に返す
+
+    通常の行と spanning 行をそれぞれ (user, start_time) の部分インデックスの範囲走査で読む
+    （O(log n + k)、イベント・参加者テーブルとは結合しない）。繰り返しは期間内だけ展開する。
+    """
+    entries = AgendaEntry.objects.filter(user=user).filter(
+        Q(
+            spanning=False,
+            start_time__gte=window_start - AGENDA_MAX_SPAN,
+            start_time__lt=window_end,
+            end_time__gt=window_start,
+        )
+        | Q(spanning=True, start_time__lt=window_end)
+        & (Q(until__isnull=True) | Q(until__gt=window_start))
+    )
+    occurrences = [
+        {
+            "id": entry.event_id,
+            "title": entry.title,
+            "start": start,
+            "end": end,
+            "recurring": bool(entry.recurrence),
+            "is_owner": entry.is_owner,
+        }
+        for entry in entries
+        for start, end in cached_occurrences(
+            entry.event_id,
+            entry.updated_at,
+            entry.start_time,
+            entry.end_time,
+            entry.recurrence,
+            window_start,
+            window_end,
+        )
+    ]
+    occurrences.sort(key=lambda occurrence: (occurrence["start"], occurrence["id"]))
+    return occurrences
+
+
+def rebuild(events=None, batch_size=REBUILD_BATCH_SIZE, entry_model=AgendaEntry):
+    """イベントから予定表の行を作り直す（シグナルを通らない一括投入の後や不整合の修復用）
+
+    マイグレーションからは履歴モデルの QuerySet と entry_model を渡す。
+    """
+    if events is None:
+        events = CalendarEvent.objects.all()
+    events = events.order_by("id").only(
+        "id", "title", "start_time", "end_time", "recurrence", "recurrence_end", "created_by_id"
+    )
+    through = events.model._meta.get_field("participants").remote_field.through
+    rebuilt = 0
+    batch = []
+    for event in events.iterator(chunk_size=batch_size):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            rebuilt += _rebuild_batch(batch, through, entry_model)
+            batch = []
+    if batch:
+        rebuilt += _rebuild_batch(batch, through, entry_model)
+    return rebuilt
+
+
+def _rebuild_batch(events, through, entry_model):
+    ids = [event.pk for event in events]
+    participants = through.objects.filter(calendarevent_id__in=ids).values_list("calendarevent_id", "user_id")
+    by_event = {}
+    for event_id, user_id in participants:
+        by_event.setdefault(event_id, set()).add(user_id)
+
+    entries = []
+    for event in events:
+        values = entry_values(event)
+        if event.created_by_id:
+            entries.append(entry_model(user_id=event.created_by_id, event_id=event.pk, is_owner=True, **values))
+        for user_id in by_event.get(event.pk, ()):
+            if user_id != event.created_by_id:
+                entries.append(entry_model(user_id=user_id, event_id=event.pk, is_owner=False, **values))
+    entry_model.objects.filter(event_id__in=ids).delete()
+    entry_model.objects.bulk_create(entries)
+    return len(entries)
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# 認証済みユーザーをキャッシュする秒数（変更時はシグナルで即時破棄）
+USER_CACHE_TIMEOUT = 60
+# ブラックリストに無いことを確認した jti をキャッシュする秒数（ブラックリスト入りは即時に上書き）
+BLACKLIST_NEGATIVE_TIMEOUT = 60 * 5
+BLACKLIST_WARM_CHUNK_SIZE = 1000
+
+
+def _user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _blacklist_cache_key(jti):
+    return f"jwt:blacklist:{jti}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(_user_cache_key(user_id))
+
+
+def mark_blacklisted(jti, expires_at):
+    """ブラックリスト入りしたトークンを有効期限までキャッシュに載せる"""
+    timeout = int((expires_at - timezone.now()).total_seconds())
+    if timeout > 0:
+        cache.set(_blacklist_cache_key(jti), 1, timeout)
+
+
+def is_blacklisted(jti):
+    """キャッシュにあれば DB を見ずに判定（キーが無ければ、追い出された場合も含めて DB で確認）
+
+    ブラックリストに無い結果も短時間キャッシュする。add なので、確認中にブラックリスト入りした
+    トークンの値（mark_blacklisted）を上書きしない。
+    """
+    key = _blacklist_cache_key(jti)
+    cached = cache.get(key)
+    if cached is not None:
+        return bool(cached)
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    if not blacklisted:
+        cache.add(key, 0, BLACKLIST_NEGATIVE_TIMEOUT)
+    return blacklisted
+
+
+def warm_blacklist_cache():
+    """有効期限内のブラックリストを全件キャッシュへ載せる（キャッシュの消去後も判定の DB 参照を減らす）"""
+    now = timezone.now()
+    rows = BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list(
+        "token__jti", "token__expires_at"
+    )
+    count = 0
+    for jti, expires_at in rows.iterator(chunk_size=BLACKLIST_WARM_CHUNK_SIZE):
+        mark_blacklisted(jti, expires_at)
+        count += 1
+    return count
+
+
+class CachedRefreshToken(RefreshToken):
+    """ブラックリスト判定をキャッシュ経由で行う RefreshToken"""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """User をキャッシュしてリクエスト毎の DB 取得を省く JWTAuthentication"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = _user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
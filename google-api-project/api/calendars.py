@@ -0,0 +1,200 @@
+from contextlib import closing
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Case, JSONField, Q, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+from . import agenda, notifications
+from .google_calendar import (
+    attendees_hash,
+    fetch_calendar_changes,
+    list_calendars,
+    normalize_attendees,
+    remote_matches,
+)
+from .models import CalendarEvent, GoogleCalendar, GoogleOAuthToken
+
+# 取り込んだ変更を照合する際に一度に引くイベント数
+DRIFT_CHUNK_SIZE = 500
+
+
+def refresh_calendar_list(user_id):
+    """calendarList を差分取得してキャッシュ（GoogleCalendar）を更新し、同期対象のカレンダーを返す
+
+    selected はこちらで切り替えられるよう、作成時にだけ Google 側の値を写す。
+    """
+    sync_token = (
+        GoogleOAuthToken.objects.filter(user_id=user_id)
+        .values_list("calendar_list_sync_token", flat=True)
+        .first()
+    )
+    items, next_sync_token, full = list_calendars(user_id, sync_token or None)
+    if items:
+        GoogleCalendar.objects.bulk_create(
+            [
+                GoogleCalendar(
+                    user_id=user_id,
+                    calendar_id=item["id"],
+                    summary=item.get("summaryOverride") or item.get("summary", ""),
+                    access_role=item.get("accessRole", ""),
+                    is_primary=item.get("primary", False),
+                    selected=item.get("selected", False),
+                    deleted=item.get("deleted", False),
+                )
+                for item in items
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "calendar_id"],
+            update_fields=["summary", "access_role", "is_primary", "deleted", "updated_at"],
+        )
+    if full:
+        # 全件取得で返らなかったカレンダーは購読解除済み
+        GoogleCalendar.objects.filter(user_id=user_id).exclude(
+            calendar_id__in=[item["id"] for item in items]
+        ).update(deleted=True)
+    GoogleOAuthToken.objects.filter(user_id=user_id).update(calendar_list_sync_token=next_sync_token)
+    return list(
+        GoogleCalendar.objects.filter(
+            user_id=user_id,
+            selected=True,
+            deleted=False,
+            access_role__in=GoogleCalendar.WRITABLE_ROLES,
+        )
+    )
+
+
+def pull_calendars(user_id, calendars):
+    """カレンダー毎に Google 側の変更を並列に取得し、食い違う行を pending に戻す → (件数, 失敗)
+
+    参加者（attendees）は Google 側の変更を取り込む。変更はページが届く毎に照合する。
+
+    sync_token はカレンダー毎に、最後のページまで照合してから保存するので、1 つのカレンダーの変更で
+    他は再走査しない。失敗したカレンダーは sync_token を進めず、次回に同じ差分を取り直す。
+    """
+    by_id = {calendar.calendar_id: calendar for calendar in calendars}
+    drifted, failed = 0, {}
+    changes = fetch_calendar_changes(
+        user_id,
+        [(calendar.calendar_id, calendar.sync_token) for calendar in calendars],
+        settings.GOOGLE_SYNC_CONCURRENCY,
+    )
+    with closing(changes):
+        for calendar_id, kind, value in changes:
+            calendar = by_id[calendar_id]
+            if kind == "page":
+                drifted += _apply_changes(user_id, calendar, value)
+            elif kind == "done":
+                GoogleCalendar.objects.filter(pk=calendar.pk).update(sync_token=value, synced_at=timezone.now())
+            else:
+                failed[calendar_id] = str(value)
+    return drifted, failed
+
+
+def _apply_changes(user_id, calendar, items):
+    in_calendar = Q(calendar=calendar)
+    if calendar.is_primary:
+        in_calendar |= Q(calendar__isnull=True)
+    drifted = 0
+    for i in range(0, len(items), DRIFT_CHUNK_SIZE):
+        remote = {item["id"]: item for item in items[i:i + DRIFT_CHUNK_SIZE]}
+        local_events = CalendarEvent.objects.filter(
+            in_calendar,
+            created_by_id=user_id,
+            google_event_id__in=list(remote),
+            sync_state=CalendarEvent.SYNC_SYNCED,
+        ).only(
+            "id",
+            "title",
+            "description",
+            "start_time",
+            "end_time",
+            "recurrence",
+            "google_event_id",
+            "attendees_hash",
+            "external_attendees",
+        )
+        local_events = list(local_events)
+        apply_attendees(user_id, local_events, remote)
+        drifted_ids = [
+            event.id
+            for event in local_events
+            if not remote_matches(event, remote[event.google_event_id])
+        ]
+        if drifted_ids:
+            CalendarEvent.objects.filter(pk__in=drifted_ids).update(
+                sync_state=CalendarEvent.SYNC_PENDING,
+                sync_error="Drifted from Google Calendar",
+            )
+            drifted += len(drifted_ids)
+    return drifted
+
+
+def apply_attendees(user_id, events, remote):
+    """Google 側の attendees を参加者へ反映（変わったイベントだけ。メールアドレスの解決も差分も一括）
+
+    remote は google_event_id -> Google のイベント。作成者と、ローカルに居ないメールアドレスは
+    参加者にしない。attendees_hash には反映後の参加者のハッシュを保存し、次の同期で送り返さない。
+    参加者にしなかったメールアドレスは external_attendees に控え、attendees を送る時に含めて消さない。
+    """
+    changed = {}
+    for event in events:
+        item = remote[event.google_event_id]
+        if item.get("status") == "cancelled":
+            continue
+        emails = normalize_attendees(attendee.get("email") for attendee in item.get("attendees", []))
+        if attendees_hash(emails) != event.attendees_hash or event.external_attendees:
+            changed[event.pk] = emails
+    if not changed:
+        return 0
+
+    # 同じメールアドレスのユーザーが複数居れば古い方
+    users = dict(
+        get_user_model().objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=set().union(*changed.values()))
+        .exclude(pk=user_id)
+        .order_by("-pk")
+        .values_list("email_lower", "pk")
+    )
+    local = {event_id: [email for email in emails if email in users] for event_id, emails in changed.items()}
+    external = {event_id: [email for email in emails if email not in users] for event_id, emails in changed.items()}
+    desired = {(event_id, users[email]) for event_id, emails in local.items() for email in emails}
+    through = CalendarEvent.participants.through
+    current = set(through.objects.filter(calendarevent_id__in=changed).values_list("calendarevent_id", "user_id"))
+    added, removed = desired - current, current - desired
+    if added:
+        through.objects.bulk_create(
+            [through(calendarevent_id=event_id, user_id=pk) for event_id, pk in added], ignore_conflicts=True
+        )
+        agenda.links_added(added)
+        notifications.links_changed(added, "added")
+    if removed:
+        through.objects.filter(
+            reduce(or_, (Q(calendarevent_id=event_id, user_id=pk) for event_id, pk in removed))
+        ).delete()
+        agenda.links_removed(removed)
+        notifications.links_changed(removed, "removed")
+
+    # 外部ゲストだけの違いなら書き込まない
+    stale = {
+        event.pk: attendees_hash(local[event.pk])
+        for event in events
+        if event.pk in local and attendees_hash(local[event.pk]) != event.attendees_hash
+    }
+    if stale:
+        CalendarEvent.objects.filter(pk__in=stale).update(
+            attendees_hash=Case(*[When(pk=pk, then=Value(value)) for pk, value in stale.items()])
+        )
+    guests = {
+        event.pk: external[event.pk]
+        for event in events
+        if event.pk in external and external[event.pk] != event.external_attendees
+    }
+    if guests:
+        CalendarEvent.objects.filter(pk__in=guests).update(
+            external_attendees=Case(
+                *[When(pk=pk, then=Value(value, output_field=JSONField())) for pk, value in guests.items()]
+            )
+        )
+    return len(added) + len(removed)
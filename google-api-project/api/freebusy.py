@@ -0,0 +1,68 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from .models import CalendarEvent
+from .recurrence import cached_occurrences
+
+# 1 リクエストで扱う上限（100 人 × 1 年を想定）
+FREEBUSY_MAX_USERS = 200
+FREEBUSY_MAX_RANGE = timedelta(days=366)
+
+
+def _sweep(sorted_intervals):
+    """開始時刻順の区間列を 1 回の走査で結合（重なり・隣接をまとめる）"""
+    merged = []
+    for start, end in sorted_intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def merge_intervals(intervals):
+    """[(start, end), ...] をソートして結合（O(n log n)）"""
+    return _sweep(sorted(intervals))
+
+
+def union_intervals(sorted_lists):
+    """ソート済み区間リスト群を k-way マージしてから結合（O(N log k)）"""
+    return _sweep(heapq.merge(*sorted_lists))
+
+
+def busy_intervals_by_user(user_ids, time_min, time_max):
+    """ユーザー毎の結合済み予定区間（作成イベントと参加イベントを 2 クエリで取得）
+
+    繰り返しイベントは期間内の発生だけを展開する。
+    """
+    user_ids = set(user_ids)
+    intervals = defaultdict(list)
+    window = CalendarEvent.objects.overlapping(time_min, time_max)
+    columns = ("id", "updated_at", "start_time", "end_time", "recurrence")
+
+    created = window.filter(created_by_id__in=user_ids).values_list("created_by_id", *columns)
+    participating = window.filter(participants__in=user_ids).values_list("participants", *columns)
+    for rows in (created, participating):
+        for user_id, event_id, updated_at, start, end, recurrence in rows.iterator():
+            if recurrence:
+                occurrences = cached_occurrences(
+                    event_id, updated_at, start, end, recurrence, time_min, time_max
+                )
+            else:
+                occurrences = ((start, end),)
+            # 検索範囲にクリップして保持
+            for occ_start, occ_end in occurrences:
+                intervals[user_id].append((max(occ_start, time_min), min(occ_end, time_max)))
+
+    return {user_id: merge_intervals(intervals.get(user_id, [])) for user_id in user_ids}
+
+
+def find_conflicts(user, start, end, exclude_id=None):
+    """作成者の排他イベントのうち [start, end) と重なるもの"""
+    conflicts = CalendarEvent.objects.overlapping(start, end).filter(
+        created_by=user, is_exclusive=True
+    )
+    if exclude_id is not None:
+        conflicts = conflicts.exclude(pk=exclude_id)
+    return conflicts
@@ -1,26 +1,73 @@
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google.auth.exceptions import RefreshError
-from google.auth.transport.requests import Request
-from .models import GoogleOAuthToken, CalendarEvent
+import base64
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from django.conf import settings
+from core.instrumentation import GOOGLE_API_SECONDS, google_call
+from core.tracing import span
+from .models import GoogleCalendar, GoogleOAuthToken, CalendarEvent
+from .recurrence import recurrence_lines
 
+# Google Calendar のバッチリクエストは 1 回あたり 50 件まで
+BATCH_SIZE = 50
+# freebusy.query 1 回で照会できるカレンダー数の上限
+FREEBUSY_CALENDARS_PER_QUERY = 50
+PRIMARY_CALENDAR = "primary"
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+REMOTE_EVENT_FIELDS = "items(id,status,summary,description,start,end,recurrence,attendees(email))"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# 証明書を取り直す最短間隔（秒）
+CERTS_REFRESH_INTERVAL = 60
+# url -> (期限, 取得時刻, レスポンス)
+_certs_cache = {}
+
+# google-api-python-client / google-auth は import が重いので、実際に Google へアクセスする関数の中で
+# import する（/api/auth/account/ だけを処理する Web ワーカーや管理コマンドは読み込まない）。
+# Celery ワーカーは preload() で fork 前に読み込んでおく。
+
+
+def preload():
+    """Google クライアントの import と discovery 文書の解析を済ませる（fork 前の親プロセス用）"""
+    from google.auth.transport.requests import Request  # noqa: F401
+    from google.oauth2 import id_token  # noqa: F401
+    from google.oauth2.credentials import Credentials  # noqa: F401
+    from googleapiclient.discovery import build_from_document  # noqa: F401
+
+    _discovery_document(settings.GOOGLE_API_ROOT_URL or None)
 
-def get_credentials(user, scopes):
-    """ユーザーのGoogle OAuthトークンからCredentialsを生成"""
-    try:
-        token = GoogleOAuthToken.objects.get(user=user)
-    except GoogleOAuthToken.DoesNotExist:
-        return None, {"success": False, "message": "No Google token found"}
 
-    creds = Credentials(
+def _credentials(token, scopes):
+    from google.oauth2.credentials import Credentials
+
+    root_url = settings.GOOGLE_API_ROOT_URL
+    return Credentials(
         token=token.access_token,
         refresh_token=token.refresh_token,
-        token_uri=token.token_uri,
+        token_uri=f"{root_url}token" if root_url else token.token_uri,
         client_id=token.client_id,
         client_secret=token.client_secret,
         scopes=scopes,
     )
 
+
+def get_credentials(user, scopes):
+    """ユーザー（User もしくは user_id）のGoogle OAuthトークンからCredentialsを生成"""
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+
+    try:
+        token = GoogleOAuthToken.objects.get(user=user)
+    except GoogleOAuthToken.DoesNotExist:
+        return None, {"success": False, "message": "No Google token found"}
+
+    creds = _credentials(token, scopes)
     if creds.expired and creds.refresh_token:
         try:
             creds.refresh(Request())
@@ -30,62 +77,582 @@ def get_credentials(user, scopes):
     return creds, None
 
 
+def refresh_access_token(token):
+    """GoogleOAuthToken の行のアクセストークンを期限に関わらず更新 → (Credentials, エラー)
+
+    保存は呼び出し側（まとめて書き込めるように）。
+    """
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+
+    if not token.refresh_token:
+        return None, {"success": False, "message": "No refresh token"}
+    creds = _credentials(token, CALENDAR_SCOPES)
+    try:
+        creds.refresh(Request())
+    except RefreshError:
+        return None, {"success": False, "message": "Failed to refresh token"}
+    return creds, None
+
+
+def verify_id_token(token, audience):
+    """Google の ID トークンを検証してペイロードを返す（不正なら ValueError）
+
+    公開鍵はプロセス内にキャッシュし、ログイン毎に証明書エンドポイントへアクセスしない。
+    """
+    from google.oauth2 import id_token
+
+    root_url = settings.GOOGLE_API_ROOT_URL
+    certs_url = f"{root_url}oauth2/v1/certs" if root_url else GOOGLE_CERTS_URL
+    request = _CertsCachingRequest()
+    try:
+        payload = id_token.verify_token(token, request, audience, certs_url=certs_url)
+    except ValueError as e:
+        # 鍵のローテーション直後は未知の kid になるので、取り直して 1 度だけ再検証する
+        if "key id" not in str(e) or not _expire_certs(certs_url):
+            raise
+        payload = id_token.verify_token(token, request, audience, certs_url=certs_url)
+    if payload.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError("Wrong issuer.")
+    return payload
+
+
+class _CertsCachingRequest:
+    """GET の結果を GOOGLE_CERTS_CACHE_SECONDS の間使い回す google-auth の Request"""
+
+    def __call__(self, url, method="GET", **kwargs):
+        from google.auth.transport.requests import Request
+
+        cached = _certs_cache.get(url)
+        if method == "GET" and cached and cached[0] > time.monotonic():
+            return cached[2]
+        response = Request()(url, method=method, **kwargs)
+        if method == "GET" and response.status == 200:
+            now = time.monotonic()
+            _certs_cache[url] = (now + settings.GOOGLE_CERTS_CACHE_SECONDS, now, response)
+        return response
+
+
+def _expire_certs(url):
+    """キャッシュした証明書を破棄（不正な kid による取り直しの連発を防ぐため間隔を空ける）"""
+    cached = _certs_cache.get(url)
+    if cached is None or time.monotonic() - cached[1] < CERTS_REFRESH_INTERVAL:
+        return False
+    _certs_cache.pop(url, None)
+    return True
+
+
+class SyncTokenExpired(Exception):
+    """syncToken が失効した（410）。全件取得からやり直す"""
+
+
 def _get_service(user):
     """Google API service を取得"""
-    creds, error = get_credentials(user, ["https://www.googleapis.com/auth/calendar"])
+    creds, error = get_credentials(user, CALENDAR_SCOPES)
     if error:
         raise Exception(error["message"])
-    return build("calendar", "v3", credentials=creds)
+    return _build_service(creds)
 
 
-def create_event(user, event: CalendarEvent):
-    try:
-        service = _get_service(user)
-        body = {
-            "summary": event.title,
+def _build_service(creds):
+    """service は HTTP 接続を持つのでスレッド毎に作る"""
+    from googleapiclient.discovery import build_from_document
+
+    # 同梱の discovery 文書は解析済みのものを使い回す（build() は呼び出し毎に JSON を読み直す）
+    document = _discovery_document(settings.GOOGLE_API_ROOT_URL or None)
+    return build_from_document(document, credentials=creds)
+
+
+@lru_cache(maxsize=4)
+def _discovery_document(root_url):
+    """root_url を指定するとバッチ含む全 URL の向き先を差し替える（fake_google 用）"""
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc("calendar", "v3"))
+    if root_url:
+        document["rootUrl"] = root_url
+        document["baseUrl"] = f"{root_url}{document['servicePath']}"
+    return document
+
+
+def event_snapshot(event: CalendarEvent):
+    """タスクに渡すイベントのコンパクトな写し（msgpack でそのまま送れる型のみ）"""
+    return event_snapshots([event])[0]
+
+
+def event_snapshots(events):
+    """複数イベントの写し（参加者のメールアドレスは全イベント分を 1 クエリで引く）"""
+    events = list(events)
+    emails = defaultdict(list)
+    # 未保存のイベントには参加者が居ない
+    saved = [event.pk for event in events if not event._state.adding]
+    if saved:
+        participants = CalendarEvent.participants.through.objects.filter(
+            calendarevent_id__in=saved
+        ).exclude(user__email="")
+        for event_id, email in participants.values_list("calendarevent_id", "user__email"):
+            emails[event_id].append(email)
+    return [
+        {
+            "id": event.id,
+            "title": event.title,
             "description": event.description,
-            "start": {"dateTime": event.start_time.isoformat()},
-            "end": {"dateTime": event.end_time.isoformat()},
+            "start": event.start_time.isoformat(),
+            "end": event.end_time.isoformat(),
+            "google_event_id": event.google_event_id,
+            "calendar": event.calendar_id,
+            "recurrence": recurrence_lines(event.recurrence),
+            "attendees": normalize_attendees(emails[event.pk]),
+            "attendees_hash": event.attendees_hash,
+            "guests": event.external_attendees,
+            "updated_at": event.updated_at.isoformat() if event.updated_at else None,
         }
-        created_event = service.events().insert(calendarId="primary", body=body).execute()
-        event.google_event_id = created_event["id"]
-        event.save(update_fields=["google_event_id"])
-        return {"success": True, "google_event_id": created_event["id"]}
+        for event in events
+    ]
+
+
+def normalize_attendees(emails):
+    """比較用に小文字化・重複排除・整列したメールアドレス"""
+    return sorted({email.strip().lower() for email in emails if email and email.strip()})
+
+
+def attendees_hash(emails):
+    """参加者一覧のハッシュ（空なら空文字。未同期の行の初期値と一致させる）"""
+    emails = normalize_attendees(emails)
+    if not emails:
+        return ""
+    return hashlib.sha256("\n".join(emails).encode()).hexdigest()
+
+
+def attendees_changed(snapshot):
+    """最後に Google へ反映した参加者から変わったか（古い形式のスナップショットは変更無し扱い）"""
+    return "attendees" in snapshot and attendees_hash(snapshot["attendees"]) != snapshot.get("attendees_hash", "")
+
+
+def _as_snapshot(event):
+    """CalendarEvent もしくはスナップショット dict をスナップショットに揃える"""
+    return event if isinstance(event, dict) else event_snapshot(event)
+
+
+def calendar_ids(pks):
+    """GoogleCalendar の pk を Google のカレンダーIDに解決（None は作成者の primary）"""
+    pks = set(pks) - {None}
+    resolved = {None: PRIMARY_CALENDAR}
+    if pks:
+        resolved.update(GoogleCalendar.objects.filter(pk__in=pks).values_list("pk", "calendar_id"))
+    return resolved
+
+
+def google_event_id_for(event_id):
+    """イベントIDから決定的な Google イベントIDを生成（base32hex の小文字のみ使用可）"""
+    seed = f"{settings.GOOGLE_EVENT_ID_NAMESPACE}:{event_id}".encode()
+    digest = base64.b32hexencode(hashlib.sha256(seed).digest()).decode()
+    return "ev" + digest.rstrip("=").lower()
+
+
+def _execute(request, method, user=None):
+    """Google API のリクエスト（バッチ含む）を実行し、メソッド別のレイテンシとスパンを記録"""
+    from googleapiclient.errors import HttpError
+
+    attributes = {"google.method": method}
+    if user is not None:
+        attributes["enduser.id"] = str(getattr(user, "pk", user))
+    outcome = "error"
+    started = time.perf_counter()
+    with google_call(), span(f"google.calendar.{method}", **attributes):
+        try:
+            response = request.execute()
+            outcome = "ok"
+            return response
+        except HttpError as e:
+            outcome = str(_http_status(e) or "error")
+            raise
+        finally:
+            GOOGLE_API_SECONDS.labels(method, outcome).observe(time.perf_counter() - started)
+
+
+def _http_status(exception):
+    from googleapiclient.errors import HttpError
+
+    return exception.resp.status if isinstance(exception, HttpError) else None
+
+
+def _event_body(snapshot):
+    """Google Calendar API へ送るリクエストボディ"""
+    body = {
+        "summary": snapshot["title"],
+        "description": snapshot["description"],
+        "start": {"dateTime": snapshot["start"]},
+        "end": {"dateTime": snapshot["end"]},
+    }
+    recurrence = snapshot.get("recurrence")
+    if recurrence:
+        # 繰り返しはローカル時刻で展開しているので Google 側にもタイムゾーンを渡す
+        body["recurrence"] = recurrence
+        body["start"]["timeZone"] = settings.TIME_ZONE
+        body["end"]["timeZone"] = settings.TIME_ZONE
+    return body
+
+
+def _attendees_body(snapshot):
+    """attendees は丸ごと置き換わるので、ローカルに居ない Google 側の参加者（guests）も含めて送る"""
+    emails = normalize_attendees([*snapshot.get("attendees", []), *snapshot.get("guests", [])])
+    return [{"email": email} for email in emails]
+
+
+def _insert_body(snapshot):
+    body = {"id": google_event_id_for(snapshot["id"]), **_event_body(snapshot)}
+    attendees = _attendees_body(snapshot)
+    if attendees:
+        body["attendees"] = attendees
+    return body
+
+
+def _patch_body(snapshot):
+    """events.patch のボディ（参加者は変わった時だけ送る。繰り返しは解除も反映されるよう常に送る）
+
+    ローカルに行がある限り Google 側にも残すので、Google 側で削除（cancelled）されていれば取り消す。
+    """
+    body = {"status": "confirmed", "recurrence": [], **_event_body(snapshot)}
+    if attendees_changed(snapshot):
+        body["attendees"] = _attendees_body(snapshot)
+    return body
+
+
+def _revive_body(snapshot):
+    """insert が 409 だった時の events.patch のボディ
+
+    前回の試行で作成済みの内容は古いかもしれず、Google 側で削除（cancelled）されている場合もあるので、
+    スナップショットの内容で上書きして削除も取り消す。
+    """
+    body = {"status": "confirmed", "recurrence": [], **_event_body(snapshot)}
+    body["attendees"] = _attendees_body(snapshot)
+    return body
+
+
+def create_event(user, event):
+    """event は CalendarEvent もしくは event_snapshot() の dict（google_event_id の保存は呼び出し側）"""
+    from googleapiclient.errors import HttpError
+
+    try:
+        snapshot = _as_snapshot(event)
+        service = _get_service(user)
+        calendar_id = calendar_ids([snapshot.get("calendar")])[snapshot.get("calendar")]
+        body = _insert_body(snapshot)
+        google_event_id = body["id"]
+        try:
+            _execute(service.events().insert(calendarId=calendar_id, body=body), "insert", user)
+        except HttpError as e:
+            # 409 は前回の試行で作成済み: 同じIDなので重複イベントは作られないが、内容は今回のもので上書きする
+            if _http_status(e) != 409:
+                raise
+            _execute(service.events().patch(
+                calendarId=calendar_id, eventId=google_event_id, body=_revive_body(snapshot)
+            ), "patch", user)
+        return {"success": True, "google_event_id": google_event_id}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-def update_event(user, event: CalendarEvent):
-    if not event.google_event_id:
+def update_event(user, event):
+    """event は CalendarEvent もしくは event_snapshot() の dict"""
+    google_event_id = event["google_event_id"] if isinstance(event, dict) else event.google_event_id
+    if not google_event_id:
         return {"success": False, "message": "No google_event_id to update"}
 
     try:
+        snapshot = _as_snapshot(event)
         service = _get_service(user)
-        body = {
-            "summary": event.title,
-            "description": event.description,
-            "start": {"dateTime": event.start_time.isoformat()},
-            "end": {"dateTime": event.end_time.isoformat()},
-        }
-        service.events().update(
-            calendarId="primary", eventId=event.google_event_id, body=body
-        ).execute()
+        _execute(service.events().patch(
+            calendarId=calendar_ids([snapshot.get("calendar")])[snapshot.get("calendar")],
+            eventId=google_event_id,
+            body=_patch_body(snapshot),
+        ), "patch", user)
         return {"success": True}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-def delete_event(user, event: CalendarEvent):
-    if not event.google_event_id:
-        return {"success": False, "message": "No google_event_id to delete"}
+def _chunked(items, size):
+    """リストを size 件ずつに分割"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def delete_events(user, google_event_ids, calendar=None):
+    """google_event_id をバッチリクエストでまとめて削除（既に存在しないものは削除済み扱い）
+
+    calendar は GoogleCalendar の pk（None なら primary）。
+    """
+    if not google_event_ids:
+        return {"success": True, "deleted": [], "failed": {}}
 
     try:
         service = _get_service(user)
-        service.events().delete(
-            calendarId="primary", eventId=event.google_event_id
-        ).execute()
-        event.google_event_id = None
-        event.save(update_fields=["google_event_id"])
-        return {"success": True}
+        calendar_id = calendar_ids([calendar])[calendar]
     except Exception as e:
-        return {"success": False, "message": str(e)}
+        return {"success": False, "message": str(e), "deleted": [], "failed": {}}
+
+    deleted, failed = [], {}
+
+    def callback(request_id, response, exception):
+        if exception is None or _http_status(exception) in (404, 410):
+            deleted.append(request_id)
+        else:
+            failed[request_id] = str(exception)
+
+    for chunk in _chunked(list(google_event_ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for google_event_id in chunk:
+            batch.add(
+                service.events().delete(calendarId=calendar_id, eventId=google_event_id),
+                request_id=google_event_id,
+            )
+        try:
+            _execute(batch, "delete.batch", user)
+        except Exception as e:
+            for google_event_id in chunk:
+                if google_event_id not in deleted:
+                    failed.setdefault(google_event_id, str(e))
+
+    return {"success": not failed, "deleted": deleted, "failed": failed}
+
+
+def sync_events(user, snapshots):
+    """スナップショットをバッチリクエストでまとめて作成・更新し、イベントID毎の結果を返す
+
+    同期先のカレンダーが異なる要求も同じバッチに載せる（カレンダー毎に往復しない）。
+    """
+    results = {}
+    try:
+        service = _get_service(user)
+        calendars = calendar_ids(snapshot.get("calendar") for snapshot in snapshots)
+    except Exception as e:
+        return {snapshot["id"]: {"success": False, "message": str(e)} for snapshot in snapshots}
+
+    by_id = {snapshot["id"]: snapshot for snapshot in snapshots}
+    inserted = {}
+    conflicted = []
+
+    def callback(request_id, response, exception):
+        event_id = int(request_id)
+        if exception is None:
+            results[event_id] = {"success": True, "google_event_id": response["id"]}
+        elif inserted.pop(event_id, None) and _http_status(exception) == 409:
+            # 前回の試行で作成済み: 後続のバッチで今回の内容に上書きする（削除されていれば取り消す）
+            conflicted.append(by_id[event_id])
+        else:
+            results[event_id] = {"success": False, "message": str(exception)}
+
+    def request_for(events, snapshot, revive):
+        calendar_id = calendars.get(snapshot.get("calendar"), PRIMARY_CALENDAR)
+        if revive:
+            return events.patch(
+                calendarId=calendar_id,
+                eventId=google_event_id_for(snapshot["id"]),
+                body=_revive_body(snapshot),
+            )
+        if snapshot["google_event_id"]:
+            return events.patch(
+                calendarId=calendar_id,
+                eventId=snapshot["google_event_id"],
+                body=_patch_body(snapshot),
+            )
+        body = _insert_body(snapshot)
+        inserted[snapshot["id"]] = body["id"]
+        return events.insert(calendarId=calendar_id, body=body)
+
+    def run(snapshots, revive=False):
+        for chunk in _chunked(snapshots, BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for snapshot in chunk:
+                batch.add(request_for(service.events(), snapshot, revive), request_id=str(snapshot["id"]))
+            try:
+                _execute(batch, "sync.batch", user)
+            except Exception as e:
+                for snapshot in chunk:
+                    results.setdefault(snapshot["id"], {"success": False, "message": str(e)})
+
+    run(list(snapshots))
+    if conflicted:
+        run(list(conflicted), revive=True)
+
+    return results
+
+
+def _list_pages(list_method, method, user, params, on_page):
+    """ページを辿って届いた順に on_page へ渡し、nextSyncToken を返す（syncToken が失効していれば SyncTokenExpired）"""
+    from googleapiclient.errors import HttpError
+
+    page_token = None
+    while True:
+        try:
+            response = _execute(list_method(pageToken=page_token, **params), method, user)
+        except HttpError as e:
+            if params.get("syncToken") and _http_status(e) == 410:
+                raise SyncTokenExpired() from e
+            raise
+        on_page(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return response.get("nextSyncToken", "")
+
+
+def _list_all(list_method, method, user, params):
+    """ページを辿って全件と nextSyncToken を返す（件数の少ない calendarList 用）"""
+    items = []
+    next_sync_token = _list_pages(list_method, method, user, params, items.extend)
+    return items, next_sync_token
+
+
+def list_calendars(user, sync_token=None):
+    """calendarList を差分（sync_token が無ければ全件）で取得 → (items, next_sync_token, 全件か)
+
+    差分では購読解除されたカレンダーが deleted: true で返る。
+    """
+    service = _get_service(user)
+    params = {
+        "showDeleted": True,
+        "fields": "nextPageToken,nextSyncToken,items(id,summary,summaryOverride,accessRole,primary,selected,deleted)",
+    }
+    if sync_token:
+        try:
+            return (*_list_all(service.calendarList().list, "calendarList.list", user,
+                               {**params, "syncToken": sync_token}), False)
+        except SyncTokenExpired:
+            pass
+    return (*_list_all(service.calendarList().list, "calendarList.list", user, params), True)
+
+
+def fetch_calendar_changes(user, calendars, max_workers, page_size=250):
+    """カレンダー毎の変更を並列に取得し、届いたページから順に (calendar_id, 種類, 値) を返すジェネレーター
+
+    種類は "page"（値はそのページのイベント）、"done"（値は nextSyncToken。そのカレンダーの最後）、
+    "error"（値は例外）。calendars は (calendar_id, sync_token) の組。スレッドでは HTTP だけを行い DB には触れない。
+    取得済みのページは呼び出し側が読むまで数ページ分しか溜めないので、全件をメモリに載せない。
+    sync_token が失効したカレンダーだけ全件を取り直すので、他のカレンダーは再走査しない。
+    """
+    calendars = list(calendars)
+    if not calendars:
+        return
+    creds, error = get_credentials(user, CALENDAR_SCOPES)
+    if error:
+        raise Exception(error["message"])
+
+    workers = max(1, min(max_workers, len(calendars)))
+    pages = queue.Queue(maxsize=workers * 2)
+    stopped = threading.Event()
+
+    def put(message):
+        # 呼び出し側が読むのをやめたら取得も打ち切る
+        while not stopped.is_set():
+            try:
+                pages.put(message, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise CancelledError()
+
+    def fetch(calendar_id, sync_token):
+        def on_page(items):
+            put((calendar_id, "page", items))
+
+        try:
+            service = _build_service(creds)
+            params = {
+                "calendarId": calendar_id,
+                "maxResults": page_size,
+                "showDeleted": True,
+                "fields": f"nextPageToken,nextSyncToken,{REMOTE_EVENT_FIELDS}",
+            }
+            next_sync_token = None
+            if sync_token:
+                try:
+                    next_sync_token = _list_pages(
+                        service.events().list, "list", user, {**params, "syncToken": sync_token}, on_page
+                    )
+                except SyncTokenExpired:
+                    pass
+            if next_sync_token is None:
+                next_sync_token = _list_pages(service.events().list, "list", user, params, on_page)
+            put((calendar_id, "done", next_sync_token))
+        except CancelledError:
+            pass
+        except Exception as e:
+            try:
+                put((calendar_id, "error", e))
+            except CancelledError:
+                pass
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for calendar_id, sync_token in calendars:
+            pool.submit(fetch, calendar_id, sync_token)
+        remaining = len(calendars)
+        while remaining:
+            message = pages.get()
+            if message[1] != "page":
+                remaining -= 1
+            yield message
+    finally:
+        stopped.set()
+        pool.shutdown(wait=True)
+
+
+def remote_matches(event: CalendarEvent, item):
+    """ローカルの行と Google 側のイベントが一致しているか"""
+    if item.get("status") == "cancelled":
+        return False
+    try:
+        start = datetime.fromisoformat(item["start"]["dateTime"])
+        end = datetime.fromisoformat(item["end"]["dateTime"])
+    except (KeyError, ValueError):
+        return False
+    return (
+        item.get("summary", "") == event.title
+        and (item.get("description") or "") == (event.description or "")
+        and start == event.start_time
+        and end == event.end_time
+        and item.get("recurrence", []) == recurrence_lines(event.recurrence)
+    )
+
+
+def query_freebusy(user, emails, time_min, time_max):
+    """参加者の Google 側 busy 区間をまとめて取得（50 件毎の freebusy.query を 1 回のバッチで送信）
+
+    (メールアドレス毎の busy 区間, 取得できなかったメールアドレス毎のエラー) を返す。
+    """
+    busy, errors = {}, {}
+    emails = list(emails)
+    if not emails:
+        return busy, errors
+    service = _get_service(user)
+    chunks = list(_chunked(emails, FREEBUSY_CALENDARS_PER_QUERY))
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors.update((email, str(exception)) for email in chunks[int(request_id)])
+            return
+        for email, calendar in response.get("calendars", {}).items():
+            if calendar.get("errors"):
+                errors[email] = ", ".join(error.get("reason", "unknown") for error in calendar["errors"])
+                continue
+            busy[email] = [
+                (datetime.fromisoformat(period["start"]), datetime.fromisoformat(period["end"]))
+                for period in calendar.get("busy", [])
+            ]
+
+    batch = service.new_batch_http_request(callback=callback)
+    for i, chunk in enumerate(chunks):
+        body = {
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "items": [{"id": email} for email in chunk],
+        }
+        batch.add(service.freebusy().query(body=body), request_id=str(i))
+    _execute(batch, "freebusy.batch", user)
+    # 応答に含まれなかったカレンダーも取得できなかった扱い
+    for email in emails:
+        if email not in busy:
+            errors.setdefault(email, "missing from response")
+    return busy, errors
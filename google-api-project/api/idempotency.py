@@ -0,0 +1,76 @@
+import hashlib
+import json
+from django.core.cache import cache
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# 完了したレスポンスを再送用に保持する期間（秒）
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+# 処理中の予約を保持する期間（秒）: ワーカーが落ちても永久にロックしない
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+def _fingerprint(data):
+    """リクエストボディのハッシュ（同じキーで別内容が送られたことを検出する）"""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """Idempotency-Key ヘッダー付きの create を一度だけ実行し、再送には同じレスポンスを返す"""
+
+    def _idempotency_cache_key(self, request, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"idempotency:{self.basename}:{request.user.pk}:{digest}"
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key is too long"}, status=400)
+
+        cache_key = self._idempotency_cache_key(request, key)
+        fingerprint = _fingerprint(request.data)
+        reserved = {"fingerprint": fingerprint, "status": None}
+
+        if not cache.add(cache_key, reserved, IDEMPOTENCY_LOCK_TIMEOUT):
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return self._replay(cached, fingerprint)
+            # 予約が直前に失効した場合はもう一度だけ取り直す
+            if not cache.add(cache_key, reserved, IDEMPOTENCY_LOCK_TIMEOUT):
+                return Response({"error": "Request with this Idempotency-Key is in progress"}, status=409)
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(
+                cache_key,
+                {
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "data": response.data,
+                    "headers": {k: v for k, v in response.items() if k == "Location"},
+                },
+                IDEMPOTENCY_TIMEOUT,
+            )
+        return response
+
+    def _replay(self, cached, fingerprint):
+        if cached["fingerprint"] != fingerprint:
+            return Response(
+                {"error": "Idempotency-Key was already used with a different request body"},
+                status=422,
+            )
+        if cached["status"] is None:
+            return Response({"error": "Request with this Idempotency-Key is in progress"}, status=409)
+        response = Response(cached["data"], status=cached["status"], headers=cached["headers"])
+        response["Idempotent-Replayed"] = "true"
+        return response
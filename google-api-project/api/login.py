@@ -0,0 +1,186 @@
+import hashlib
+import json
+import logging
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .authentication import CachedRefreshToken
+from .models import GoogleOAuthToken
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# 保存済みの Google トークンのハッシュ（同じ値なら書き込まない。変更時はシグナルで破棄）
+TOKEN_DIGEST_TIMEOUT = 60 * 60 * 24
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+# ログイン時の OutstandingToken を溜める Redis のリストと、書き込み中のタスクのロック
+OUTSTANDING_TOKEN_KEY = "login:outstanding-tokens"
+OUTSTANDING_TOKEN_LOCK_KEY = "login:outstanding-tokens:lock"
+OUTSTANDING_TOKEN_LOCK_TIMEOUT = 60
+
+
+def _token_digest_key(user_id):
+    return f"login:google-token:{user_id}"
+
+
+def invalidate_token_digest(user_id):
+    cache.delete(_token_digest_key(user_id))
+
+
+def get_or_create_login_user(email):
+    """ログインユーザーを取得（既存なら SELECT 1 回のみ）
+
+    初回は INSERT ... ON CONFLICT DO NOTHING で作成するので、同じユーザーの同時初回ログインでも
+    IntegrityError にならない。
+    """
+    try:
+        return User.objects.get(username=email)
+    except User.DoesNotExist:
+        pass
+    User.objects.bulk_create([User(username=email, email=email)], ignore_conflicts=True)
+    return User.objects.get(username=email)
+
+
+def save_google_token(user, access_token, refresh_token, expires_in, client_id, client_secret):
+    """Google トークンを 1 文の upsert（INSERT ... ON CONFLICT (user_id) DO UPDATE）で保存
+
+    前回保存した値と同じなら書き込まない。書き込んだら True。
+    """
+    values = {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "expires_in": expires_in or GoogleOAuthToken._meta.get_field("expires_in").default,
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "token_uri": GOOGLE_TOKEN_URI,
+    }
+    digest = hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+    key = _token_digest_key(user.pk)
+    if cache.get(key) == digest:
+        return False
+    GoogleOAuthToken.objects.bulk_create(
+        [GoogleOAuthToken(user=user, **values)],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=[*values, "updated_at"],
+    )
+    cache.set(key, digest, TOKEN_DIGEST_TIMEOUT)
+    return True
+
+
+def write_outstanding_tokens(rows):
+    """OutstandingToken をまとめて INSERT（blacklist() で作成済みの jti は無視するので再実行してよい）
+
+    rows は [user_id, jti, token, created_at(epoch), expires_at(epoch)] のリスト。
+    """
+    # 書き込みまでに削除されたユーザーは NULL にする（1 行の FK 違反でバッチ全体が失敗しないように）
+    user_ids = set(User.objects.filter(pk__in={row[0] for row in rows}).values_list("pk", flat=True))
+    OutstandingToken.objects.bulk_create(
+        [
+            OutstandingToken(
+                user_id=user_id if user_id in user_ids else None,
+                jti=jti,
+                token=token,
+                created_at=datetime_from_epoch(created_at),
+                expires_at=datetime_from_epoch(expires_at),
+            )
+            for user_id, jti, token, created_at, expires_at in rows
+        ],
+        ignore_conflicts=True,
+    )
+    return len(rows)
+
+
+class OutstandingTokenBuffer:
+    """OutstandingToken の行を Redis のリストに溜め、タスクがまとめて書き込む
+
+    プロセス内には持たないので、ワーカーの再起動や強制終了でも行は失われない。
+    行は blacklist() 時にも get_or_create されるので、書き込みが遅れてもログアウトには影響しない。
+    """
+
+    def __init__(self):
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                settings.OUTSTANDING_TOKEN_REDIS_URL, socket_connect_timeout=1, socket_timeout=1
+            )
+        return self._client
+
+    def add(self, row):
+        """行をリストに追加し、バッチ分溜まったら書き込みタスクを投入（Redis に届かなければその場で INSERT）"""
+        try:
+            size = self._get_client().rpush(OUTSTANDING_TOKEN_KEY, json.dumps(row))
+        except redis.RedisError:
+            logger.warning("Outstanding token buffer unavailable, writing synchronously", exc_info=True)
+            write_outstanding_tokens([row])
+            return
+        if size % settings.OUTSTANDING_TOKEN_BATCH_SIZE == 0:
+            self._kick()
+
+    def _kick(self):
+        from .tasks import drain_outstanding_tokens
+
+        try:
+            drain_outstanding_tokens.delay()
+        except Exception:
+            # 投入できなくても行はリストに残り、定期実行のタスクが書き込む
+            logger.warning("Failed to enqueue drain_outstanding_tokens", exc_info=True)
+
+    def drain(self):
+        """溜まった行をバッチ毎に書き込み、書き込めた分だけリストから消す（失敗した分は次の実行で書き直す）"""
+        client = self._get_client()
+        if not client.set(OUTSTANDING_TOKEN_LOCK_KEY, 1, nx=True, ex=OUTSTANDING_TOKEN_LOCK_TIMEOUT):
+            return 0
+        written = 0
+        try:
+            while rows := client.lrange(OUTSTANDING_TOKEN_KEY, 0, settings.OUTSTANDING_TOKEN_BATCH_SIZE - 1):
+                written += write_outstanding_tokens([json.loads(row) for row in rows])
+                client.ltrim(OUTSTANDING_TOKEN_KEY, len(rows), -1)
+                # 他のワーカーが同じ行を取り出して消さないよう、続く間はロックを延長する
+                client.expire(OUTSTANDING_TOKEN_LOCK_KEY, OUTSTANDING_TOKEN_LOCK_TIMEOUT)
+        finally:
+            client.delete(OUTSTANDING_TOKEN_LOCK_KEY)
+        return written
+
+
+outstanding_tokens = OutstandingTokenBuffer()
+
+
+class LoginRefreshToken(CachedRefreshToken):
+    """OutstandingToken の INSERT をリクエスト内で行わない RefreshToken"""
+
+    @classmethod
+    def for_user(cls, user):
+        if settings.OUTSTANDING_TOKEN_BATCH_SIZE <= 1:
+            return super().for_user(user)
+        # BlacklistMixin.for_user（同期 INSERT）を飛ばして Token.for_user を呼ぶ
+        token = Token.for_user.__func__(cls, user)
+        outstanding_tokens.add([
+            user.pk,
+            token[api_settings.JTI_CLAIM],
+            str(token),
+            token.current_time.timestamp(),
+            token["exp"],
+        ])
+        return token
+
+
+def issue_tokens(user):
+    """ログイン API のレスポンス（JWT とユーザー情報）"""
+    refresh = LoginRefreshToken.for_user(user)
+    return {
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+        },
+    }
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from api.partitions import (
+    ARCHIVE_SCHEMA,
+    add_months,
+    archive_partitions,
+    is_partitioned,
+    month_floor,
+)
+
+
+class Command(BaseCommand):
+    help = "古い CalendarEvent の月パーティションを切り離してアーカイブ用スキーマへ移す（--drop で削除）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            default=settings.EVENT_ARCHIVE_AFTER_MONTHS,
+            help="今月を含めて残す月数（それより前の月をアーカイブ）",
+        )
+        parser.add_argument("--schema", default=ARCHIVE_SCHEMA, help="移動先のスキーマ")
+        parser.add_argument("--tablespace", default=None, help="移動先の表領域（低速ストレージ等）")
+        parser.add_argument("--drop", action="store_true", help="移動せずに削除する")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if not is_partitioned(connection):
+            raise CommandError("CalendarEvent はパーティション化されていません。")
+        if options["keep_months"] < 1:
+            raise CommandError("--keep-months は 1 以上を指定してください。")
+
+        before = add_months(month_floor(timezone.now()), 1 - options["keep_months"])
+        archived, kept = archive_partitions(
+            connection,
+            before,
+            schema=options["schema"],
+            tablespace=options["tablespace"],
+            drop=options["drop"],
+        )
+        for name in archived:
+            self.stdout.write(f"{'削除' if options['drop'] else 'アーカイブ'}: {name}")
+        for name in kept:
+            self.stdout.write(f"継続中の繰り返しイベントを含むため残しました: {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(archived)} 個のパーティションを処理しました。"))
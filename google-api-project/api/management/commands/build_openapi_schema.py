@@ -0,0 +1,23 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.schema import generate_schema, schema_version, write_schema
+
+
+class Command(BaseCommand):
+    help = "OpenAPI スキーマを生成して OPENAPI_SCHEMA_PATH に書き出す（稼働中のプロセスは次のリクエストで読み直す）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="書き出し先（省略時は OPENAPI_SCHEMA_PATH）")
+        parser.add_argument("--check", action="store_true", help="書き出さず、既存のファイルが最新か確認する")
+
+    def handle(self, *args, **options):
+        path = Path(options["output"] or settings.OPENAPI_SCHEMA_PATH)
+        if options["check"]:
+            current = path.read_bytes() if path.exists() else b""
+            if current != generate_schema():
+                raise CommandError(f"{path} が古くなっています。build_openapi_schema で作り直してください。")
+            self.stdout.write(self.style.SUCCESS(f"{path} は最新です（version {schema_version(current)}）。"))
+            return
+        version = write_schema(path)
+        self.stdout.write(self.style.SUCCESS(f"{path} に OpenAPI スキーマを書き出しました（version {version}）。"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from api.partitions import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = "CalendarEvent の月パーティションを先の月まで作成する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--ahead", type=int, default=None, help="先行して作成する月数")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if not is_partitioned(connection):
+            raise CommandError("CalendarEvent はパーティション化されていません。")
+
+        created = ensure_partitions(connection, ahead=options["ahead"])
+        for name in created:
+            self.stdout.write(f"作成: {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} 個のパーティションを作成しました。"))
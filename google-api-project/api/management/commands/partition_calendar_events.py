@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from api.partitions import UNPARTITIONED_TABLE, convert_to_partitioned, is_partitioned
+
+
+class Command(BaseCommand):
+    help = "CalendarEvent テーブルを start_time の月単位のパーティションテーブルへ移行する（PostgreSQL のみ）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--ahead", type=int, default=None, help="先行して作成する月数")
+        parser.add_argument(
+            "--drop-old",
+            action="store_true",
+            help=f"移行後に旧テーブル（{UNPARTITIONED_TABLE}）を削除する",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            raise CommandError("パーティション化は PostgreSQL でのみ利用できます。")
+        if is_partitioned(connection):
+            self.stdout.write("既にパーティション化されています。")
+            return
+
+        result = convert_to_partitioned(
+            connection, ahead=options["ahead"], drop_old=options["drop_old"]
+        )
+        for warning in result["warnings"]:
+            self.stderr.write(warning)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} 件を {result['partitions']} 個の月パーティションへ移行しました。"
+        ))
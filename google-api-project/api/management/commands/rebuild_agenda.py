@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from api.agenda import REBUILD_BATCH_SIZE, rebuild
+from api.models import AgendaEntry, CalendarEvent
+
+
+class Command(BaseCommand):
+    help = "CalendarEvent からユーザー毎の予定表（AgendaEntry）を作り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="対象ユーザーID（複数指定可、省略時は全件）")
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        events = CalendarEvent.objects.all()
+        entries = AgendaEntry.objects.all()
+        if options["user"]:
+            users = options["user"]
+            events = events.filter(Q(created_by__in=users) | Q(participants__in=users)).distinct()
+            entries = entries.filter(user__in=users)
+        rebuilt = rebuild(events, batch_size=options["batch_size"])
+        # 削除済みのイベントや、参加者から外れたイベントの行を消す
+        orphaned, _ = entries.exclude(event_id__in=events.values("id")).delete()
+        self.stdout.write(self.style.SUCCESS(f"{rebuilt} 件の予定表の行を作成し、{orphaned} 件を削除しました。"))
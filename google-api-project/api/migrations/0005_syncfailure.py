@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_alter_googleoauthtoken_id_token"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncFailure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("create", "作成"),
+                            ("update", "更新"),
+                            ("delete", "削除"),
+                        ],
+                        help_text="同期操作",
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "user_id",
+                    models.BigIntegerField(db_index=True, help_text="対象ユーザーID"),
+                ),
+                (
+                    "event_id",
+                    models.BigIntegerField(
+                        blank=True, db_index=True, help_text="対象イベントID", null=True
+                    ),
+                ),
+                (
+                    "google_event_id",
+                    models.CharField(
+                        blank=True,
+                        help_text="Google Calendar 側のイベントID",
+                        max_length=255,
+                        null=True,
+                    ),
+                ),
+                ("message", models.TextField(help_text="エラー内容")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, help_text="記録日時"),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["operation", "created_at"],
+                        name="api_syncfai_operati_38d107_idx",
+                    )
+                ],
+            },
+        ),
+    ]
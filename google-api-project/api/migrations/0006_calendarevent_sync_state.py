@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+def mark_existing_as_synced(apps, schema_editor):
+    """既に google_event_id を持つ既存行は同期済みとみなす"""
+    CalendarEvent = apps.get_model("api", "CalendarEvent")
+    CalendarEvent.objects.exclude(google_event_id=None).update(sync_state="synced")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_syncfailure"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calendarevent",
+            name="sync_state",
+            field=models.CharField(
+                choices=[
+                    ("pending", "同期待ち"),
+                    ("synced", "同期済み"),
+                    ("failed", "同期失敗"),
+                ],
+                default="pending",
+                help_text="Google Calendar との同期状態",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="sync_attempts",
+            field=models.PositiveIntegerField(default=0, help_text="連続した同期失敗回数"),
+        ),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="sync_error",
+            field=models.TextField(blank=True, default="", help_text="直近の同期エラー"),
+        ),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="last_synced_at",
+            field=models.DateTimeField(blank=True, help_text="最終同期日時", null=True),
+        ),
+        migrations.AddIndex(
+            model_name="calendarevent",
+            index=models.Index(
+                condition=models.Q(("sync_state", "synced"), _negated=True),
+                fields=["updated_at"],
+                name="api_event_unsynced_idx",
+            ),
+        ),
+        migrations.RunPython(mark_existing_as_synced, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:05
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+# 空き時間検索用の GiST インデックスと、排他イベントの重複を禁止する排他制約。
+# SQLite では作成しない（アプリ側の検証のみ）。
+RANGE_INDEX = "api_event_owner_range_gist"
+EXCLUSIVE_CONSTRAINT = "api_event_no_exclusive_overlap"
+
+
+def create_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {RANGE_INDEX} ON api_calendarevent "
+        "USING gist (created_by_id, tstzrange(start_time, end_time))"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE api_calendarevent ADD CONSTRAINT {EXCLUSIVE_CONSTRAINT} "
+        "EXCLUDE USING gist (created_by_id WITH =, tstzrange(start_time, end_time) WITH &&) "
+        "WHERE (is_exclusive)"
+    )
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE api_calendarevent DROP CONSTRAINT IF EXISTS {EXCLUSIVE_CONSTRAINT}"
+    )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {RANGE_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY はトランザクション外で実行する必要がある
+    atomic = False
+
+    dependencies = [
+        ("api", "0006_calendarevent_sync_state"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="is_exclusive",
+            field=models.BooleanField(
+                default=False,
+                help_text="作成者の他の排他イベントとの時間の重複を禁止する",
+            ),
+        ),
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_calendarevent_time_range"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calendarevent",
+            name="recurrence",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="繰り返しルール（RRULE / EXDATE 等を改行区切り）。空なら単発イベント",
+            ),
+        ),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="recurrence_end",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="繰り返しの最後の発生の終了日時（無期限なら空）",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="calendarevent",
+            index=models.Index(
+                condition=models.Q(("recurrence", ""), _negated=True),
+                fields=["start_time", "recurrence_end"],
+                name="api_event_recurring_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+# 全文検索用の GIN インデックス（式は api.search.search_events が生成する SQL と一致させる）。
+# SQLite では作成しない（部分一致で検索する）。
+SEARCH_INDEX = "api_event_search_gin"
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_search_document(apps, schema_editor):
+    from api.search import build_search_document
+
+    CalendarEvent = apps.get_model("api", "CalendarEvent")
+    batch = []
+    events = CalendarEvent.objects.only("id", "title", "description").order_by("id")
+    for event in events.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        event.search_document = build_search_document(event.title, event.description)
+        batch.append(event)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            CalendarEvent.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    if batch:
+        CalendarEvent.objects.bulk_update(batch, ["search_document"])
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('api_calendarevent')")
+        partitioned = cursor.fetchone()[0] == "p"
+    # パーティションテーブルの親には CONCURRENTLY で作れない
+    concurrently = "" if partitioned else "CONCURRENTLY "
+    schema_editor.execute(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS {SEARCH_INDEX} ON api_calendarevent "
+        "USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, '')))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY はトランザクション外で実行する必要がある
+    atomic = False
+
+    dependencies = [
+        ("api", "0008_calendarevent_recurrence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calendarevent",
+            name="search_document",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="全文検索用のトークン列（タイトルと説明から保存時に生成）",
+            ),
+        ),
+        migrations.RunPython(backfill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_agenda(apps, schema_editor):
+    from api.agenda import rebuild
+
+    CalendarEvent = apps.get_model("api", "CalendarEvent")
+    AgendaEntry = apps.get_model("api", "AgendaEntry")
+    rebuild(CalendarEvent.objects.all(), entry_model=AgendaEntry)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_calendarevent_search_document"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AgendaEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("event_id", models.BigIntegerField(db_index=True, help_text="CalendarEvent の ID")),
+                ("title", models.CharField(help_text="イベントタイトル", max_length=200)),
+                ("start_time", models.DateTimeField(help_text="イベント開始日時（繰り返しは初回）")),
+                ("end_time", models.DateTimeField(help_text="イベント終了日時（繰り返しは初回）")),
+                ("recurrence", models.TextField(blank=True, default="", help_text="繰り返しルール")),
+                (
+                    "until",
+                    models.DateTimeField(
+                        blank=True, help_text="最後の発生の終了日時（無期限の繰り返しなら空）", null=True
+                    ),
+                ),
+                (
+                    "spanning",
+                    models.BooleanField(
+                        default=False,
+                        help_text="繰り返し、または長期間のイベント（開始日時の範囲だけでは拾えない行）",
+                    ),
+                ),
+                ("is_owner", models.BooleanField(default=False, help_text="ユーザーが作成者か（偽なら参加者）")),
+                ("updated_at", models.DateTimeField(auto_now=True, help_text="最終更新日時（発生キャッシュの版）")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        help_text="予定表の持ち主",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="agenda_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("spanning", False)),
+                        fields=["user", "start_time"],
+                        name="api_agenda_user_start_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("spanning", True)),
+                        fields=["user", "start_time"],
+                        name="api_agenda_user_spanning_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("user", "event_id"), name="api_agenda_user_event_uniq"),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_agenda, migrations.RunPython.noop),
+    ]
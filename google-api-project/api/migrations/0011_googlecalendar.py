@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_agendaentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="googleoauthtoken",
+            name="calendar_list_sync_token",
+            field=models.TextField(blank=True, default="", help_text="calendarList の差分取得用トークン"),
+        ),
+        migrations.CreateModel(
+            name="GoogleCalendar",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("calendar_id", models.CharField(help_text="Google Calendar 側のカレンダーID", max_length=255)),
+                ("summary", models.CharField(blank=True, default="", help_text="カレンダー名", max_length=255)),
+                ("access_role", models.CharField(blank=True, default="", help_text="ユーザーの権限", max_length=32)),
+                ("is_primary", models.BooleanField(default=False, help_text="ユーザーのメインカレンダーか")),
+                ("selected", models.BooleanField(default=True, help_text="同期対象にするか")),
+                ("deleted", models.BooleanField(default=False, help_text="calendarList から外れたか")),
+                ("sync_token", models.TextField(blank=True, default="", help_text="events.list の差分取得用トークン")),
+                ("synced_at", models.DateTimeField(blank=True, help_text="最終取り込み日時", null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, help_text="最終更新日時")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        help_text="カレンダーを購読しているユーザー",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="google_calendars",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("user", "calendar_id"), name="api_gcal_user_calendar_uniq"),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="calendarevent",
+            name="calendar",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="同期先の Google カレンダー（空なら作成者の primary）",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="events",
+                to="api.googlecalendar",
+            ),
+        ),
+    ]
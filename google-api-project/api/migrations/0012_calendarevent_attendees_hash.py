@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_googlecalendar"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calendarevent",
+            name="attendees_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Google 側へ最後に反映した参加者（attendees）のハッシュ",
+                max_length=64,
+            ),
+        ),
+    ]
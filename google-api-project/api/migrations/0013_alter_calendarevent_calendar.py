@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_calendarevent_attendees_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="calendarevent",
+            name="calendar",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="同期先の Google カレンダー（空なら作成者の primary）",
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="events",
+                to="api.googlecalendar",
+            ),
+        ),
+    ]
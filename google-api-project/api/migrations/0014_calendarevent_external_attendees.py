@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_alter_calendarevent_calendar"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calendarevent",
+            name="external_attendees",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Google 側の参加者のうちローカルにユーザーが居ないメールアドレス（attendees を送る時に含める）",
+            ),
+        ),
+    ]
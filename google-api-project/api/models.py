@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import connections, models
 from django.conf import settings
+from django.contrib.postgres.fields import DateTimeRangeField
 from django.core.exceptions import ValidationError
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 
 
 class GoogleOAuthToken(models.Model):
@@ -30,6 +32,12 @@ class GoogleOAuthToken(models.Model):
         default=3600,
     )
 
+    calendar_list_sync_token = models.TextField(
+        blank=True,
+        default="",
+        help_text="calendarList の差分取得用トークン",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True, help_text="初回保存日時")
     updated_at = models.DateTimeField(auto_now=True, help_text="最終更新日時")
 
@@ -37,9 +45,133 @@ class GoogleOAuthToken(models.Model):
         return f"GoogleOAuthToken(user={self.user}, updated_at={self.updated_at})"
 
 
+class GoogleCalendar(models.Model):
+    """ユーザーの Google カレンダー（calendarList のキャッシュ兼カレンダー毎の同期状態）"""
+
+    WRITABLE_ROLES = ("owner", "writer")
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="google_calendars",
+        db_index=False,
+        help_text="カレンダーを購読しているユーザー",
+    )
+    calendar_id = models.CharField(max_length=255, help_text="Google Calendar 側のカレンダーID")
+    summary = models.CharField(max_length=255, blank=True, default="", help_text="カレンダー名")
+    access_role = models.CharField(max_length=32, blank=True, default="", help_text="ユーザーの権限")
+    is_primary = models.BooleanField(default=False, help_text="ユーザーのメインカレンダーか")
+    selected = models.BooleanField(default=True, help_text="同期対象にするか")
+    deleted = models.BooleanField(default=False, help_text="calendarList から外れたか")
+    sync_token = models.TextField(blank=True, default="", help_text="events.list の差分取得用トークン")
+    synced_at = models.DateTimeField(null=True, blank=True, help_text="最終取り込み日時")
+    updated_at = models.DateTimeField(auto_now=True, help_text="最終更新日時")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "calendar_id"], name="api_gcal_user_calendar_uniq"),
+        ]
+
+    @property
+    def writable(self):
+        return self.access_role in self.WRITABLE_ROLES
+
+    def __str__(self):
+        return f"GoogleCalendar(user={self.user_id}, {self.calendar_id})"
+
+
+class TsTzRange(models.Func):
+    """tstzrange(start, end) — GiST インデックスと同じ式で範囲検索するため"""
+
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+class CalendarEventQuerySet(models.QuerySet):
+    """一括削除時に Google 側の削除をまとめて投入し、一括書き込みでも検索用トークン列を揃える QuerySet"""
+
+    def overlapping(self, start, end):
+        """[start, end) と重なる単発イベントと、期間中に発生しうる繰り返しイベント
+
+        単発は PostgreSQL では tstzrange の GiST インデックス、繰り返しは部分インデックスを使う。
+        繰り返しイベントの個々の発生は recurrence.iter_occurrences で展開する。
+        start_time の条件は月パーティション化したテーブルでの刈り込みにも使われる。
+        """
+        recurring = ~models.Q(recurrence="") & (
+            models.Q(recurrence_end__isnull=True) | models.Q(recurrence_end__gt=start)
+        )
+        queryset = self.filter(start_time__lt=end)
+        if connections[self.db].vendor == "postgresql":
+            single = models.Q(time_range__overlap=DateTimeTZRange(start, end))
+            return queryset.alias(time_range=TsTzRange("start_time", "end_time")).filter(
+                (models.Q(recurrence="") & single) | recurring
+            )
+        single = models.Q(end_time__gt=start)
+        return queryset.filter((models.Q(recurrence="") & single) | recurring)
+
+    def collect_google_delete(self, user_id, google_event_id, calendar=None):
+        """post_delete シグナルから削除対象を受け取る"""
+        self._google_delete_targets.append((user_id, google_event_id, calendar))
+
+    def collect_agenda_delete(self, event_id):
+        self._agenda_delete_ids.append(event_id)
+
+    def delete(self):
+        """行の削除後、Google 側の削除をユーザー単位のバッチタスクとして投入し、予定表の行をまとめて削除して通知"""
+        from . import notifications
+        from .agenda import events_deleted
+        from .tasks import enqueue_google_deletes
+
+        self._google_delete_targets = []
+        self._agenda_delete_ids = []
+        result = super().delete()
+        enqueue_google_deletes(self._google_delete_targets)
+        if self._agenda_delete_ids:
+            notifications.events_deleted(self._agenda_delete_ids)
+            events_deleted(self._agenda_delete_ids)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    # search_document は Python 側のトークナイザで save() 時に作るので、save() を通らない一括書き込みでも揃える
+    def bulk_create(self, objs, *args, **kwargs):
+        from .search import build_search_document
+
+        objs = list(objs)
+        for obj in objs:
+            obj.search_document = build_search_document(obj.title, obj.description)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .search import build_search_document
+
+        if {"title", "description"} & set(fields):
+            objs = list(objs)
+            for obj in objs:
+                obj.search_document = build_search_document(obj.title, obj.description)
+            fields = {*fields, "search_document"}
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if {"title", "description"} & set(kwargs) and "search_document" not in kwargs:
+            # トークン列は SQL では作れないので、行を読んで作り直せる経路に限る
+            raise TypeError("title / description は save() か bulk_update() で更新してください")
+        return super().update(**kwargs)
+
+
 class CalendarEvent(models.Model):
     """アプリ内イベント（Google Calendar と同期対象）"""
 
+    SYNC_PENDING = "pending"
+    SYNC_SYNCED = "synced"
+    SYNC_FAILED = "failed"
+    SYNC_STATE_CHOICES = [
+        (SYNC_PENDING, "同期待ち"),
+        (SYNC_SYNCED, "同期済み"),
+        (SYNC_FAILED, "同期失敗"),
+    ]
+
     title = models.CharField(max_length=200, help_text="イベントタイトル")
     description = models.TextField(blank=True, help_text="イベント詳細説明")
     start_time = models.DateTimeField(help_text="イベント開始日時")
@@ -67,14 +199,200 @@ class CalendarEvent(models.Model):
         db_index=True,
         help_text="Google Calendar 側のイベントID",
     )
+    # NULL は primary を意味するので、削除で NULL にすると別のカレンダーへ同期されてしまう。
+    # イベントが残っているカレンダーは削除させない（ユーザーの削除ではイベントごと消える）
+    calendar = models.ForeignKey(
+        GoogleCalendar,
+        on_delete=models.RESTRICT,
+        related_name="events",
+        null=True,
+        blank=True,
+        help_text="同期先の Google カレンダー（空なら作成者の primary）",
+    )
+    attendees_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        help_text="Google 側へ最後に反映した参加者（attendees）のハッシュ",
+    )
+    external_attendees = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Google 側の参加者のうちローカルにユーザーが居ないメールアドレス（attendees を送る時に含める）",
+    )
+    is_exclusive = models.BooleanField(
+        default=False,
+        help_text="作成者の他の排他イベントとの時間の重複を禁止する",
+    )
+    recurrence = models.TextField(
+        blank=True,
+        default="",
+        help_text="繰り返しルール（RRULE / EXDATE 等を改行区切り）。空なら単発イベント",
+    )
+    search_document = models.TextField(
+        blank=True,
+        default="",
+        editable=False,
+        help_text="全文検索用のトークン列（タイトルと説明から保存時に生成）",
+    )
+    recurrence_end = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="繰り返しの最後の発生の終了日時（無期限なら空）",
+    )
+
+    sync_state = models.CharField(
+        max_length=16,
+        choices=SYNC_STATE_CHOICES,
+        default=SYNC_PENDING,
+        help_text="Google Calendar との同期状態",
+    )
+    sync_attempts = models.PositiveIntegerField(default=0, help_text="連続した同期失敗回数")
+    sync_error = models.TextField(blank=True, default="", help_text="直近の同期エラー")
+    last_synced_at = models.DateTimeField(null=True, blank=True, help_text="最終同期日時")
 
     created_at = models.DateTimeField(auto_now_add=True, help_text="初回作成日時")
     updated_at = models.DateTimeField(auto_now=True, help_text="最終更新日時")
 
+    objects = CalendarEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # 未同期・失敗行だけを持つ部分インデックス（照合ジョブ用）
+            models.Index(
+                fields=["updated_at"],
+                condition=~models.Q(sync_state="synced"),
+                name="api_event_unsynced_idx",
+            ),
+            # 期間検索で繰り返しイベントだけを拾う部分インデックス
+            models.Index(
+                fields=["start_time", "recurrence_end"],
+                condition=~models.Q(recurrence=""),
+                name="api_event_recurring_idx",
+            ),
+        ]
+
     def clean(self):
         """開始・終了時刻のバリデーション"""
         if self.end_time <= self.start_time:
             raise ValidationError("終了時間は開始時間より後である必要があります。")
 
+    def save(self, *args, **kwargs):
+        """繰り返しの終了日時と検索用トークン列を保存時に算出"""
+        from .recurrence import series_end
+        from .search import build_search_document
+
+        self.recurrence_end = (
+            series_end(self.start_time, self.end_time, self.recurrence) if self.recurrence else None
+        )
+        self.search_document = build_search_document(self.title, self.description)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & {"start_time", "end_time", "recurrence"}:
+                update_fields.add("recurrence_end")
+            if update_fields & {"title", "description"}:
+                update_fields.add("search_document")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+    def occurrences(self, window_start, window_end):
+        """期間内の発生 (start, end) を返す（単発なら自身のみ）"""
+        from .recurrence import cached_occurrences
+
+        return cached_occurrences(
+            self.pk,
+            self.updated_at,
+            self.start_time,
+            self.end_time,
+            self.recurrence,
+            window_start,
+            window_end,
+        )
+
     def __str__(self):
         return f"{self.title} [{self.start_time} - {self.end_time}] (GoogleID={self.google_event_id})"
+
+
+class SyncFailure(models.Model):
+    """Google Calendar 同期タスクの失敗記録（成功時は記録しない）"""
+
+    OPERATION_CREATE = "create"
+    OPERATION_UPDATE = "update"
+    OPERATION_DELETE = "delete"
+    OPERATION_CHOICES = [
+        (OPERATION_CREATE, "作成"),
+        (OPERATION_UPDATE, "更新"),
+        (OPERATION_DELETE, "削除"),
+    ]
+
+    operation = models.CharField(max_length=16, choices=OPERATION_CHOICES, help_text="同期操作")
+    # 削除済みの行やユーザーの失敗も残すため外部キーにはしない
+    user_id = models.BigIntegerField(db_index=True, help_text="対象ユーザーID")
+    event_id = models.BigIntegerField(null=True, blank=True, db_index=True, help_text="対象イベントID")
+    google_event_id = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text="Google Calendar 側のイベントID",
+    )
+    message = models.TextField(help_text="エラー内容")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="記録日時")
+
+    class Meta:
+        indexes = [models.Index(fields=["operation", "created_at"])]
+
+    def __str__(self):
+        return f"SyncFailure({self.operation}, event={self.event_id}, user={self.user_id})"
+
+
+class AgendaEntry(models.Model):
+    """ユーザー毎の予定表（作成・参加イベントを非正規化した写し。api.agenda がシグナルで維持）
+
+    期間の読み取りは (user, start_time) のインデックスだけで完結し、イベント・参加者と結合しない。
+    イベントはパーティションテーブルなので外部キーにはしない。
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="agenda_entries",
+        db_index=False,
+        help_text="予定表の持ち主",
+    )
+    event_id = models.BigIntegerField(db_index=True, help_text="CalendarEvent の ID")
+    title = models.CharField(max_length=200, help_text="イベントタイトル")
+    start_time = models.DateTimeField(help_text="イベント開始日時（繰り返しは初回）")
+    end_time = models.DateTimeField(help_text="イベント終了日時（繰り返しは初回）")
+    recurrence = models.TextField(blank=True, default="", help_text="繰り返しルール")
+    until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="最後の発生の終了日時（無期限の繰り返しなら空）",
+    )
+    spanning = models.BooleanField(
+        default=False,
+        help_text="繰り返し、または長期間のイベント（開始日時の範囲だけでは拾えない行）",
+    )
+    is_owner = models.BooleanField(default=False, help_text="ユーザーが作成者か（偽なら参加者）")
+    updated_at = models.DateTimeField(auto_now=True, help_text="最終更新日時（発生キャッシュの版）")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "event_id"], name="api_agenda_user_event_uniq"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "start_time"],
+                condition=models.Q(spanning=False),
+                name="api_agenda_user_start_idx",
+            ),
+            models.Index(
+                fields=["user", "start_time"],
+                condition=models.Q(spanning=True),
+                name="api_agenda_user_spanning_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"AgendaEntry(user={self.user_id}, event={self.event_id}, {self.start_time})"
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import secrets
+import time
+import weakref
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import CachedJWTAuthentication, is_blacklisted
+from .models import AgendaEntry
+
+CHANNEL_PREFIX = "notify:user:"
+# Redis に届かなかった後、発行を止めておく秒数（通知は取りこぼしてよい前提）
+PUBLISH_BACKOFF = 5.0
+# 接続毎に溜める通知の上限。溢れたら捨てて resync を送る
+QUEUE_SIZE = 100
+# 切断後にブラウザが再接続するまでのミリ秒
+RECONNECT_MS = 3000
+RESYNC = object()
+# トークンの期限切れ・無効化で接続を閉じる前に送る
+EXPIRED = 'data: {"type": "expired"}\n\n'
+# ?ticket= の有効秒数（発行から接続までの間だけ使えればよい）
+STREAM_TICKET_TIMEOUT = 30
+
+_client = None
+_down_until = 0.0
+_hubs = weakref.WeakKeyDictionary()
+
+
+def channel(user_id):
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.NOTIFY_REDIS_URL, socket_connect_timeout=1, socket_timeout=1
+        )
+    return _client
+
+
+def publish(messages):
+    """(user_id, payload) の組をパイプライン 1 往復で発行（購読者が居なければ Redis が捨てる）
+
+    クライアントは再接続時に一覧を取り直すので、Redis 障害時は例外にせず暫く発行を止める。
+    """
+    global _down_until
+    if not settings.LIVE_NOTIFICATIONS or not messages or time.monotonic() < _down_until:
+        return 0
+    try:
+        pipe = _get_client().pipeline(transaction=False)
+        for user_id, payload in messages:
+            pipe.publish(channel(user_id), json.dumps(payload, cls=DjangoJSONEncoder))
+        pipe.execute()
+    except redis.RedisError:
+        _down_until = time.monotonic() + PUBLISH_BACKOFF
+        return 0
+    return len(messages)
+
+
+def sync_finished(user_id, results):
+    """Google 同期の結果を作成者へ通知（results は event_id -> タスクの結果）"""
+    publish([
+        (
+            user_id,
+            {
+                "type": "sync",
+                "id": event_id,
+                "success": result["success"],
+                "google_event_id": result.get("google_event_id"),
+                "message": result.get("message", ""),
+            },
+        )
+        for event_id, result in results.items()
+    ])
+
+
+def _event_messages(pairs, action):
+    return [(user_id, {"type": "event", "id": event_id, "action": action}) for user_id, event_id in pairs]
+
+
+def _recipients(event_ids):
+    """作成者と参加者（予定表の行から引くのでイベント・参加者テーブルは見ない）"""
+    return list(AgendaEntry.objects.filter(event_id__in=event_ids).values_list("user_id", "event_id"))
+
+
+def event_changed(event_id, action):
+    """コミット後に作成者と参加者へ変更を通知"""
+    if settings.LIVE_NOTIFICATIONS:
+        transaction.on_commit(lambda: publish(_event_messages(_recipients([event_id]), action)))
+
+
+def events_deleted(event_ids):
+    """予定表の行が消える前に宛先を控え、コミット後に通知"""
+    if settings.LIVE_NOTIFICATIONS and event_ids:
+        messages = _event_messages(_recipients(event_ids), "deleted")
+        transaction.on_commit(lambda: publish(messages))
+
+
+def participants_changed(event_ids, user_ids, action):
+    """参加者として追加・削除されたユーザーへ通知"""
+    links_changed([(event_id, user_id) for event_id in event_ids for user_id in user_ids], action)
+
+
+def links_changed(links, action):
+    """(event_id, user_id) の組で参加者の追加・削除を通知"""
+    if settings.LIVE_NOTIFICATIONS and links:
+        pairs = [(user_id, event_id) for event_id, user_id in links]
+        transaction.on_commit(lambda: publish(_event_messages(pairs, action)))
+
+
+class Hub:
+    """プロセス内の全接続で Redis の購読接続 1 本を共有し、ユーザー毎のキューへ配る
+
+    購読はユーザー単位（SUBSCRIBE / UNSUBSCRIBE）なので、他プロセスの接続宛ての通知は届かない。
+    """
+
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+        self._listeners = {}
+        self._reader = None
+
+    async def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        listeners = self._listeners.setdefault(user_id, set())
+        listeners.add(queue)
+        if len(listeners) == 1:
+            await self._pubsub.subscribe(channel(user_id))
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, user_id, queue):
+        listeners = self._listeners.get(user_id, set())
+        listeners.discard(queue)
+        if not listeners and self._listeners.pop(user_id, None) is not None:
+            await self._pubsub.unsubscribe(channel(user_id))
+
+    def dispatch(self, user_id, data):
+        for queue in self._listeners.get(user_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # 読まれていない接続の通知は捨て、クライアントに一覧を取り直させる
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except redis.RedisError:
+                # 再接続時に redis-py が購読し直す。その間の通知は失われるので resync させる
+                for user_id in list(self._listeners):
+                    self.dispatch(user_id, RESYNC)
+                await asyncio.sleep(1.0)
+                continue
+            if message is not None and message["type"] == "message":
+                user_id = int(message["channel"][len(CHANNEL_PREFIX):])
+                self.dispatch(user_id, message["data"])
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        await self._pubsub.aclose()
+
+
+def get_hub():
+    """イベントループ毎の Hub（ASGI サーバーではプロセスに 1 つ）"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = Hub(redis.asyncio.Redis.from_url(settings.NOTIFY_REDIS_URL).pubsub())
+    return hub
+
+
+def _ticket_key(ticket):
+    return f"notify:ticket:{ticket}"
+
+
+def issue_stream_ticket(raw_token):
+    """?ticket= に載せる使い捨ての値（アクセストークン自体を URL に載せない）"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), raw_token, STREAM_TICKET_TIMEOUT)
+    return ticket
+
+
+async def _redeem_ticket(ticket):
+    key = _ticket_key(ticket)
+    raw = await cache.aget(key)
+    if raw is not None:
+        await cache.adelete(key)
+    return raw
+
+
+async def _authenticate(request):
+    """Authorization ヘッダー、無ければ ?ticket=（EventSource はヘッダーを付けられない）のアクセストークン
+
+    (ユーザー, 検証済みトークン) を返す。
+    """
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        raw = header[len("Bearer "):]
+    elif ticket := request.GET.get("ticket"):
+        raw = await _redeem_ticket(ticket)
+    else:
+        raw = None
+    if not raw:
+        return None, None
+    auth = CachedJWTAuthentication()
+    try:
+        token = auth.get_validated_token(raw)
+        return await sync_to_async(auth.get_user)(token), token
+    except AuthenticationFailed:
+        return None, None
+
+
+def _authorized(token):
+    """接続中もトークンが使えるか（ブラックリスト入り・ユーザーの無効化・パスワード変更で閉じる）"""
+    if is_blacklisted(token[api_settings.JTI_CLAIM]):
+        return False
+    try:
+        CachedJWTAuthentication().get_user(token)
+    except AuthenticationFailed:
+        return False
+    return True
+
+
+async def _stream(hub, user_id, token):
+    queue = await hub.subscribe(user_id)
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        while True:
+            # トークンの期限で閉じる（クライアントは新しいトークンで再接続する）
+            remaining = token["exp"] - time.time()
+            if remaining <= 0:
+                yield EXPIRED
+                return
+            try:
+                data = await asyncio.wait_for(queue.get(), min(settings.LIVE_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                if time.time() >= token["exp"]:
+                    continue
+                if not await sync_to_async(_authorized)(token):
+                    yield EXPIRED
+                    return
+                yield ": ping\n\n"
+                continue
+            if data is RESYNC:
+                yield 'data: {"type": "resync"}\n\n'
+            else:
+                yield f"data: {data.decode()}\n\n"
+    finally:
+        await hub.unsubscribe(user_id, queue)
+
+
+async def event_stream(request):
+    """ログインユーザー宛てのイベント変更・同期完了を Server-Sent Events で流す
+
+    待機中の接続はコルーチンとキューだけなので、ASGI サーバー（uvicorn core.asgi:application 等）で動かす。
+    """
+    if not settings.LIVE_NOTIFICATIONS:
+        raise Http404
+    user, token = await _authenticate(request)
+    if user is None:
+        return JsonResponse({"error": "Invalid token"}, status=401)
+    response = StreamingHttpResponse(_stream(get_hub(), user.pk, token), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,283 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import AgendaEntry, CalendarEvent
+
+# CalendarEvent を start_time の月単位でレンジパーティション化する（PostgreSQL のみ）。
+# 親テーブル名は変えないので ORM からはそのまま使え、start_time の条件でパーティションが刈り込まれる。
+# 制約: 主キーは (id, start_time) になり、id だけを参照する外部キー（参加者の中間テーブル）と
+# 排他制約はパーティションテーブルに張れないため外す（削除は ORM が中間テーブルも消す）。
+EVENT_TABLE = CalendarEvent._meta.db_table
+DEFAULT_PARTITION = f"{EVENT_TABLE}_default"
+UNPARTITIONED_TABLE = f"{EVENT_TABLE}_unpartitioned"
+PARTITION_SEQUENCE = f"{EVENT_TABLE}_part_id_seq"
+PARTITION_NAME = re.compile(rf"^{EVENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+ARCHIVE_SCHEMA = "archive"
+# 削除するパーティションから Google 側の削除対象を読む件数
+DROP_FETCH_SIZE = 1000
+
+
+def month_floor(value):
+    """UTC の月初（パーティション境界）"""
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f"{EVENT_TABLE}_p{month:%Y%m}"
+
+
+def partition_month(name):
+    """パーティション名から月初を返す（このモジュールの命名でなければ None）"""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+
+
+def _literal(value):
+    return f"'{value.isoformat()}'"
+
+
+def _participants():
+    field = CalendarEvent._meta.get_field("participants")
+    return field.remote_field.through._meta.db_table, field.m2m_column_name()
+
+
+def is_partitioned(connection):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [EVENT_TABLE]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions(connection):
+    """月パーティションを [(名前, 月初), ...] で古い順に返す"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [EVENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = [(name, partition_month(name)) for name in names]
+    return sorted((item for item in months if item[1]), key=lambda item: item[1])
+
+
+def _attach_month(cursor, month):
+    """月パーティションを作成し、既定パーティションに入っていた該当月の行を移してから接続する"""
+    name = partition_name(month)
+    lower, upper = month, add_months(month, 1)
+    cursor.execute(
+        f"CREATE TABLE {name} (LIKE {EVENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        "WHERE start_time >= %s AND start_time < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        [lower, upper],
+    )
+    # 接続時の全件検査を省くため、範囲と同じ CHECK を先に付けておく
+    cursor.execute(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+        f"CHECK (start_time >= {_literal(lower)} AND start_time < {_literal(upper)})"
+    )
+    cursor.execute(
+        f"ALTER TABLE {EVENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ({_literal(lower)}) TO ({_literal(upper)})"
+    )
+    cursor.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds")
+    return name
+
+
+def ensure_partitions(connection, ahead=None, now=None):
+    """今月から ahead ヶ月先までの月パーティションを作成（作成したものの名前を返す）"""
+    if not is_partitioned(connection):
+        return []
+    ahead = settings.EVENT_PARTITION_AHEAD_MONTHS if ahead is None else ahead
+    current = month_floor(now or timezone.now())
+    existing = {name for name, _ in list_partitions(connection)}
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) in existing:
+            continue
+        # 月毎にコミットしてロックを短く保つ
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            created.append(_attach_month(cursor, month))
+    return created
+
+
+def convert_to_partitioned(connection, ahead=None, drop_old=False, now=None):
+    """既存の CalendarEvent テーブルをパーティションテーブルへ移行する
+
+    テーブル全体をロックしてコピーするためメンテナンス時間中に実行する。
+    旧テーブルは drop_old でなければ UNPARTITIONED_TABLE として残す（切り戻し用）。
+    """
+    ahead = settings.EVENT_PARTITION_AHEAD_MONTHS if ahead is None else ahead
+    warnings = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {EVENT_TABLE} IN ACCESS EXCLUSIVE MODE")
+
+        # 制約に紐付かないインデックス（モデルの Index / db_index / GiST）はそのまま作り直す
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid), x.indisunique "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = to_regclass(%s) AND NOT EXISTS ("
+            "SELECT 1 FROM pg_constraint c WHERE c.conrelid = x.indrelid AND c.conindid = x.indexrelid)",
+            [EVENT_TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [EVENT_TABLE],
+        )
+        outgoing = cursor.fetchall()
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+            [EVENT_TABLE],
+        )
+        incoming = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('u', 'x')",
+            [EVENT_TABLE],
+        )
+        for (name,) in cursor.fetchall():
+            warnings.append(f"制約 {name} はパーティションテーブルに作成できないため外しました。")
+
+        cursor.execute(f"ALTER TABLE {EVENT_TABLE} RENAME TO {UNPARTITIONED_TABLE}")
+        cursor.execute(f"ALTER INDEX {EVENT_TABLE}_pkey RENAME TO {UNPARTITIONED_TABLE}_pkey")
+        for table, name in incoming:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+            warnings.append(f"{table} の外部キー {name} を外しました（削除は ORM が中間テーブルも消す）。")
+        for name, _, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+
+        cursor.execute(
+            f"CREATE TABLE {EVENT_TABLE} (LIKE {UNPARTITIONED_TABLE} "
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (start_time)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {PARTITION_SEQUENCE} OWNED BY {EVENT_TABLE}.id")
+        cursor.execute(
+            f"ALTER TABLE {EVENT_TABLE} ALTER COLUMN id SET DEFAULT nextval('{PARTITION_SEQUENCE}')"
+        )
+        cursor.execute(
+            f"SELECT setval('{PARTITION_SEQUENCE}', COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {UNPARTITIONED_TABLE}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {EVENT_TABLE} ADD CONSTRAINT {EVENT_TABLE}_pkey PRIMARY KEY (id, start_time)"
+        )
+        for name, definition in outgoing:
+            cursor.execute(f'ALTER TABLE {EVENT_TABLE} ADD CONSTRAINT "{name}" {definition}')
+        for name, definition, unique in indexes:
+            if unique and "start_time" not in definition:
+                definition = definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)
+                warnings.append(f"一意インデックス {name} は通常のインデックスとして作成しました。")
+            cursor.execute(definition)
+
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {EVENT_TABLE} DEFAULT")
+        cursor.execute(f"SELECT MIN(start_time) FROM {UNPARTITIONED_TABLE}")
+        oldest = cursor.fetchone()[0]
+        current = month_floor(now or timezone.now())
+        month = month_floor(oldest) if oldest and oldest < current else current
+        last = add_months(current, ahead)
+        months = 0
+        while month <= last:
+            lower, upper = month, add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF {EVENT_TABLE} "
+                f"FOR VALUES FROM ({_literal(lower)}) TO ({_literal(upper)})"
+            )
+            month = upper
+            months += 1
+
+        cursor.execute(f"INSERT INTO {EVENT_TABLE} SELECT * FROM {UNPARTITIONED_TABLE}")
+        copied = cursor.rowcount
+        if drop_old:
+            cursor.execute(f"DROP TABLE {UNPARTITIONED_TABLE}")
+        cursor.execute(f"ANALYZE {EVENT_TABLE}")
+    return {"rows": copied, "partitions": months, "warnings": warnings}
+
+
+def _has_active_series(cursor, name, before):
+    """before 以降も発生する繰り返しイベント（無期限を含む）を含むか"""
+    cursor.execute(
+        f"SELECT 1 FROM {name} WHERE recurrence <> '' "
+        f"AND (recurrence_end IS NULL OR recurrence_end >= %s) LIMIT 1",
+        [before],
+    )
+    return cursor.fetchone() is not None
+
+
+def _enqueue_google_deletes(cursor, name):
+    """削除するパーティションの同期済みイベントを Google Calendar からも削除する（post_delete の代わり）"""
+    from .tasks import enqueue_google_deletes
+
+    cursor.execute(
+        f"SELECT created_by_id, google_event_id, calendar_id FROM {name} "
+        f"WHERE created_by_id IS NOT NULL AND google_event_id IS NOT NULL AND google_event_id <> ''"
+    )
+    while rows := cursor.fetchmany(DROP_FETCH_SIZE):
+        enqueue_google_deletes(rows)
+
+
+def archive_partitions(connection, before, schema=ARCHIVE_SCHEMA, tablespace=None, drop=False):
+    """before より前の月パーティションを切り離し、別スキーマ（と表領域）へ移すか削除する → (処理した, 残した)
+
+    参加者の中間テーブルの行も同じスキーマへ移す（drop なら削除）。予定表（AgendaEntry）の行は削除し、
+    drop なら Google Calendar 側の削除も投入する（生 SQL なので post_delete シグナルは送られない）。
+    before 以降も続く繰り返しイベントを含むパーティションは、その系列が終わるまで残す。
+    """
+    if not is_partitioned(connection):
+        return [], []
+    quote = connection.ops.quote_name
+    through_table, event_column = _participants()
+    archive_through = f"{quote(schema)}.{through_table}"
+    agenda_table = AgendaEntry._meta.db_table
+    archived, kept = [], []
+    for name, month in list_partitions(connection):
+        if add_months(month, 1) > before:
+            break
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if _has_active_series(cursor, name, before):
+                kept.append(name)
+                continue
+            cursor.execute(f"ALTER TABLE {EVENT_TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DELETE FROM {agenda_table} WHERE event_id IN (SELECT id FROM {name})")
+            if drop:
+                _enqueue_google_deletes(cursor, name)
+                cursor.execute(
+                    f"DELETE FROM {through_table} WHERE {event_column} IN (SELECT id FROM {name})"
+                )
+                cursor.execute(f"DROP TABLE {name}")
+            else:
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)}")
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {archive_through} (LIKE {through_table})"
+                )
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {through_table} "
+                    f"WHERE {event_column} IN (SELECT id FROM {name}) RETURNING *) "
+                    f"INSERT INTO {archive_through} SELECT * FROM moved"
+                )
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {quote(schema)}")
+                if tablespace:
+                    cursor.execute(
+                        f"ALTER TABLE {quote(schema)}.{name} SET TABLESPACE {quote(tablespace)}"
+                    )
+        archived.append(name)
+    return archived, kept
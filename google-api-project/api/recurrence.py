@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from zoneinfo import ZoneInfo
+from dateutil.rrule import rruleset, rrulestr
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# 繰り返しとして受け付ける行（RFC 5545 / Google Calendar の recurrence と同じ形式）
+RECURRENCE_PREFIXES = ("RRULE:", "EXRULE:", "RDATE", "EXDATE")
+# 保存時に展開する発生数の上限（COUNT もこれ以下、UNTIL は開始から MAX_SERIES_SPAN 以内に制限）
+MAX_OCCURRENCES = 5000
+MAX_SERIES_SPAN = timedelta(days=366 * 10)
+# 展開が重すぎるため受け付けない頻度
+DISALLOWED_FREQUENCIES = ("SECONDLY", "MINUTELY")
+
+
+def normalize_recurrence(value):
+    """改行区切りの RRULE 等を正規化（"FREQ=..." だけの行には RRULE: を補う）"""
+    lines = []
+    for line in (value or "").replace("\r", "\n").split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.upper().startswith(RECURRENCE_PREFIXES):
+            line = f"RRULE:{line}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def recurrence_lines(value):
+    return [line for line in (value or "").split("\n") if line]
+
+
+def _parse_dates(name, value, dtstart):
+    """RDATE / EXDATE の値を開始日時と同じタイムゾーンの aware な datetime にする
+
+    タイムゾーンの無い（floating）値は TZID、無ければイベントのタイムゾーンの時刻として扱う。
+    日付だけの値は開始時刻と同じ時刻の発生を指す。
+    """
+    params = dict(param.partition("=")[::2] for param in name.split(";")[1:])
+    zone = ZoneInfo(params["TZID"]) if "TZID" in params else dtstart.tzinfo
+    for item in value.split(","):
+        item = item.strip()
+        if params.get("VALUE") == "DATE" or len(item) == 8:
+            day = datetime.strptime(item, "%Y%m%d")
+            yield datetime.combine(day.date(), dtstart.timetz())
+        elif item.endswith("Z"):
+            yield datetime.strptime(item, "%Y%m%dT%H%M%SZ").replace(tzinfo=dt_timezone.utc).astimezone(zone)
+        else:
+            yield datetime.strptime(item, "%Y%m%dT%H%M%S").replace(tzinfo=zone)
+
+
+def _rule(start_time, recurrence):
+    # 夏時間でも「毎日 10:00」のままになるようローカル時刻で展開する
+    dtstart = timezone.localtime(start_time)
+    rules = rruleset()
+    for line in recurrence_lines(recurrence):
+        name, _, value = line.partition(":")
+        kind = name.split(";")[0].upper()
+        if kind == "RRULE":
+            rules.rrule(rrulestr(value, dtstart=dtstart))
+        elif kind == "EXRULE":
+            rules.exrule(rrulestr(value, dtstart=dtstart))
+        elif kind == "RDATE":
+            for moment in _parse_dates(name, value, dtstart):
+                rules.rdate(moment)
+        elif kind == "EXDATE":
+            for moment in _parse_dates(name, value, dtstart):
+                rules.exdate(moment)
+        else:
+            raise ValueError(f"Unsupported recurrence line: {line}")
+    return rules
+
+
+def _rule_parts(recurrence):
+    for line in recurrence_lines(recurrence):
+        name, _, value = line.partition(":")
+        if name.split(";")[0].upper() in ("RRULE", "EXRULE"):
+            yield dict(part.partition("=")[::2] for part in value.upper().split(";"))
+
+
+def validate_recurrence(start_time, recurrence):
+    """展開できない RRULE や、展開が重すぎる RRULE は ValueError
+
+    実際に発生を MAX_OCCURRENCES 件まで辿り、日時の型の食い違い等もここで検出する。
+    """
+    dtstart = timezone.localtime(start_time)
+    try:
+        for parts in _rule_parts(recurrence):
+            if parts.get("FREQ") in DISALLOWED_FREQUENCIES:
+                raise ValueError(f"FREQ={parts['FREQ']} is not supported")
+            if "COUNT" in parts and int(parts["COUNT"]) > MAX_OCCURRENCES:
+                raise ValueError(f"COUNT must be at most {MAX_OCCURRENCES}")
+            if "UNTIL" in parts:
+                until = next(_parse_dates("UNTIL", parts["UNTIL"], dtstart))
+                if until - dtstart > MAX_SERIES_SPAN:
+                    raise ValueError("UNTIL is too far from the start")
+        occurrences = list(islice(_rule(start_time, recurrence), MAX_OCCURRENCES + 1))
+    except (TypeError, KeyError) as e:
+        raise ValueError(str(e)) from e
+    if _is_bounded(recurrence) and len(occurrences) > MAX_OCCURRENCES:
+        raise ValueError(f"The series must have at most {MAX_OCCURRENCES} occurrences")
+
+
+def _is_bounded(recurrence):
+    rules = [line for line in recurrence_lines(recurrence) if line.upper().startswith("RRULE:")]
+    return all("COUNT=" in line.upper() or "UNTIL=" in line.upper() for line in rules)
+
+
+def series_end(start_time, end_time, recurrence):
+    """最後の発生の終了日時（無期限、もしくは MAX_OCCURRENCES 件を超えるなら None）"""
+    if not recurrence:
+        return end_time
+    if not _is_bounded(recurrence):
+        return None
+    occurrences = list(islice(_rule(start_time, recurrence), MAX_OCCURRENCES + 1))
+    if len(occurrences) > MAX_OCCURRENCES:
+        return None
+    last = occurrences[-1] if occurrences else start_time
+    return last + (end_time - start_time)
+
+
+def iter_occurrences(start_time, end_time, recurrence, window_start, window_end):
+    """[window_start, window_end) と重なる発生だけを逐次生成（系列全体は展開しない）"""
+    duration = end_time - start_time
+    if not recurrence:
+        if start_time < window_end and end_time > window_start:
+            yield start_time, end_time
+        return
+    for start in _rule(start_time, recurrence).xafter(window_start - duration, inc=False):
+        if start >= window_end:
+            break
+        yield start, start + duration
+
+
+def _month_start(value):
+    value = timezone.localtime(value)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value):
+    return (value + timedelta(days=32)).replace(day=1)
+
+
+def _starts_between(start_time, recurrence, lower, upper):
+    """lower <= 開始 < upper の発生開始日時"""
+    for start in _rule(start_time, recurrence).xafter(lower, inc=True):
+        if start >= upper:
+            break
+        yield start
+
+
+def cached_occurrences(event_id, updated_at, start_time, end_time, recurrence, window_start, window_end):
+    """月単位で発生をキャッシュし、頻繁に参照される期間の再展開を省く（更新で自動的に無効化）"""
+    timeout = settings.RECURRENCE_CACHE_TIMEOUT
+    if not recurrence or not timeout:
+        return list(iter_occurrences(start_time, end_time, recurrence, window_start, window_end))
+
+    duration = end_time - start_time
+    lower = window_start - duration
+    version = int(updated_at.timestamp() * 1_000_000)
+    result = []
+    month = _month_start(lower)
+    while month < window_end:
+        following = _next_month(month)
+        key = f"occurrences:{event_id}:{version}:{month:%Y%m}"
+        starts = cache.get(key)
+        if starts is None:
+            starts = [
+                start.timestamp()
+                for start in _starts_between(start_time, recurrence, month, following)
+            ]
+            cache.set(key, starts, timeout)
+        for timestamp in starts:
+            start = datetime.fromtimestamp(timestamp, tz=start_time.tzinfo)
+            if lower < start < window_end:
+                result.append((start, start + duration))
+        month = following
+    return result
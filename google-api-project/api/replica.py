@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from core.db_routers import pin_to_primary, replica_configured, replica_reads
+
+
+def _pin_key(user):
+    return f"db-pin:{user.pk}"
+
+
+class ReplicaReadMixin:
+    """安全なメソッドの読み取りをレプリカへ流し、直近に書き込んだユーザーはプライマリに固定"""
+
+    # 検索系の POST など、書き込みを伴わないメソッドを追加する場合に上書き
+    replica_read_methods = SAFE_METHODS
+
+    def dispatch(self, request, *args, **kwargs):
+        if not replica_configured():
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not replica_configured():
+            return
+        if request.method not in self.replica_read_methods or cache.get(_pin_key(request.user)):
+            pin_to_primary()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            replica_configured()
+            and request.method not in self.replica_read_methods
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            # レプリカ遅延の間は自分の書き込みが見えるようプライマリから読む
+            cache.set(_pin_key(request.user), 1, settings.REPLICA_STICKY_SECONDS)
+        return response
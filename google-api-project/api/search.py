@@ -0,0 +1,76 @@
+import re
+import unicodedata
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Q
+from rest_framework.pagination import PageNumberPagination
+
+# 日本語は分かち書きせずに 2 文字ずつの N-gram（bigram）にし、英数字は単語のまま
+# 'simple' 設定の tsvector に載せる（辞書を使わないので読みの揺れに依存しない）。
+SEARCH_CONFIG = "simple"
+SEARCH_MAX_QUERY_LENGTH = 200
+# 長い検索語で tsquery が巨大にならないよう使う語数を制限
+SEARCH_MAX_TERMS = 32
+# 英数字の単語と、それ以外の文字（漢字・かな等）の連続
+_TOKEN = re.compile(r"[0-9a-z]+|[^\W0-9a-z_]+")
+
+
+def normalize(text):
+    """全角英数・半角カナを揃えて小文字化"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def _tokens(text):
+    """(トークン, 前方一致にするか) を出現順に生成（英単語と 1 文字の語は前方一致）"""
+    for run in _TOKEN.findall(normalize(text)):
+        if run.isascii() or len(run) == 1:
+            yield run, True
+        else:
+            for i in range(len(run) - 1):
+                yield run[i:i + 2], False
+
+
+def build_search_document(*texts):
+    """検索用のトークン列（スペース区切り、出現回数を順位付けに使うため重複も残す）"""
+    return " ".join(token for text in texts for token, _ in _tokens(text))
+
+
+def search_terms(query):
+    """検索語のトークンと前方一致にするかどうか（重複は除く）"""
+    terms = {}
+    for token, prefix in _tokens(query):
+        terms[token] = terms.get(token, False) or prefix
+    return list(terms.items())[:SEARCH_MAX_TERMS]
+
+
+def _tsquery(terms):
+    return " & ".join(f"'{token}':*" if prefix else f"'{token}'" for token, prefix in terms)
+
+
+def search_events(queryset, query):
+    """キーワードに一致するイベントを関連度順に返す（PostgreSQL 以外は部分一致のみ）"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if connections[queryset.db].vendor == "postgresql":
+        # 式は GIN インデックス（api_event_search_gin）と同じ形にする
+        vector = SearchVector("search_document", config=SEARCH_CONFIG)
+        search_query = SearchQuery(_tsquery(terms), config=SEARCH_CONFIG, search_type="raw")
+        return (
+            queryset.alias(document=vector)
+            .filter(document=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by("-rank", "-start_time", "-id")
+        )
+
+    condition = Q()
+    for token, _ in terms:
+        condition &= Q(search_document__contains=token)
+    return queryset.filter(condition).order_by("-start_time", "-id")
+
+
+class EventSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -1,6 +1,18 @@
+from datetime import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import CalendarEvent, GoogleOAuthToken
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .authentication import CachedRefreshToken, is_blacklisted
+from .freebusy import FREEBUSY_MAX_RANGE, FREEBUSY_MAX_USERS, find_conflicts
+from .recurrence import normalize_recurrence, validate_recurrence
+from .search import SEARCH_MAX_QUERY_LENGTH
+from .slots import SLOTS_MAX_RESULTS
+from .models import CalendarEvent, GoogleCalendar, GoogleOAuthToken
 
 User = get_user_model()
 
@@ -24,6 +36,11 @@ class CalendarEventSerializer(serializers.ModelSerializer):
         read_only=True,
         source="participants",
     )
+    calendar = serializers.PrimaryKeyRelatedField(
+        queryset=GoogleCalendar.objects.all(),
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         model = CalendarEvent
@@ -36,10 +53,29 @@ class CalendarEventSerializer(serializers.ModelSerializer):
             "created_by",
             "participants",
             "participants_detail",
+            "calendar",
+            "is_exclusive",
+            "recurrence",
+            "recurrence_end",
+            "sync_state",
+            "last_synced_at",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_by"]
+        read_only_fields = ["id", "created_by", "recurrence_end", "sync_state", "last_synced_at"]
+
+    def validate_recurrence(self, value):
+        return normalize_recurrence(value)
+
+    def validate_calendar(self, value):
+        """自分が書き込めるカレンダーのみ。作成後の移動は Google 側の move が要るので不可"""
+        if self.instance is not None and getattr(value, "pk", None) != self.instance.calendar_id:
+            raise serializers.ValidationError("作成後にカレンダーは変更できません。")
+        if value is not None and (
+            value.user_id != self.context["request"].user.id or value.deleted or not value.writable
+        ):
+            raise serializers.ValidationError("このカレンダーには書き込めません。")
+        return value
 
     def validate(self, data):
         """開始時間と終了時間の整合性チェック"""
@@ -48,6 +84,94 @@ class CalendarEventSerializer(serializers.ModelSerializer):
 
         if start_time and end_time and start_time >= end_time:
             raise serializers.ValidationError("終了時間は開始時間より後である必要があります。")
+
+        recurrence = data.get("recurrence", getattr(self.instance, "recurrence", ""))
+        if recurrence and start_time:
+            try:
+                validate_recurrence(start_time, recurrence)
+            except (ValueError, TypeError):
+                raise serializers.ValidationError({"recurrence": "繰り返しルールが不正です。"})
+
+        is_exclusive = data.get("is_exclusive", getattr(self.instance, "is_exclusive", False))
+        if is_exclusive and recurrence:
+            raise serializers.ValidationError("繰り返しイベントは排他にできません。")
+        if is_exclusive and start_time and end_time:
+            owner = self.instance.created_by if self.instance else self.context["request"].user
+            exclude_id = self.instance.pk if self.instance else None
+            if find_conflicts(owner, start_time, end_time, exclude_id).exists():
+                raise serializers.ValidationError("他の排他イベントと時間が重複しています。")
+        return data
+
+
+class GoogleCalendarSerializer(serializers.ModelSerializer):
+    """キャッシュ済みの calendarList"""
+    class Meta:
+        model = GoogleCalendar
+        fields = ["id", "calendar_id", "summary", "access_role", "is_primary", "selected", "writable", "synced_at"]
+        read_only_fields = ["id", "calendar_id", "summary", "access_role", "is_primary", "writable", "synced_at"]
+
+
+class FreeBusyQuerySerializer(serializers.Serializer):
+    """空き時間照会の入力"""
+    users = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=FREEBUSY_MAX_USERS,
+    )
+    time_min = serializers.DateTimeField()
+    time_max = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data["time_max"] <= data["time_min"]:
+            raise serializers.ValidationError("time_max は time_min より後である必要があります。")
+        if data["time_max"] - data["time_min"] > FREEBUSY_MAX_RANGE:
+            raise serializers.ValidationError("検索範囲が長すぎます。")
+        return data
+
+
+class OccurrenceWindowSerializer(serializers.Serializer):
+    """繰り返しを展開して返す期間"""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data["end"] <= data["start"]:
+            raise serializers.ValidationError("end は start より後である必要があります。")
+        if data["end"] - data["start"] > FREEBUSY_MAX_RANGE:
+            raise serializers.ValidationError("検索範囲が長すぎます。")
+        return data
+
+
+class EventSearchQuerySerializer(serializers.Serializer):
+    """イベント検索の入力"""
+    q = serializers.CharField(max_length=SEARCH_MAX_QUERY_LENGTH, trim_whitespace=True)
+
+
+class FindSlotsSerializer(FreeBusyQuerySerializer):
+    """共通の空き時間候補検索の入力"""
+    duration_minutes = serializers.IntegerField(min_value=5, max_value=24 * 60)
+    work_start = serializers.TimeField(default=time(9, 0))
+    work_end = serializers.TimeField(default=time(18, 0))
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        default=[0, 1, 2, 3, 4],
+    )
+    timezone = serializers.CharField(default=settings.TIME_ZONE)
+    granularity_minutes = serializers.IntegerField(min_value=5, max_value=60, default=15)
+    limit = serializers.IntegerField(min_value=1, max_value=SLOTS_MAX_RESULTS, default=5)
+    include_google = serializers.BooleanField(default=False)
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("不明なタイムゾーンです。")
+        return value
+
+    def validate(self, data):
+        data = super().validate(data)
+        if data["work_end"] <= data["work_start"]:
+            raise serializers.ValidationError("work_end は work_start より後である必要があります。")
         return data
 
 
@@ -63,3 +187,18 @@ class GoogleOAuthTokenSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["created_at", "updated_at"]
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    """ブラックリスト判定をキャッシュ経由で行うトークンリフレッシュ"""
+    token_class = CachedRefreshToken
+
+
+class CachedTokenVerifySerializer(TokenVerifySerializer):
+    """ブラックリスト判定をキャッシュ経由で行うトークン検証"""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        if is_blacklisted(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError(_("Token is blacklisted"))
+        return {}
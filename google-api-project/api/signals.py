@@ -1,12 +1,107 @@
-from django.db.models.signals import post_delete
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import CalendarEvent
-from .tasks import delete_google_calendar_event
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from . import agenda, notifications
+from .authentication import invalidate_cached_user, mark_blacklisted
+from .login import invalidate_token_digest
+from .models import CalendarEvent, CalendarEventQuerySet, GoogleOAuthToken
+from .tasks import enqueue_google_deletes
+
+User = get_user_model()
 
 
 @receiver(post_delete, sender=CalendarEvent)
-def on_event_deleted(sender, instance, **kwargs):
+def on_event_deleted(sender, instance, origin=None, **kwargs):
     """CalendarEvent が削除されたら Google Calendar からも削除"""
-    user_id = instance.created_by.id if instance.created_by else None
-    if instance.google_event_id and user_id:
-        delete_google_calendar_event.delay(instance.id, user_id)
\ No newline at end of file
+    user_id = instance.created_by_id
+    if not (instance.google_event_id and user_id):
+        return
+    if isinstance(origin, CalendarEventQuerySet):
+        # QuerySet の一括削除は削除完了後にまとめて投入される
+        origin.collect_google_delete(user_id, instance.google_event_id, instance.calendar_id)
+    else:
+        enqueue_google_deletes([(user_id, instance.google_event_id, instance.calendar_id)])
+
+
+@receiver(post_save, sender=CalendarEvent)
+def on_event_saved(sender, instance, created, **kwargs):
+    """予定表の行に保存内容を反映し、作成者と参加者へ通知"""
+    agenda.event_saved(instance, created)
+    notifications.event_changed(instance.pk, "created" if created else "updated")
+
+
+@receiver(post_delete, sender=CalendarEvent)
+def on_event_deleted_from_agenda(sender, instance, origin=None, **kwargs):
+    """予定表の行を削除（QuerySet の一括削除は削除完了後にまとめて削除）"""
+    if isinstance(origin, CalendarEventQuerySet):
+        origin.collect_agenda_delete(instance.pk)
+    else:
+        notifications.events_deleted([instance.pk])
+        agenda.events_deleted([instance.pk])
+
+
+@receiver(m2m_changed, sender=CalendarEvent.participants.through)
+def on_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """参加者の追加・削除を予定表に反映して通知（イベント側・ユーザー側どちらからの変更も）"""
+    if action == "post_add":
+        event_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        agenda.participants_added(event_ids, user_ids)
+        notifications.participants_changed(event_ids, user_ids, "added")
+        _resend_attendees(event_ids)
+    elif action == "post_remove":
+        event_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        agenda.participants_removed(event_ids=event_ids, user_ids=user_ids)
+        notifications.participants_changed(event_ids, user_ids, "removed")
+        _resend_attendees(event_ids)
+    elif action == "pre_clear" and reverse:
+        # post_clear では対象のイベントが分からないので、消える前に控えておく
+        instance._cleared_event_ids = list(
+            sender.objects.filter(user_id=instance.pk).values_list("calendarevent_id", flat=True)
+        )
+    elif action == "post_clear":
+        if reverse:
+            agenda.participants_removed(user_ids=[instance.pk])
+            _resend_attendees(getattr(instance, "_cleared_event_ids", []))
+        else:
+            agenda.participants_removed(event_ids=[instance.pk])
+            _resend_attendees([instance.pk])
+
+
+def _resend_attendees(event_ids):
+    """同期済みの行を pending に戻し、変わった参加者を照合ジョブが Google の attendees へ送る
+
+    updated_at も進めるので、同期中のタスクがこの変更より前のスナップショットで synced に戻さない。
+    """
+    if not event_ids:
+        return
+    CalendarEvent.objects.filter(pk__in=event_ids).update(
+        updated_at=timezone.now(),
+        sync_state=Case(
+            When(sync_state=CalendarEvent.SYNC_SYNCED, then=Value(CalendarEvent.SYNC_PENDING)),
+            default=F("sync_state"),
+        ),
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def on_user_changed(sender, instance, **kwargs):
+    """認証キャッシュ上のユーザーを破棄"""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def on_token_blacklisted(sender, instance, created, **kwargs):
+    """どの経路でブラックリスト入りしてもキャッシュへ反映"""
+    if created:
+        mark_blacklisted(instance.token.jti, instance.token.expires_at)
+
+
+@receiver(post_save, sender=GoogleOAuthToken)
+@receiver(post_delete, sender=GoogleOAuthToken)
+def on_google_token_changed(sender, instance, **kwargs):
+    """ログイン時の書き込み省略に使う保存済みトークンのハッシュを破棄"""
+    invalidate_token_digest(instance.user_id)
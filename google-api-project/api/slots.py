@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+
+# 1 回の検索で返す候補数の上限
+SLOTS_MAX_RESULTS = 50
+
+
+def to_epoch_arrays(intervals):
+    """[(start, end), ...] を epoch 秒の int64 配列 2 本に変換"""
+    if not intervals:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.copy()
+    starts = np.fromiter((int(s.timestamp()) for s, _ in intervals), dtype=np.int64, count=len(intervals))
+    ends = np.fromiter((int(e.timestamp()) for _, e in intervals), dtype=np.int64, count=len(intervals))
+    return starts, ends
+
+
+def working_windows(time_min, time_max, tz_name, work_start, work_end, weekdays):
+    """検索範囲内の勤務時間帯（ローカル時刻で指定）を epoch 秒の配列で返す"""
+    tz = ZoneInfo(tz_name)
+    weekdays = set(weekdays)
+    day = time_min.astimezone(tz).date()
+    last = time_max.astimezone(tz).date()
+    starts, ends = [], []
+    while day <= last:
+        if day.weekday() in weekdays:
+            start = datetime.combine(day, work_start, tz)
+            end = datetime.combine(day, work_end, tz)
+            start, end = max(start, time_min), min(end, time_max)
+            if end > start:
+                starts.append(int(start.timestamp()))
+                ends.append(int(end.timestamp()))
+        day += timedelta(days=1)
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+def free_gaps(busy_starts, busy_ends, window_start, window_end):
+    """未ソート・重複ありの busy 区間から空き区間を求める（ソート + 累積最大値で 1 パス）"""
+    order = np.argsort(busy_starts, kind="stable")
+    starts = np.clip(busy_starts[order], window_start, window_end)
+    ends = np.clip(busy_ends[order], window_start, window_end)
+    # i 番目の区間の直前までに埋まっている終端
+    covered = np.maximum.accumulate(ends) if len(ends) else ends
+    gap_starts = np.concatenate(([window_start], covered))
+    gap_ends = np.concatenate((starts, [window_end]))
+    mask = gap_ends > gap_starts
+    return gap_starts[mask], gap_ends[mask]
+
+
+def _off_hours(work_starts, work_ends, window_start, window_end):
+    """勤務時間外を busy 区間として表現"""
+    return (
+        np.concatenate(([window_start], work_ends)),
+        np.concatenate((work_starts, [window_end])),
+    )
+
+
+def find_slots(busy_starts, busy_ends, work_starts, work_ends, duration, limit, granularity):
+    """勤務時間内で duration 秒以上空いている最も早い候補を limit 件（granularity 秒刻み）"""
+    if not len(work_starts):
+        return []
+    window_start, window_end = int(work_starts[0]), int(work_ends[-1])
+    off_starts, off_ends = _off_hours(work_starts, work_ends, window_start, window_end)
+    gap_starts, gap_ends = free_gaps(
+        np.concatenate((busy_starts, off_starts)),
+        np.concatenate((busy_ends, off_ends)),
+        window_start,
+        window_end,
+    )
+
+    # 各空き区間の先頭を刻みに揃え、収まる候補数を数える
+    aligned = -(-gap_starts // granularity) * granularity
+    counts = np.where(
+        gap_ends - aligned >= duration,
+        (gap_ends - aligned - duration) // granularity + 1,
+        0,
+    )
+    counts = np.minimum(counts, limit)
+    taken = np.minimum(counts, np.maximum(limit - (np.cumsum(counts) - counts), 0))
+    taken = taken[taken > 0]
+    if not len(taken):
+        return []
+    firsts = aligned[counts > 0][: len(taken)]
+    offsets = np.arange(taken.sum()) - np.repeat(np.cumsum(taken) - taken, taken)
+    slot_starts = np.repeat(firsts, taken) + offsets * granularity
+    return [
+        (datetime.fromtimestamp(int(s), timezone.utc), datetime.fromtimestamp(int(s) + duration, timezone.utc))
+        for s in slot_starts[:limit]
+    ]
@@ -1,57 +1,370 @@
+from collections import defaultdict
+from datetime import timedelta
 from celery import shared_task
-from django.contrib.auth import get_user_model
-from django.db import close_old_connections
-from .models import CalendarEvent
-from .google_calendar import create_event, update_event, delete_event
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .authentication import warm_blacklist_cache
+from .calendars import pull_calendars, refresh_calendar_list
+from .login import invalidate_token_digest, outstanding_tokens, write_outstanding_tokens
+from .notifications import sync_finished
+from .partitions import ensure_partitions
+from .models import CalendarEvent, GoogleOAuthToken, SyncFailure
+from .google_calendar import (
+    BATCH_SIZE,
+    create_event,
+    update_event,
+    delete_events,
+    attendees_hash,
+    event_snapshot,
+    event_snapshots,
+    refresh_access_token,
+    sync_events,
+)
 
-User = get_user_model()
+# 同一 Google イベントへの削除を重複投入しないための冪等キー保持期間（秒）
+DELETE_IDEMPOTENCY_TIMEOUT = 60 * 60
 
+# 照合ジョブ: 直近の更新は通常のタスクに任せる猶予、再試行の上限、一度に扱う件数
+RECONCILE_GRACE = timedelta(minutes=5)
+RECONCILE_MAX_ATTEMPTS = 5
+RECONCILE_CHUNK_SIZE = 500
+# 期限切れトークンを一度に削除する件数（ロックと WAL を小さく保つ）
+TOKEN_PURGE_BATCH_SIZE = 5000
 
-def _get_event_and_user(event_id, user_id):
-    """共通: イベントとユーザーを取得"""
+
+def _delete_idempotency_key(user_id, google_event_id):
+    return f"gcal:delete:{user_id}:{google_event_id}"
+
+
+def _record_failure(operation, user_id, message, event_id=None, google_event_id=None):
+    """失敗のみ SyncFailure に残し、イベントの同期状態を failed にする"""
+    SyncFailure.objects.create(
+        operation=operation,
+        user_id=user_id,
+        event_id=event_id,
+        google_event_id=google_event_id,
+        message=message,
+    )
+    if event_id is not None:
+        CalendarEvent.objects.filter(pk=event_id).update(
+            sync_state=CalendarEvent.SYNC_FAILED,
+            sync_attempts=F("sync_attempts") + 1,
+            sync_error=message,
+        )
+
+
+def _synced_fields(snapshot, synced_at):
+    """同期成功時の更新内容（スナップショット以降に編集された行は pending のまま残す）
+
+    参加者のハッシュも、スナップショット以降に照合ジョブが書き換えていれば上書きしない。
+    """
+    fields = {"sync_attempts": 0, "sync_error": "", "last_synced_at": synced_at}
+    unchanged = Q()
+    if snapshot.get("updated_at"):
+        unchanged &= Q(updated_at__lte=snapshot["updated_at"])
+    if "attendees" in snapshot:
+        same_attendees = Q(attendees_hash=snapshot.get("attendees_hash", ""))
+        fields["attendees_hash"] = Case(
+            When(same_attendees, then=Value(attendees_hash(snapshot["attendees"]))),
+            default=F("attendees_hash"),
+        )
+        unchanged &= same_attendees
+    if unchanged:
+        fields["sync_state"] = Case(
+            When(unchanged, then=Value(CalendarEvent.SYNC_SYNCED)),
+            default=Value(CalendarEvent.SYNC_PENDING),
+        )
+    else:
+        fields["sync_state"] = CalendarEvent.SYNC_SYNCED
+    return fields
+
+
+def _mark_synced(snapshot, **extra):
+    """行を再取得せず UPDATE 1 回で同期結果を書き戻す"""
+    CalendarEvent.objects.filter(pk=snapshot["id"]).update(
+        **_synced_fields(snapshot, timezone.now()), **extra
+    )
+
+
+def _get_snapshot(event_id, snapshot):
+    """スナップショットが渡されていなければイベントを 1 回だけ取得"""
+    if snapshot is not None:
+        return snapshot, None
     try:
-        event = CalendarEvent.objects.get(id=event_id)
-        user = User.objects.get(id=user_id)
-        return event, user, None
+        return event_snapshot(CalendarEvent.objects.get(id=event_id)), None
     except CalendarEvent.DoesNotExist:
-        return None, None, {"success": False, "message": f"Event {event_id} not found"}
-    except User.DoesNotExist:
-        return None, None, {"success": False, "message": f"User {user_id} not found"}
+        return None, {"success": False, "message": f"Event {event_id} not found"}
     except Exception as e:
-        return None, None, {"success": False, "message": f"Unexpected error: {e}"}
+        return None, {"success": False, "message": f"Unexpected error: {e}"}
 
 
 @shared_task
-def create_google_calendar_event(event_id, user_id):
+def create_google_calendar_event(event_id, user_id, snapshot=None):
     close_old_connections()
-    event, user, error = _get_event_and_user(event_id, user_id)
-    if error:
-        return error
-    result = create_event(user, event)
+    snapshot, error = _get_snapshot(event_id, snapshot)
+    result = error or create_event(user_id, snapshot)
+    if result["success"]:
+        _mark_synced(snapshot, google_event_id=result["google_event_id"])
+    else:
+        _record_failure(SyncFailure.OPERATION_CREATE, user_id, result["message"], event_id)
+    sync_finished(user_id, {event_id: result})
     close_old_connections()
     return result
 
 
 @shared_task
-def update_google_calendar_event(event_id, user_id):
+def update_google_calendar_event(event_id, user_id, snapshot=None):
     close_old_connections()
-    event, user, error = _get_event_and_user(event_id, user_id)
-    if error:
-        return error
-    result = update_event(user, event)
+    if snapshot is not None and not snapshot["google_event_id"]:
+        # 投入時点で作成タスクが未完了だった場合は最新の行を取り直す
+        snapshot = None
+    snapshot, error = _get_snapshot(event_id, snapshot)
+    result = error or update_event(user_id, snapshot)
+    if result["success"]:
+        _mark_synced(snapshot)
+    else:
+        _record_failure(
+            SyncFailure.OPERATION_UPDATE,
+            user_id,
+            result["message"],
+            event_id,
+            snapshot and snapshot["google_event_id"],
+        )
+    sync_finished(user_id, {event_id: result})
     close_old_connections()
     return result
 
 
+def enqueue_google_deletes(targets):
+    """(user_id, google_event_id[, calendar]) を重複排除し、コミット後にユーザー・カレンダー単位で削除タスクを投入"""
+    by_calendar = defaultdict(set)
+    for user_id, google_event_id, *calendar in targets:
+        if user_id and google_event_id:
+            by_calendar[user_id, calendar[0] if calendar else None].add(google_event_id)
+    if not by_calendar:
+        return
+
+    def dispatch():
+        for (user_id, calendar), google_event_ids in by_calendar.items():
+            google_event_ids = sorted(google_event_ids)
+            for i in range(0, len(google_event_ids), BATCH_SIZE):
+                chunk = google_event_ids[i:i + BATCH_SIZE]
+                if calendar is None:
+                    delete_google_calendar_events.delay(user_id, chunk)
+                else:
+                    delete_google_calendar_events.delay(user_id, chunk, calendar)
+
+    transaction.on_commit(dispatch)
+
+
 @shared_task
-def delete_google_calendar_event(event_id, user_id, google_event_id):
+def delete_google_calendar_events(user_id, google_event_ids, calendar=None):
+    """削除済みの行に対応する Google イベントをまとめて削除（calendar は GoogleCalendar の pk、None なら primary）"""
+    close_old_connections()
+    claimed = [
+        google_event_id
+        for google_event_id in google_event_ids
+        if cache.add(
+            _delete_idempotency_key(user_id, google_event_id),
+            1,
+            DELETE_IDEMPOTENCY_TIMEOUT,
+        )
+    ]
+    if not claimed:
+        return {"success": True, "deleted": [], "failed": {}, "skipped": list(google_event_ids)}
+
+    # トークンは user_id で引けるため User 行は取得しない
+    result = delete_events(user_id, claimed, calendar)
+    # 失敗分は再試行できるよう冪等キーを解放し、失敗として記録
+    released = [gid for gid in claimed if gid not in result.get("deleted", [])]
+    if released:
+        cache.delete_many([_delete_idempotency_key(user_id, gid) for gid in released])
+        SyncFailure.objects.bulk_create([
+            SyncFailure(
+                operation=SyncFailure.OPERATION_DELETE,
+                user_id=user_id,
+                google_event_id=gid,
+                message=result.get("failed", {}).get(gid) or result.get("message", ""),
+            )
+            for gid in released
+        ])
     close_old_connections()
-    event, user, error = _get_event_and_user(event_id, user_id)
-    if error:
-        return error
+    return result
+
+
+@shared_task
+def delete_google_calendar_event(event_id, user_id, google_event_id):
+    """旧シグネチャ互換: 投入済みメッセージを一括削除タスクへ委譲"""
     if not google_event_id:
         return {"success": False, "message": f"Event {event_id} has No google_event_id"}
+    return delete_google_calendar_events(user_id, [google_event_id])
+
 
-    result = delete_event(user, event)
+@shared_task
+def reconcile_calendar_events():
+    """定期実行: 未同期・失敗行の一括再同期と、Google 側一覧との突き合わせを投入"""
     close_old_connections()
-    return result
+    retried = retry_unsynced_events()
+    user_ids = GoogleOAuthToken.objects.values_list("user_id", flat=True)
+    for user_id in user_ids.iterator(chunk_size=RECONCILE_CHUNK_SIZE):
+        compare_remote_events.delay(user_id)
+    close_old_connections()
+    return {"success": True, "retried": retried}
+
+
+def retry_unsynced_events():
+    """未同期・失敗行をチャンク単位で読み、ユーザー毎にバッチ API で再同期"""
+    cutoff = timezone.now() - RECONCILE_GRACE
+    candidates = (
+        CalendarEvent.objects.exclude(sync_state=CalendarEvent.SYNC_SYNCED)
+        .filter(
+            updated_at__lt=cutoff,
+            sync_attempts__lt=RECONCILE_MAX_ATTEMPTS,
+            created_by__isnull=False,
+        )
+        .order_by("updated_at")
+    )
+
+    retried = 0
+    chunk = []
+    for event in candidates.iterator(chunk_size=RECONCILE_CHUNK_SIZE):
+        chunk.append(event)
+        if len(chunk) >= RECONCILE_CHUNK_SIZE:
+            retried += _resync_chunk(chunk)
+            chunk = []
+    if chunk:
+        retried += _resync_chunk(chunk)
+    return retried
+
+
+def _resync_chunk(events):
+    by_user = defaultdict(list)
+    for event, snapshot in zip(events, event_snapshots(events)):
+        by_user[event.created_by_id].append(snapshot)
+
+    now = timezone.now()
+    for user_id, snapshots in by_user.items():
+        results = sync_events(user_id, snapshots)
+        for snapshot in snapshots:
+            result = results.get(snapshot["id"], {"success": False, "message": "No response"})
+            if result["success"]:
+                CalendarEvent.objects.filter(pk=snapshot["id"]).update(
+                    google_event_id=result["google_event_id"],
+                    **_synced_fields(snapshot, now),
+                )
+            else:
+                CalendarEvent.objects.filter(pk=snapshot["id"]).update(
+                    sync_state=CalendarEvent.SYNC_FAILED,
+                    sync_attempts=F("sync_attempts") + 1,
+                    sync_error=result["message"],
+                )
+        sync_finished(user_id, {
+            snapshot["id"]: results.get(snapshot["id"], {"success": False, "message": "No response"})
+            for snapshot in snapshots
+        })
+    return len(events)
+
+
+@shared_task
+def resync_calendar_events(event_ids):
+    """指定イベントを作成者毎にバッチ API で再同期（管理画面の一括操作から投入）"""
+    close_old_connections()
+    events = list(CalendarEvent.objects.filter(pk__in=event_ids, created_by__isnull=False))
+    resynced = _resync_chunk(events) if events else 0
+    close_old_connections()
+    return {"success": True, "resynced": resynced}
+
+
+@shared_task
+def compare_remote_events(user_id):
+    """calendarList を差分更新し、同期対象のカレンダー毎に Google 側の変更を並列に取得して照合"""
+    close_old_connections()
+    try:
+        calendars = refresh_calendar_list(user_id)
+        drifted, failed = pull_calendars(user_id, calendars)
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+    finally:
+        close_old_connections()
+    return {"success": not failed, "drifted": drifted, "failed": failed}
+
+
+@shared_task
+def purge_expired_tokens():
+    """期限切れの OutstandingToken / BlacklistedToken をバッチ削除し、ブラックリストキャッシュを温め直す"""
+    close_old_connections()
+    now = timezone.now()
+    purged = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("id")
+            .values_list("id", flat=True)[:TOKEN_PURGE_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+
+    warmed = warm_blacklist_cache()
+    close_old_connections()
+    return {"success": True, "purged": purged, "blacklisted": warmed}
+
+
+@shared_task
+def record_outstanding_tokens(rows):
+    """投入済みの行をまとめて INSERT（Redis のリストに溜める前に投入されたタスク用）"""
+    close_old_connections()
+    recorded = write_outstanding_tokens(rows)
+    close_old_connections()
+    return {"success": True, "recorded": recorded}
+
+
+@shared_task
+def drain_outstanding_tokens():
+    """ログイン時に Redis のリストへ溜めた OutstandingToken をまとめて INSERT（定期実行と、溜まった時に投入）"""
+    close_old_connections()
+    recorded = outstanding_tokens.drain()
+    close_old_connections()
+    return {"success": True, "recorded": recorded}
+
+
+@shared_task
+def refresh_google_tokens(user_ids):
+    """指定ユーザーのアクセストークンを更新し、まとめて保存（管理画面の一括操作から投入）"""
+    close_old_connections()
+    tokens = GoogleOAuthToken.objects.filter(user_id__in=user_ids).only(
+        "id", "user_id", "access_token", "refresh_token", "client_id", "client_secret", "token_uri"
+    )
+    now = timezone.now()
+    refreshed, failed = [], {}
+    for token in tokens:
+        creds, error = refresh_access_token(token)
+        if error:
+            failed[token.user_id] = error["message"]
+            continue
+        token.access_token = creds.token
+        if creds.expiry:
+            token.expires_in = max(0, int((creds.expiry.replace(tzinfo=now.tzinfo) - now).total_seconds()))
+        token.updated_at = now
+        refreshed.append(token)
+    # bulk_update はシグナルを送らないので、ログイン時の書き込み省略用のハッシュは個別に破棄
+    GoogleOAuthToken.objects.bulk_update(refreshed, ["access_token", "expires_in", "updated_at"])
+    for token in refreshed:
+        invalidate_token_digest(token.user_id)
+    close_old_connections()
+    return {"success": not failed, "refreshed": len(refreshed), "failed": failed}
+
+
+@shared_task
+def ensure_event_partitions():
+    """CalendarEvent の月パーティションを先の月まで作成（未パーティション化なら何もしない）"""
+    close_old_connections()
+    created = ensure_partitions(connection)
+    close_old_connections()
+    return {"success": True, "created": created}
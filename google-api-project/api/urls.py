@@ -1,18 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .notifications import event_stream
 from .views import (
     CalendarEventViewSet,
+    GoogleCalendarViewSet,
+    FreeBusyView,
+    FindSlotsView,
     GoogleLoginView,
     SaveGoogleTokenView,
     test_google_api,
     account,
     google_login_jwt,
     logout,
+    stream_ticket,
 )
 
 
 router = DefaultRouter()
 router.register(r"events", CalendarEventViewSet, basename="calendar-event")
+router.register(r"calendars", GoogleCalendarViewSet, basename="google-calendar")
 
 urlpatterns = [
     path("auth/google/login/", GoogleLoginView.as_view(), name="google-login"),
@@ -21,5 +27,10 @@ urlpatterns = [
     path("auth/google/jwt/", google_login_jwt, name="google-login-jwt"),
     path("auth/logout/", logout, name="logout"),
     path("auth/account/", account, name="account"),
+    path("freebusy/", FreeBusyView.as_view(), name="freebusy"),
+    path("freebusy/slots/", FindSlotsView.as_view(), name="find-slots"),
+    # ルーターの events/<pk>/ より先に置く
+    path("events/stream/", event_stream, name="event-stream"),
+    path("events/stream/ticket/", stream_ticket, name="event-stream-ticket"),
     path("", include(router.urls)),
 ]
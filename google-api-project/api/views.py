@@ -1,23 +1,41 @@
 import os
 import logging
+from collections import defaultdict
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import viewsets
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import mixins, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from .models import GoogleOAuthToken, CalendarEvent
-from .serializers import CalendarEventSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .agenda import agenda
+from .authentication import CachedRefreshToken, mark_blacklisted
+from .models import GoogleCalendar, GoogleOAuthToken, CalendarEvent
+from .serializers import (
+    CalendarEventSerializer,
+    EventSearchQuerySerializer,
+    GoogleCalendarSerializer,
+    FindSlotsSerializer,
+    FreeBusyQuerySerializer,
+    OccurrenceWindowSerializer,
+)
+from .freebusy import busy_intervals_by_user, find_conflicts, union_intervals
+from .search import EventSearchPagination, search_events
+from .slots import find_slots, to_epoch_arrays, working_windows
+from .google_calendar import event_snapshot, query_freebusy, verify_id_token
+from .idempotency import IdempotentCreateMixin
+from .login import get_or_create_login_user, issue_tokens, save_google_token
+from .notifications import STREAM_TICKET_TIMEOUT, issue_stream_ticket
+from .replica import ReplicaReadMixin
 from .tasks import (
     create_google_calendar_event,
     update_google_calendar_event,
-    delete_google_calendar_event,
 )
 
 logger = logging.getLogger(__name__)
@@ -28,6 +46,10 @@ User = get_user_model()
 @permission_classes([IsAuthenticated])
 def test_google_api(request):
     """ユーザーの Gmail API プロフィールを取得"""
+    from google.auth.transport import requests
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
     user = request.user
     try:
         token_obj = GoogleOAuthToken.objects.get(user=user)
@@ -78,11 +100,7 @@ def google_login_jwt(request):
         return Response({"error": "id_token is required"}, status=400)
 
     try:
-        payload = id_token.verify_oauth2_token(
-            token,
-            requests.Request(),
-            settings.GOOGLE_OAUTH2_CLIENT_ID,
-        )
+        payload = verify_id_token(token, settings.GOOGLE_OAUTH2_CLIENT_ID)
     except Exception:
         return Response({"error": "Invalid Google token"}, status=400)
 
@@ -90,18 +108,8 @@ def google_login_jwt(request):
     if not email:
         return Response({"error": "Email not available"}, status=400)
 
-    user, _ = User.objects.get_or_create(username=email, defaults={"email": email})
-    refresh = RefreshToken.for_user(user)
-
-    return Response({
-        "refresh": str(refresh),
-        "access": str(refresh.access_token),
-        "user": {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-        },
-    })
+    user = get_or_create_login_user(email)
+    return Response(issue_tokens(user))
 
 
 @api_view(["POST"])
@@ -110,14 +118,25 @@ def logout(request):
     """JWT のログアウト (トークンブラックリスト化)"""
     try:
         refresh_token = request.data.get("refresh")
-        token = RefreshToken(refresh_token)
+        token = CachedRefreshToken(refresh_token)
         token.blacklist()
+        # 開いているライブ通知の接続も閉じるよう、このリクエストのアクセストークンも期限まで無効扱いにする
+        if request.auth is not None:
+            mark_blacklisted(request.auth[api_settings.JTI_CLAIM], datetime_from_epoch(request.auth["exp"]))
         return Response({"message": "Successfully logged out"}, status=200)
     except Exception:
         return Response({"error": "Invalid token"}, status=400)
 
 
-class CalendarEventViewSet(viewsets.ModelViewSet):
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """ライブ通知（SSE）に接続するための使い捨てチケット（EventSource は ?ticket= で渡す）"""
+    raw = str(request.auth) if request.auth is not None else str(AccessToken.for_user(request.user))
+    return Response({"ticket": issue_stream_ticket(raw), "expires_in": STREAM_TICKET_TIMEOUT})
+
+
+class CalendarEventViewSet(ReplicaReadMixin, IdempotentCreateMixin, viewsets.ModelViewSet):
     """Google カレンダーと同期するイベント管理 ViewSet"""
 
     queryset = CalendarEvent.objects.all()
@@ -125,18 +144,194 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        instance = serializer.save(created_by=self.request.user)
-        create_google_calendar_event.delay(instance.id, self.request.user.id)
+        instance = self._save(serializer, created_by=self.request.user)
+        create_google_calendar_event.delay(
+            instance.id, self.request.user.id, event_snapshot(instance)
+        )
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        update_google_calendar_event.delay(instance.id, self.request.user.id)
+        instance = self._save(serializer, sync_state=CalendarEvent.SYNC_PENDING)
+        update_google_calendar_event.delay(
+            instance.id, self.request.user.id, event_snapshot(instance)
+        )
+
+    def _save(self, serializer, **kwargs):
+        # 検証後に並行して作られた排他イベントは DB の排他制約で弾かれる。
+        # 排他制約を持てないパーティションテーブルでも守れるよう、作成者の行をロックして検証し直す
+        try:
+            with transaction.atomic():
+                self._check_exclusive(serializer)
+                instance = serializer.save(**kwargs)
+                # 参加者の変更はシグナルで updated_at を進めるので、スナップショットの前に読み直す
+                instance.refresh_from_db(fields=["updated_at"])
+                return instance
+        except IntegrityError as e:
+            if "api_event_no_exclusive_overlap" not in str(e):
+                raise
+            raise ValidationError("他の排他イベントと時間が重複しています。")
+
+    def _check_exclusive(self, serializer):
+        instance = serializer.instance
+        data = serializer.validated_data
+        if not data.get("is_exclusive", getattr(instance, "is_exclusive", False)):
+            return
+        owner_id = instance.created_by_id if instance else self.request.user.id
+        owner = User.objects.select_for_update().only("pk").filter(pk=owner_id).first()
+        if owner is None:
+            return
+        start_time = data.get("start_time", getattr(instance, "start_time", None))
+        end_time = data.get("end_time", getattr(instance, "end_time", None))
+        if find_conflicts(owner, start_time, end_time, getattr(instance, "pk", None)).exists():
+            raise ValidationError("他の排他イベントと時間が重複しています。")
 
     def perform_destroy(self, instance):
-        user = self.request.user
-        delete_google_calendar_event.delay(instance.id, user.id, instance.google_event_id)
+        # Google 側の削除は post_delete シグナルからコミット後に一度だけ投入される
         instance.delete()
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """自分が作成・参加するイベントをキーワードで検索（関連度順・ページ分割）"""
+        params = EventSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        user = request.user
+        events = self.get_queryset().filter(
+            Q(created_by=user) | Q(pk__in=user.events_participating.values("pk"))
+        )
+        results = search_events(events, params.validated_data["q"]).select_related(
+            "created_by"
+        ).prefetch_related("participants")
+
+        paginator = EventSearchPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["get"])
+    def occurrences(self, request):
+        """期間内の発生を開始順に返す（繰り返しイベントは期間内だけ展開）"""
+        window = OccurrenceWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start, end = window.validated_data["start"], window.validated_data["end"]
+
+        events = self.get_queryset().overlapping(start, end).only(
+            "id", "title", "start_time", "end_time", "recurrence", "updated_at"
+        )
+        occurrences = [
+            {
+                "id": event.id,
+                "title": event.title,
+                "start": occ_start,
+                "end": occ_end,
+                "recurring": bool(event.recurrence),
+            }
+            for event in events.iterator()
+            for occ_start, occ_end in event.occurrences(start, end)
+        ]
+        occurrences.sort(key=lambda occurrence: (occurrence["start"], occurrence["id"]))
+        return Response({"start": start, "end": end, "occurrences": occurrences})
+
+    @action(detail=False, methods=["get"])
+    def agenda(self, request):
+        """自分が作成・参加するイベントの期間内の発生を、予定表から結合無しで返す"""
+        window = OccurrenceWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start, end = window.validated_data["start"], window.validated_data["end"]
+        return Response({"start": start, "end": end, "occurrences": agenda(request.user, start, end)})
+
+
+class GoogleCalendarViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, viewsets.GenericViewSet):
+    """キャッシュ済みの calendarList（Google へは問い合わせない）と同期対象の切り替え"""
+
+    serializer_class = GoogleCalendarSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return GoogleCalendar.objects.filter(user=self.request.user, deleted=False).order_by(
+            "-is_primary", "summary"
+        )
+
+
+class FreeBusyView(ReplicaReadMixin, APIView):
+    """複数ユーザーの予定区間（busy）を結合して返す"""
+
+    permission_classes = [IsAuthenticated]
+    replica_read_methods = ("POST",)
+
+    def post(self, request):
+        serializer = FreeBusyQuerySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        time_min = serializer.validated_data["time_min"]
+        time_max = serializer.validated_data["time_max"]
+
+        busy = busy_intervals_by_user(serializer.validated_data["users"], time_min, time_max)
+        return Response({
+            "time_min": time_min,
+            "time_max": time_max,
+            "calendars": {
+                str(user_id): {"busy": [{"start": s, "end": e} for s, e in intervals]}
+                for user_id, intervals in busy.items()
+            },
+            "busy": [{"start": s, "end": e} for s, e in union_intervals(busy.values())],
+        })
+
+
+class FindSlotsView(ReplicaReadMixin, APIView):
+    """参加者全員が空いている最も早い候補を返す"""
+
+    permission_classes = [IsAuthenticated]
+    replica_read_methods = ("POST",)
+
+    def post(self, request):
+        serializer = FindSlotsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        time_min, time_max = data["time_min"], data["time_max"]
+
+        busy = busy_intervals_by_user(data["users"], time_min, time_max)
+        unavailable = set()
+        if data["include_google"]:
+            users_by_email = defaultdict(list)
+            for user_id, email in User.objects.filter(id__in=data["users"]).exclude(email="").values_list(
+                "id", "email"
+            ):
+                users_by_email[email].append(user_id)
+            try:
+                remote, errors = query_freebusy(request.user, users_by_email, time_min, time_max)
+            except Exception as e:
+                return Response({"error": f"Google freebusy failed: {e}"}, status=502)
+            # Google 側の予定が取れなかった参加者は、空いていると見なさず候補の計算から外して返す
+            unavailable = {user_id for email in errors for user_id in users_by_email[email]}
+            if unavailable >= set(busy):
+                return Response({"error": "Google freebusy failed", "unavailable": sorted(unavailable)}, status=502)
+            for email, periods in remote.items():
+                for user_id in users_by_email[email]:
+                    busy[user_id] = busy[user_id] + periods
+        intervals = [
+            interval
+            for user_id, user_intervals in busy.items()
+            if user_id not in unavailable
+            for interval in user_intervals
+        ]
+
+        busy_starts, busy_ends = to_epoch_arrays(intervals)
+        work_starts, work_ends = working_windows(
+            time_min, time_max, data["timezone"], data["work_start"], data["work_end"], data["weekdays"]
+        )
+        slots = find_slots(
+            busy_starts,
+            busy_ends,
+            work_starts,
+            work_ends,
+            duration=data["duration_minutes"] * 60,
+            limit=data["limit"],
+            granularity=data["granularity_minutes"] * 60,
+        )
+        return Response({
+            "slots": [{"start": s, "end": e} for s, e in slots],
+            "unavailable": sorted(unavailable),
+        })
+
 
 class GoogleLoginView(APIView):
     """Google ログイン + トークン保存"""
@@ -158,34 +353,22 @@ class GoogleLoginView(APIView):
                 "SOCIAL_AUTH_GOOGLE_OAUTH2_KEY",
                 os.getenv("SOCIAL_AUTH_GOOGLE_OAUTH2_KEY"),
             )
-            idinfo = id_token.verify_oauth2_token(token, requests.Request(), client_id)
+            idinfo = verify_id_token(token, client_id)
 
             email = idinfo.get("email")
-            user, _ = User.objects.get_or_create(username=email, defaults={"email": email})
+            user = get_or_create_login_user(email)
 
             if refresh_token:
-                GoogleOAuthToken.objects.update_or_create(
-                    user=user,
-                    defaults={
-                        "access_token": access_token,
-                        "refresh_token": refresh_token,
-                        "expires_in": expires_in,
-                        "client_id": client_id,
-                        "client_secret": os.getenv("SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET"),
-                        "token_uri": "https://oauth2.googleapis.com/token",
-                    },
+                save_google_token(
+                    user,
+                    access_token=access_token,
+                    refresh_token=refresh_token,
+                    expires_in=expires_in,
+                    client_id=client_id,
+                    client_secret=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET,
                 )
 
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": {
-                    "id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                },
-            })
+            return Response(issue_tokens(user))
         except ValueError:
             return Response({"error": "Invalid token"}, status=400)
 
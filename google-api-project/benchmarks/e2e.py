@@ -0,0 +1,482 @@
+"""API と Celery 同期パイプラインのエンドツーエンド負荷試験（JSON のベースラインと比較）
+
+PostgreSQL・Redis・fake_google を起動し、API サーバーとワーカーを同じ設定で起動してから実行する。
+クエリ数はサーバーの Server-Timing ヘッダーから読むので PERF_INSTRUMENTATION=True で起動する。
+
+    python -m fake_google --port 8765 --latency 0.05 &
+    export GOOGLE_API_ROOT_URL=http://127.0.0.1:8765/ PERF_INSTRUMENTATION=True
+    gunicorn core.wsgi -w 4 -b 127.0.0.1:8000 &
+    celery -A core worker -c 8 &
+    python -m benchmarks.e2e seed --users 10000 --events 10000000
+    python -m benchmarks.e2e run --base-url http://127.0.0.1:8000/ --baseline benchmarks/baselines/e2e.json
+    python -m benchmarks.e2e run ... --write-baseline benchmarks/baselines/e2e.json  # ベースラインの更新
+
+ベースラインより p95 が tolerance 以上遅い・スループットが下がった・クエリ数が増えた場合は終了コード 1。
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+USER_PREFIX = "bench-e2e-"
+ORIGIN = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# 一覧 API はページ分割が無く全件を返すため、大規模データでは既定の対象から外す
+SCENARIOS = [
+    "events_create", "events_retrieve", "events_update", "events_search",
+    "events_occurrences", "events_agenda", "account", "google_jwt",
+]
+SEED_BATCH_SIZE = 100000
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(samples, p):
+    """最近傍順位法のパーセンタイル（samples はソート済み）"""
+    return samples[max(math.ceil(len(samples) * p / 100) - 1, 0)]
+
+
+def summarize(latencies, elapsed, errors, queries):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ベースラインからの悪化を文字列のリストで返す（空なら合格）"""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not current or "p95_ms" not in current:
+            continue
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {current['errors']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {base['throughput_rps']}/s -> {current['throughput_rps']}/s"
+            )
+        if base.get("queries_per_request") is not None and current["queries_per_request"] is not None:
+            if current["queries_per_request"] > base["queries_per_request"]:
+                regressions.append(
+                    f"{name}: queries {base['queries_per_request']} -> {current['queries_per_request']}"
+                )
+    return regressions
+
+
+def print_results(results):
+    print(f"{'scenario':<20}{'reqs':>8}{'err':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}{'queries':>9}")
+    for name, r in results.items():
+        if "p95_ms" not in r:
+            print(f"{name:<20}{r['requests']:>8}{r['errors']:>6}")
+            continue
+        queries = "-" if r["queries_per_request"] is None else r["queries_per_request"]
+        print(
+            f"{name:<20}{r['requests']:>8}{r['errors']:>6}{r['p50_ms']:>9.1f}ms{r['p95_ms']:>8.1f}ms"
+            f"{r['p99_ms']:>8.1f}ms{r['throughput_rps']:>10}{queries:>9}"
+        )
+
+
+# --- データ投入 ---------------------------------------------------------------
+
+def _copy_rows(connection, table, columns, rows):
+    """PostgreSQL は COPY、それ以外は executemany で投入"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+            buffer.seek(0)
+            cursor.cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+            )
+
+
+def seed(users, events, participants, seed_value):
+    """ユーザー・Google トークン・イベント（参加者付き）を投入する（既存の投入分は残す）"""
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+    from api.agenda import rebuild
+    from api.models import CalendarEvent, GoogleOAuthToken
+    from api.search import build_search_document
+    from benchmarks.search import generate_texts
+
+    User = get_user_model()
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+    with transaction.atomic():
+        created = User.objects.bulk_create(
+            [User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@example.com") for i in range(users)],
+            batch_size=5000,
+        )
+        GoogleOAuthToken.objects.bulk_create(
+            [
+                GoogleOAuthToken(
+                    user=user,
+                    access_token=f"bench-access-{user.pk}",
+                    refresh_token=f"bench-refresh-{user.pk}",
+                    client_id="bench",
+                    client_secret="bench",
+                )
+                for user in created
+            ],
+            batch_size=5000,
+        )
+    user_ids = [user.pk for user in created]
+    print(f"users: {len(user_ids)} ({time.perf_counter() - started:.1f}s)")
+
+    fields = [field for field in CalendarEvent._meta.concrete_fields if not field.primary_key]
+    columns = [field.column for field in fields]
+    through = CalendarEvent.participants.through
+    event_column = CalendarEvent._meta.get_field("participants").m2m_column_name()
+    user_column = CalendarEvent._meta.get_field("participants").m2m_reverse_name()
+    now = datetime.now(timezone.utc)
+
+    texts = generate_texts(events, seed_value)
+    inserted = 0
+    while inserted < events:
+        size = min(SEED_BATCH_SIZE, events - inserted)
+        rows = []
+        owners = []
+        for title, description in itertools.islice(texts, size):
+            start = ORIGIN + timedelta(minutes=15 * rng.randrange(0, 4 * 24 * 730))
+            owner = rng.choice(user_ids)
+            event = CalendarEvent(
+                title=title[:200],
+                description=description,
+                start_time=start,
+                end_time=start + timedelta(minutes=15 * rng.randint(1, 8)),
+                created_by_id=owner,
+                search_document=build_search_document(title, description),
+                sync_state=CalendarEvent.SYNC_SYNCED,
+                last_synced_at=now,
+                created_at=now,
+                updated_at=now,
+            )
+            rows.append([field.get_db_prep_save(getattr(event, field.attname), connection) for field in fields])
+            owners.append(owner)
+        with transaction.atomic():
+            _copy_rows(connection, CalendarEvent._meta.db_table, columns, rows)
+            # 採番された ID を取り直して参加者を付ける
+            ids = list(
+                CalendarEvent.objects.filter(created_by_id__in=set(owners))
+                .order_by("-id")
+                .values_list("id", flat=True)[:size]
+            )
+            links = {
+                (event_id, rng.choice(user_ids))
+                for event_id in ids
+                for _ in range(rng.randint(0, participants))
+            }
+            if links:
+                _copy_rows(connection, through._meta.db_table, [event_column, user_column], sorted(links))
+            # COPY はシグナルを通らないので予定表はまとめて作る
+            rebuild(CalendarEvent.objects.filter(id__in=ids))
+        inserted += size
+        print(f"events: {inserted}/{events} ({time.perf_counter() - started:.1f}s)")
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CalendarEvent._meta.db_table}")
+            cursor.execute(f"ANALYZE {through._meta.db_table}")
+
+
+def clean():
+    from django.contrib.auth import get_user_model
+    from api.models import CalendarEvent
+
+    User = get_user_model()
+    owners = User.objects.filter(username__startswith=USER_PREFIX)
+    events = CalendarEvent.objects.filter(created_by__in=owners)
+    while True:
+        ids = list(events.values_list("id", flat=True)[:SEED_BATCH_SIZE])
+        if not ids:
+            break
+        through = CalendarEvent.participants.through
+        column = CalendarEvent._meta.get_field("participants").m2m_field_name()
+        through.objects.filter(**{f"{column}__in": ids}).delete()
+        # Google 側の削除は不要なので raw に削除する
+        CalendarEvent.objects.filter(id__in=ids)._raw_delete(CalendarEvent.objects.db)
+    owners.delete()
+
+
+# --- シナリオ -----------------------------------------------------------------
+
+class Context:
+    """シナリオ間で共有する対象ユーザー・トークン・イベント ID"""
+
+    def __init__(self, base_url, users, fake_google_url, rng):
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from api.models import CalendarEvent
+
+        User = get_user_model()
+        self.base_url = base_url.rstrip("/")
+        self.rng = rng
+        self.lock = threading.Lock()
+        sample = list(
+            User.objects.filter(username__startswith=USER_PREFIX).order_by("?").values_list("id", flat=True)[:users]
+        )
+        if not sample:
+            raise SystemExit("seed を先に実行してください。")
+        self.users = [
+            (user_id, str(RefreshToken.for_user(User(pk=user_id)).access_token)) for user_id in sample
+        ]
+        self.events = {
+            user_id: list(
+                CalendarEvent.objects.filter(created_by_id=user_id).values_list("id", flat=True)[:50]
+            )
+            for user_id, _ in self.users
+        }
+        self.created = []
+        self.fake_google_url = fake_google_url
+        self.client_id = settings.GOOGLE_OAUTH2_CLIENT_ID or "bench"
+        self.id_tokens = []
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def event(self):
+        for _ in range(10):
+            user_id, token = self.user()
+            if self.events[user_id]:
+                return token, self.rng.choice(self.events[user_id])
+        raise SystemExit("イベントを持つユーザーが見つかりません。")
+
+    def prepare_id_tokens(self, count):
+        import requests
+
+        for i in range(count):
+            response = requests.post(
+                f"{self.fake_google_url.rstrip('/')}/_fake/id_token",
+                json={"email": f"{USER_PREFIX}login-{i}@example.com", "aud": self.client_id},
+                timeout=10,
+            )
+            response.raise_for_status()
+            self.id_tokens.append(response.json()["id_token"])
+
+
+def _event_payload(rng, title="bench"):
+    start = ORIGIN + timedelta(days=rng.randrange(0, 730), hours=rng.randrange(0, 24))
+    return {
+        "title": title,
+        "description": "benchmark",
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=1)).isoformat(),
+        "participants": [],
+    }
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def events_create(session, ctx):
+    user_id, token = ctx.user()
+    response = session.post(f"{ctx.base_url}/api/events/", json=_event_payload(ctx.rng), headers=_auth(token))
+    if response.status_code == 201:
+        with ctx.lock:
+            ctx.created.append(response.json()["id"])
+    return response
+
+
+def events_retrieve(session, ctx):
+    token, event_id = ctx.event()
+    return session.get(f"{ctx.base_url}/api/events/{event_id}/", headers=_auth(token))
+
+
+def events_update(session, ctx):
+    token, event_id = ctx.event()
+    return session.patch(
+        f"{ctx.base_url}/api/events/{event_id}/", json={"title": "bench updated"}, headers=_auth(token)
+    )
+
+
+def events_search(session, ctx):
+    from benchmarks.search import QUERIES
+
+    _, token = ctx.user()
+    return session.get(
+        f"{ctx.base_url}/api/events/search/", params={"q": ctx.rng.choice(QUERIES)}, headers=_auth(token)
+    )
+
+
+def events_occurrences(session, ctx):
+    _, token = ctx.user()
+    start = ORIGIN + timedelta(days=ctx.rng.randrange(0, 720))
+    params = {"start": start.isoformat(), "end": (start + timedelta(days=7)).isoformat()}
+    return session.get(f"{ctx.base_url}/api/events/occurrences/", params=params, headers=_auth(token))
+
+
+def events_agenda(session, ctx):
+    _, token = ctx.user()
+    start = ORIGIN + timedelta(days=ctx.rng.randrange(0, 720))
+    params = {"start": start.isoformat(), "end": (start + timedelta(days=7)).isoformat()}
+    return session.get(f"{ctx.base_url}/api/events/agenda/", params=params, headers=_auth(token))
+
+
+def events_list(session, ctx):
+    _, token = ctx.user()
+    return session.get(f"{ctx.base_url}/api/events/", headers=_auth(token))
+
+
+def account(session, ctx):
+    _, token = ctx.user()
+    return session.get(f"{ctx.base_url}/api/auth/account/", headers=_auth(token))
+
+
+def google_jwt(session, ctx):
+    token = ctx.rng.choice(ctx.id_tokens)
+    return session.post(f"{ctx.base_url}/api/auth/google/jwt/", json={"id_token": token})
+
+
+def run_scenario(scenario, ctx, requests_count, concurrency):
+    import requests
+
+    local = threading.local()
+    latencies, queries = [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = scenario(session, ctx)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if not ok:
+                errors += 1
+                return
+            latencies.append(elapsed)
+            match = _QUERIES.search(response.headers.get("Server-Timing", ""))
+            if match:
+                queries.append(int(match[1]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(requests_count)))
+    return summarize(latencies, time.perf_counter() - started, errors, queries)
+
+
+def run_sync(ctx, count, concurrency, timeout):
+    """API で作成したイベントが Celery 経由で Google（fake）に同期されるまでの時間と件数/秒"""
+    from api.models import CalendarEvent
+
+    ctx.created = []
+    run_scenario(events_create, ctx, count, concurrency)
+    ids = list(ctx.created)
+    started = time.perf_counter()
+    pending = CalendarEvent.objects.filter(id__in=ids).exclude(sync_state=CalendarEvent.SYNC_SYNCED)
+    while pending.exists() and time.perf_counter() - started < timeout:
+        time.sleep(0.5)
+
+    rows = list(
+        CalendarEvent.objects.filter(id__in=ids, sync_state=CalendarEvent.SYNC_SYNCED).values_list(
+            "created_at", "last_synced_at"
+        )
+    )
+    latencies = [(synced - created).total_seconds() for created, synced in rows]
+    # 件数/秒は最初の作成から最後の同期完了まで
+    elapsed = (max(s for _, s in rows) - min(c for c, _ in rows)).total_seconds() if rows else 0
+    return summarize(latencies, elapsed, len(ids) - len(latencies), [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed")
+    seed_parser.add_argument("--users", type=int, default=10000)
+    seed_parser.add_argument("--events", type=int, default=10_000_000)
+    seed_parser.add_argument("--participants", type=int, default=3, help="イベントあたりの参加者数の上限")
+    seed_parser.add_argument("--seed", type=int, default=0)
+
+    commands.add_parser("clean")
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:8000/")
+    run_parser.add_argument("--fake-google-url", default=os.environ.get("GOOGLE_API_ROOT_URL") or "http://127.0.0.1:8765/")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS + ["sync"]))
+    run_parser.add_argument("--requests", type=int, default=2000, help="シナリオ毎の要求数")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--users", type=int, default=1000, help="要求を分散させるユーザー数")
+    run_parser.add_argument("--sync-events", type=int, default=1000)
+    run_parser.add_argument("--sync-timeout", type=float, default=600)
+    run_parser.add_argument("--baseline", help="比較するベースラインの JSON")
+    run_parser.add_argument("--tolerance", type=float, default=0.2, help="許容する悪化の割合")
+    run_parser.add_argument("--write-baseline", help="結果をベースラインとして書き出す JSON")
+    run_parser.add_argument("--output", help="結果を書き出す JSON")
+    run_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+    if args.command == "seed":
+        seed(args.users, args.events, args.participants, args.seed)
+        return
+    if args.command == "clean":
+        clean()
+        return
+
+    ctx = Context(args.base_url, args.users, args.fake_google_url, random.Random(args.seed))
+    names = [name for name in args.scenarios.split(",") if name]
+    scenarios = {name: globals()[name] for name in SCENARIOS + ["events_list"]}
+    results = {}
+    for name in names:
+        if name == "sync":
+            results[name] = run_sync(ctx, args.sync_events, args.concurrency, args.sync_timeout)
+            continue
+        if name == "google_jwt" and not ctx.id_tokens:
+            ctx.prepare_id_tokens(min(args.requests, 500))
+        results[name] = run_scenario(scenarios[name], ctx, args.requests, args.concurrency)
+    print_results(results)
+
+    for path in filter(None, (args.output, args.write_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline and not args.write_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""空き時間（free/busy）計算のベンチマーク: 100 人 × 1 年
+
+    python -m benchmarks.freebusy          # 区間結合のみ（DB 不要）
+    python -m benchmarks.freebusy --db     # 設定中の DB に投入し、クエリ込みで計測（最後にロールバック）
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def generate_intervals(users, days, per_day, seed=0):
+    """ユーザー毎に平日の勤務時間帯へランダムな予定を配置"""
+    rng = random.Random(seed)
+    origin = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    data = {}
+    for user in range(users):
+        intervals = []
+        for day in range(days):
+            date = origin + timedelta(days=day)
+            if date.weekday() >= 5:
+                continue
+            for _ in range(per_day):
+                start = date + timedelta(hours=9, minutes=15 * rng.randrange(0, 32))
+                intervals.append((start, start + timedelta(minutes=15 * rng.randrange(1, 9))))
+        data[user] = intervals
+    return origin, origin + timedelta(days=days), data
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[math.ceil(len(samples) * 0.95) - 1]
+    print(f"{label:<28} median={statistics.median(samples) * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms")
+
+
+def bench_merge(data, repeat):
+    from api.freebusy import merge_intervals, union_intervals
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        merged = [merge_intervals(intervals) for intervals in data.values()]
+        union_intervals(merged)
+        samples.append(time.perf_counter() - started)
+    _report("merge (in-memory)", samples)
+
+
+def bench_db(time_min, time_max, data, repeat):
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from api.freebusy import busy_intervals_by_user
+    from api.models import CalendarEvent
+
+    User = get_user_model()
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [User(username=f"bench-freebusy-{i}", email=f"bench{i}@example.com") for i in data]
+        )
+        CalendarEvent.objects.bulk_create(
+            [
+                CalendarEvent(title="bench", start_time=start, end_time=end, created_by=user)
+                for user, intervals in zip(users, data.values())
+                for start, end in intervals
+            ],
+            batch_size=5000,
+        )
+        user_ids = [user.id for user in users]
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            busy_intervals_by_user(user_ids, time_min, time_max)
+            samples.append(time.perf_counter() - started)
+        _report("busy_intervals_by_user (db)", samples)
+        transaction.set_rollback(True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+    time_min, time_max, data = generate_intervals(args.users, args.days, args.per_day)
+    total = sum(len(intervals) for intervals in data.values())
+    print(f"{args.users} users x {args.days} days, {total} events")
+    bench_merge(data, args.repeat)
+    if args.db:
+        bench_db(time_min, time_max, data, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""イベント全文検索のベンチマーク: 数百万件の中からキーワード検索
+
+    python -m benchmarks.search                      # トークン化のみ（DB 不要）
+    python -m benchmarks.search --db --rows 2000000  # 設定中の DB に投入し、検索クエリ込みで計測（最後にロールバック）
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.freebusy import _report
+
+WORDS = [
+    "定例", "会議", "打ち合わせ", "レビュー", "面談", "ランチ", "研修", "採用", "予算", "報告",
+    "週次", "月次", "進捗", "設計", "リリース", "振り返り", "顧客", "訪問", "sprint", "planning",
+    "demo", "standup", "retro", "1on1", "budget", "review", "kickoff", "onboarding",
+]
+QUERIES = ["会議", "定例会議", "レビュー", "sprint", "顧客訪問", "振り返り 週次", "予"]
+
+
+def generate_texts(rows, seed=0):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        title = "".join(rng.choices(WORDS, k=rng.randint(1, 3)))
+        description = " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))
+        yield title, description
+
+
+def bench_tokenize(rows, repeat):
+    from api.search import build_search_document
+
+    texts = list(generate_texts(rows))
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for title, description in texts:
+            build_search_document(title, description)
+        samples.append(time.perf_counter() - started)
+    _report(f"tokenize x{rows}", samples)
+
+
+def bench_db(rows, users, repeat, page_size):
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+    from api.models import CalendarEvent
+    from api.search import search_events
+
+    User = get_user_model()
+    origin = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with transaction.atomic():
+        owners = User.objects.bulk_create(
+            [User(username=f"bench-search-{i}") for i in range(users)]
+        )
+        rng = random.Random(1)
+        batch = []
+        for i, (title, description) in enumerate(generate_texts(rows)):
+            start = origin + timedelta(minutes=15 * rng.randrange(0, 4 * 24 * 365))
+            batch.append(CalendarEvent(
+                title=title[:200],
+                description=description,
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                created_by=owners[i % users],
+            ))
+            if len(batch) >= 10000:
+                CalendarEvent.objects.bulk_create(batch)
+                batch = []
+        CalendarEvent.objects.bulk_create(batch)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE api_calendarevent")
+
+        owner = owners[0]
+        events = CalendarEvent.objects.filter(created_by=owner)
+        for query in QUERIES:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(search_events(events, query).values_list("id", flat=True)[:page_size])
+                samples.append(time.perf_counter() - started)
+            _report(f"search {query!r}", samples)
+        transaction.set_rollback(True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+    bench_tokenize(min(args.rows, 100000), args.repeat)
+    if args.db:
+        bench_db(args.rows, args.users, args.repeat, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
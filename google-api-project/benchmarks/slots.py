@@ -0,0 +1,47 @@
+"""共通の空き時間候補検索のベンチマーク: 100 人 × 1 年の busy 区間から最も早い候補を探す
+
+    python -m benchmarks.slots
+"""
+import argparse
+import os
+import time as clock
+from datetime import time
+
+from benchmarks.freebusy import _report, generate_intervals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+    from api.slots import find_slots, to_epoch_arrays, working_windows
+
+    time_min, time_max, data = generate_intervals(args.users, args.days, args.per_day)
+    intervals = [interval for user_intervals in data.values() for interval in user_intervals]
+    print(f"{args.users} users x {args.days} days, {len(intervals)} busy intervals")
+
+    started = clock.perf_counter()
+    busy_starts, busy_ends = to_epoch_arrays(intervals)
+    _report("to_epoch_arrays", [clock.perf_counter() - started])
+
+    work_starts, work_ends = working_windows(time_min, time_max, "UTC", time(9), time(18), range(5))
+    for duration in (30, 60, 120):
+        samples = []
+        for _ in range(args.repeat):
+            started = clock.perf_counter()
+            find_slots(busy_starts, busy_ends, work_starts, work_ends, duration * 60, args.limit, 900)
+            samples.append(clock.perf_counter() - started)
+        _report(f"find_slots {duration}min", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""プロセス起動のベンチマーク: Web ワーカーの起動時間と、Celery の子プロセスの起動時間・固有メモリ
+
+    python -m benchmarks.startup               # 各 5 回の中央値
+    python -m benchmarks.startup --children 8  # fork する子プロセス数
+
+web    : django.setup() と URL 定義の import（Google クライアントを読み込まないこと）
+worker : 親で django.setup() 後に子を fork し、子で Google の service を作るまでの時間と
+         子プロセス固有のメモリ（Private_Clean + Private_Dirty）。preload あり/なしを比較
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+
+def _private_kb():
+    """このプロセス固有のメモリ（コピーオンライトで共有されていない分）"""
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def probe_web():
+    started = time.perf_counter()
+    import django
+
+    django.setup()
+    import core.urls  # noqa: F401
+
+    return {
+        "seconds": time.perf_counter() - started,
+        "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "google_loaded": "googleapiclient" in sys.modules,
+    }
+
+
+def probe_worker(preload, children):
+    import django
+
+    django.setup()
+    from api import tasks  # noqa: F401
+
+    if preload:
+        from core.celery import preload_worker
+
+        preload_worker()
+
+    results = []
+    for _ in range(children):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            started = time.perf_counter()
+            from google.oauth2.credentials import Credentials
+            from googleapiclient.discovery import build_from_document
+            from api.google_calendar import _discovery_document
+            from django.conf import settings
+
+            document = _discovery_document(settings.GOOGLE_API_ROOT_URL or None)
+            build_from_document(document, credentials=Credentials(token="bench"))
+            result = {"seconds": time.perf_counter() - started, "private_kb": _private_kb()}
+            os.write(write, json.dumps(result).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            results.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    return {
+        "seconds": statistics.median(r["seconds"] for r in results),
+        "private_kb": statistics.median(r["private_kb"] for r in results),
+    }
+
+
+def _run(args):
+    """計測はそれぞれ新しいインタープリターで行う（import 済みのモジュールの影響を受けない）"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--probe", *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--children", type=int, default=4)
+    parser.add_argument("--probe", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    if args.probe:
+        kind, *rest = args.probe
+        if kind == "web":
+            result = probe_web()
+        else:
+            result = probe_worker(rest[0] == "preload", args.children)
+        print(json.dumps(result))
+        return
+
+    web = [_run(["web"]) for _ in range(args.repeat)]
+    print(
+        f"web                  start {statistics.median(r['seconds'] for r in web) * 1000:8.1f}ms"
+        f"  rss {statistics.median(r['rss_kb'] for r in web) / 1024:6.1f}MB"
+        f"  google loaded: {web[0]['google_loaded']}"
+    )
+    for mode in ("cold", "preload"):
+        runs = [
+            _run(["worker", mode, "--children", str(args.children)]) for _ in range(args.repeat)
+        ]
+        print(
+            f"worker child ({mode:<7}) start {statistics.median(r['seconds'] for r in runs) * 1000:8.1f}ms"
+            f"  private {statistics.median(r['private_kb'] for r in runs) / 1024:6.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from django.core.cache.backends.redis import RedisCache
+from .instrumentation import record_cache, suspended
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """get / get_many のヒット・ミスを計測中のリクエストに加算するキャッシュバックエンド"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with suspended():
+            values = super().get_many(keys, version=version)
+        record_cache(len(values), len(keys) - len(values))
+        return values
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
@@ -1,16 +1,39 @@
 import os
-import multiprocessing
 from celery import Celery
+from celery.signals import worker_init
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
 
 
-multiprocessing.set_start_method("spawn", True)
-
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 app = Celery("core")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+# タスクのメトリクスとトレース伝播のシグナルを登録
+from . import task_instrumentation  # noqa: E402,F401
+
+
+@worker_init.connect
+def preload_worker(**kwargs):
+    """prefork の子プロセスを fork する前に、親で重い import とキャッシュの準備を済ませる
+
+    子はコピーオンライトで共有するので、子毎の import 時間とメモリが掛からない。
+    """
+    from django.conf import settings
+    from django.db import DatabaseError, connections
+
+    if not settings.WORKER_PRELOAD:
+        return
+    from api import google_calendar, tasks  # noqa: F401
+
+    google_calendar.preload()
+    # 接続を確認しておく（ソケットは子と共有できないので fork 前に閉じる）
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            pass
+    connections.close_all()
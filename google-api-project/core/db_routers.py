@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+REPLICA_DB = "replica"
+
+# レプリカ読み取りを許可するスコープ内か
+_replica_reads = ContextVar("replica_reads", default=False)
+# このスコープ内で書き込みがあった（以降の読み取りはプライマリ）
+_pinned = ContextVar("pinned_to_primary", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """このブロック内の読み取りをレプリカへ流す（書き込み後はプライマリに固定）"""
+    reads_token = _replica_reads.set(True)
+    pinned_token = _pinned.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(pinned_token)
+        _replica_reads.reset(reads_token)
+
+
+def pin_to_primary():
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class PrimaryReplicaRouter:
+    """replica_reads() 内の読み取りだけをレプリカへ、それ以外は全てプライマリへ"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not _pinned.get() and replica_configured():
+            return REPLICA_DB
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        # read-your-writes: 同じスコープ内の以降の読み取りはプライマリ
+        if _replica_reads.get():
+            _pinned.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,210 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# リクエスト単位の計測値（サンプリング対象のリクエスト中だけ設定される）
+_stats = ContextVar("request_stats", default=None)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "リクエストの処理時間",
+    ["route", "method", "status"],
+)
+DB_QUERIES = Counter("http_request_db_queries", "リクエスト中の SQL 実行回数", ["route"])
+DB_SECONDS = Counter("http_request_db_seconds", "リクエスト中の SQL 実行時間", ["route"])
+GOOGLE_CALLS = Counter("http_request_google_calls", "リクエスト中の Google API 呼び出し回数", ["route"])
+GOOGLE_SECONDS = Counter("http_request_google_seconds", "リクエスト中の Google API 呼び出し時間", ["route"])
+CACHE_HITS = Counter("http_request_cache_hits", "リクエスト中のキャッシュヒット数", ["route"])
+CACHE_MISSES = Counter("http_request_cache_misses", "リクエスト中のキャッシュミス数", ["route"])
+# Google API のメソッド別レイテンシ（リクエスト・タスクの両方で記録。outcome は ok / HTTP ステータス / error）
+GOOGLE_API_SECONDS = Histogram(
+    "google_api_request_seconds",
+    "Google API 呼び出しのレイテンシ",
+    ["method", "outcome"],
+)
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    google_calls: int = 0
+    google_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def current_stats():
+    return _stats.get()
+
+
+@contextmanager
+def google_call():
+    """Google API 呼び出しの回数と時間を計測中のリクエストに加算"""
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.google_calls += 1
+        stats.google_seconds += time.perf_counter() - started
+
+
+def record_cache(hits, misses):
+    stats = _stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def suspended():
+    """このブロック内の呼び出しを計測しない（内部で get を繰り返す get_many の二重計上を防ぐ）"""
+    token = _stats.set(None)
+    try:
+        yield
+    finally:
+        _stats.reset(token)
+
+
+def _query_timer(execute, sql, params, many, context):
+    """計測中のリクエストの SQL 実行回数と時間を加算（sync_to_async のスレッドにもコンテキストが引き継がれる）"""
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install_query_timer(sender=None, connection=None, **kwargs):
+    # 接続はスレッド毎なので、リクエスト毎ではなく接続毎に 1 度だけ差し込む
+    if _query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_timer)
+
+
+def _route(request):
+    """URL パターン（ID 等を含まないのでラベルの種類が増えない）"""
+    match = getattr(request, "resolver_match", None)
+    if not match:
+        return "unmatched"
+    # DRF のルーターは正規表現のパターンなので ^ と $ を除いて揃える
+    return match.route.replace("^", "").replace("$", "")
+
+
+def server_timing(total, stats):
+    """Server-Timing ヘッダーの値（dur はミリ秒）"""
+    return ", ".join([
+        f"total;dur={total * 1000:.1f}",
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"',
+        f'google;dur={stats.google_seconds * 1000:.1f};desc="{stats.google_calls} calls"',
+        f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses"',
+    ])
+
+
+class PerformanceMiddleware:
+    """リクエスト毎の処理時間・SQL・Google API・キャッシュを計測し、
+    Server-Timing ヘッダーと Prometheus メトリクスに出す
+
+    PERF_INSTRUMENTATION が無効ならミドルウェア自体を外すので負荷は掛からない。
+    PERF_SAMPLE_RATE の割合のリクエストだけを計測する。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        self.server_timing = settings.PERF_SERVER_TIMING
+        connection_created.connect(_install_query_timer, dispatch_uid="perf-query-timer")
+        for connection in connections.all(initialized_only=True):
+            _install_query_timer(connection=connection)
+        # ASGI ではスレッドを挟まずにコルーチンのまま呼ぶ
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    def _record(self, request, response, stats, total):
+        route = _route(request)
+        REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(total)
+        DB_QUERIES.labels(route).inc(stats.db_queries)
+        DB_SECONDS.labels(route).inc(stats.db_seconds)
+        GOOGLE_CALLS.labels(route).inc(stats.google_calls)
+        GOOGLE_SECONDS.labels(route).inc(stats.google_seconds)
+        CACHE_HITS.labels(route).inc(stats.cache_hits)
+        CACHE_MISSES.labels(route).inc(stats.cache_misses)
+        if self.server_timing:
+            response["Server-Timing"] = server_timing(total, stats)
+        return response
+
+
+def metrics(request):
+    """Prometheus 形式のメトリクス（複数プロセス構成では PROMETHEUS_MULTIPROC_DIR を集計）"""
+    if not settings.PERF_INSTRUMENTATION:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+# バージョン付き URL の応答はスキーマが変われば URL も変わるので 1 年キャッシュさせる
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# バージョン無しの URL は毎回 ETag で再検証させる（変わっていなければ 304）
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+_lock = threading.Lock()
+_artifact = None
+
+
+def generate_schema():
+    """ビュー・シリアライザーを走査してスキーマを生成し、JSON で返す（重いのでリクエスト処理では呼ばない）"""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return OpenApiJsonRenderer().render(generator.get_schema(request=None, public=True))
+
+
+def write_schema(path=None):
+    """スキーマを生成してファイルに書き出し、バージョンを返す（既存と同じ内容なら書き込まない）"""
+    path = Path(path or settings.OPENAPI_SCHEMA_PATH)
+    content = generate_schema()
+    if not path.exists() or path.read_bytes() != content:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 読み込み中のプロセスが書きかけのファイルを見ないよう、別名で書いてから置き換える
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_bytes(content)
+        tmp.replace(path)
+    return schema_version(content)
+
+
+def schema_version(content):
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+class SchemaArtifact:
+    """生成済みスキーマと形式毎のレンダリング結果（レンダリングも形式毎に 1 回だけ）"""
+
+    def __init__(self, content, stamp=None):
+        self.content = content
+        self.stamp = stamp
+        self.version = schema_version(content)
+        self._rendered = {OpenApiJsonRenderer.media_type: content}
+        self._schema = None
+
+    def render(self, renderer):
+        rendered = self._rendered.get(renderer.media_type)
+        if rendered is None:
+            if self._schema is None:
+                self._schema = json.loads(self.content)
+            rendered = self._rendered[renderer.media_type] = renderer.render(self._schema)
+        return rendered
+
+
+def get_artifact():
+    """事前生成したスキーマを読み込む（ファイルが置き換えられたら読み直す。無ければ 1 回だけ生成）"""
+    global _artifact
+    path = Path(settings.OPENAPI_SCHEMA_PATH)
+    try:
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        stamp = None
+    artifact = _artifact
+    if artifact is not None and artifact.stamp == stamp:
+        return artifact
+    with _lock:
+        if _artifact is None or _artifact.stamp != stamp:
+            content = path.read_bytes() if stamp is not None else generate_schema()
+            _artifact = SchemaArtifact(content, stamp)
+        return _artifact
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """事前生成したスキーマを ETag 付きで返す（リクエスト毎にスキーマを生成しない）
+
+    /api/schema/ は ETag で再検証させ、/api/schema/<version>/ は immutable で返す。
+    言語指定（?lang=）がある場合だけ従来どおりその場で生成する。
+    """
+
+    def _get_schema_response(self, request):
+        if request.GET.get("lang"):
+            return super()._get_schema_response(request)
+
+        artifact = get_artifact()
+        version = self.kwargs.get("schema_version")
+        if version is not None and version != artifact.version:
+            raise Http404("Unknown schema version")
+
+        renderer = request.accepted_renderer
+        etag = f'"{artifact.version}-{renderer.format}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(artifact.render(renderer), content_type=request.accepted_media_type)
+            response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, None)}"'
+        response["ETag"] = etag
+        if version is None:
+            response["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+            response["Content-Location"] = reverse("api-schema-version", args=[artifact.version])
+        else:
+            response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
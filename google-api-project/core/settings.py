@@ -27,6 +27,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.tracing.TracingMiddleware",
+    "core.instrumentation.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,14 +61,32 @@ WSGI_APPLICATION = "core.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": "google_api_db",
-        "USER": "api-user",
-        "PASSWORD": "api-1234",
-        "HOST": "127.0.0.1",
-        "PORT": "5432",
+        "NAME": config("DB_NAME", default="google_api_db"),
+        "USER": config("DB_USER", default="api-user"),
+        "PASSWORD": config("DB_PASSWORD", default="api-1234"),
+        "HOST": config("DB_HOST", default="127.0.0.1"),
+        "PORT": config("DB_PORT", default="5432"),
+        # 接続を使い回す（リクエスト・Celery タスク毎に接続し直さない）
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        # pgbouncer の transaction pooling ではサーバーサイドカーソルが使えない
+        "DISABLE_SERVER_SIDE_CURSORS": config("DB_PGBOUNCER", default=False, cast=bool),
     }
 }
 
+# 読み取りレプリカ（DB_REPLICA_HOST 未設定なら全てプライマリ）
+if config("DB_REPLICA_HOST", default=None):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": config("DB_REPLICA_HOST"),
+        "PORT": config("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.db_routers.PrimaryReplicaRouter"]
+# 書き込み後にそのユーザーの読み取りをプライマリへ固定する秒数（レプリカ遅延の吸収）
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+
 # パスワード検証
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -95,7 +115,7 @@ AUTHENTICATION_BACKENDS = (
 # REST Framework 設定
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
@@ -107,8 +127,18 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_REFRESH_SERIALIZER": "api.serializers.CachedTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "api.serializers.CachedTokenVerifySerializer",
 }
 
+# ログイン時の OutstandingToken を Redis のリストに溜めてまとめて書き込む件数と最大待ち秒数（1 以下で従来通り同期 INSERT）
+OUTSTANDING_TOKEN_BATCH_SIZE = config("OUTSTANDING_TOKEN_BATCH_SIZE", default=200, cast=int)
+OUTSTANDING_TOKEN_FLUSH_SECONDS = config("OUTSTANDING_TOKEN_FLUSH_SECONDS", default=1.0, cast=float)
+# 溜める先の Redis（キャッシュと違って追い出されない設定のものを指定する）
+OUTSTANDING_TOKEN_REDIS_URL = config("OUTSTANDING_TOKEN_REDIS_URL", default="redis://127.0.0.1:6379/0")
+# Google の ID トークン検証に使う公開鍵をプロセス内に保持する秒数
+GOOGLE_CERTS_CACHE_SECONDS = config("GOOGLE_CERTS_CACHE_SECONDS", default=3600, cast=int)
+
 # Google OAuth 設定
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "/api/account/"
@@ -123,14 +153,77 @@ GOOGLE_OAUTH2_CLIENT_ID = config("SOCIAL_AUTH_GOOGLE_OAUTH2_KEY", default=None)
 GOOGLE_CLIENT_ID = config("SOCIAL_AUTH_GOOGLE_OAUTH2_KEY", default=None)
 GOOGLE_CLIENT_SECRET = config("SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET", default=None)
 GOOGLE_TOKEN_URI = config("GOOGLE_TOKEN_URI")
+# Google API・トークン・証明書の向き先（負荷試験や CI では fake_google の URL を指定、空なら本番の Google）
+GOOGLE_API_ROOT_URL = config("GOOGLE_API_ROOT_URL", default="")
+# Google イベントIDを決定的に生成する際の名前空間（環境毎に変える）
+GOOGLE_EVENT_ID_NAMESPACE = config("GOOGLE_EVENT_ID_NAMESPACE", default="project-api-app")
+# 繰り返しイベントの月毎の展開結果をキャッシュする秒数（0 で無効）
+RECURRENCE_CACHE_TIMEOUT = config("RECURRENCE_CACHE_TIMEOUT", default=3600, cast=int)
+# イベントの月パーティション: 先行して作成する月数と、アーカイブせずに残す月数
+EVENT_PARTITION_AHEAD_MONTHS = config("EVENT_PARTITION_AHEAD_MONTHS", default=12, cast=int)
+EVENT_ARCHIVE_AFTER_MONTHS = config("EVENT_ARCHIVE_AFTER_MONTHS", default=24, cast=int)
+
+# リクエスト計測（Server-Timing ヘッダーと /metrics）。無効時はミドルウェアごと外れる
+PERF_INSTRUMENTATION = config("PERF_INSTRUMENTATION", default=False, cast=bool)
+# 計測するリクエストの割合（0.0〜1.0）
+PERF_SAMPLE_RATE = config("PERF_SAMPLE_RATE", default=1.0, cast=float)
+PERF_SERVER_TIMING = config("PERF_SERVER_TIMING", default=True, cast=bool)
+# 設定すると /metrics に Authorization: Bearer <token> を要求する
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# Celery ワーカーでメトリクスを公開するポート（0 なら公開しない）
+WORKER_METRICS_PORT = config("WORKER_METRICS_PORT", default=0, cast=int)
+# Google 側の変更をカレンダー毎に並列取得する際の同時接続数（ユーザー毎）
+GOOGLE_SYNC_CONCURRENCY = config("GOOGLE_SYNC_CONCURRENCY", default=4, cast=int)
+# Celery ワーカーの親プロセスで Google クライアント等を読み込んでから子を fork する
+WORKER_PRELOAD = config("WORKER_PRELOAD", default=True, cast=bool)
+# OpenTelemetry のスパンを作成してタスクへ伝播する（opentelemetry が導入されている場合のみ）
+TRACING_ENABLED = config("TRACING_ENABLED", default=False, cast=bool)
+
+# ライブ通知（GET /api/events/stream/ の SSE）。タスクとシグナルから Redis pub/sub でユーザー毎に配信する
+LIVE_NOTIFICATIONS = config("LIVE_NOTIFICATIONS", default=True, cast=bool)
+NOTIFY_REDIS_URL = config("NOTIFY_REDIS_URL", default="redis://127.0.0.1:6379/0")
+# 無通信時のコメント送信間隔（秒）。プロキシのアイドル切断より短くする
+LIVE_HEARTBEAT_SECONDS = config("LIVE_HEARTBEAT_SECONDS", default=25, cast=int)
+
+# 事前生成した OpenAPI スキーマ（manage.py build_openapi_schema で作成）。無ければプロセス毎に 1 回だけ生成する
+OPENAPI_SCHEMA_PATH = config("OPENAPI_SCHEMA_PATH", default=str(BASE_DIR / "openapi.json"))
+
+# キャッシュ（Celery タスク間の冪等キー共有にも使用）
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.InstrumentedRedisCache",
+        "LOCATION": config("CACHE_URL", default="redis://127.0.0.1:6379/1"),
+    }
+}
 
 # Celery 設定
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"
 CELERY_RESULT_BACKEND = "redis://127.0.0.1:6379/0"
-CELERY_ACCEPT_CONTENT = ["json"]
-CELERY_TASK_SERIALIZER = "json"
+CELERY_ACCEPT_CONTENT = ["msgpack", "json"]
+CELERY_TASK_SERIALIZER = "msgpack"
 CELERY_RESULT_SERIALIZER = "json"
+# 同期タスクの戻り値は誰も読まないため保存しない（失敗は SyncFailure に記録）
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED = False
 CELERY_TIMEZONE = "Asia/Tokyo"
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-calendar-events": {
+        "task": "api.tasks.reconcile_calendar_events",
+        "schedule": timedelta(minutes=15),
+    },
+    "purge-expired-tokens": {
+        "task": "api.tasks.purge_expired_tokens",
+        "schedule": timedelta(hours=1),
+    },
+    "drain-outstanding-tokens": {
+        "task": "api.tasks.drain_outstanding_tokens",
+        "schedule": timedelta(seconds=OUTSTANDING_TOKEN_FLUSH_SECONDS),
+    },
+    "ensure-event-partitions": {
+        "task": "api.tasks.ensure_event_partitions",
+        "schedule": timedelta(days=1),
+    },
+}
 
 # Social Auth Pipeline (Google Refresh Token 保存用)
 SOCIAL_AUTH_PIPELINE = (
@@ -0,0 +1,101 @@
+import os
+import time
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    task_success,
+    worker_init,
+)
+from django.conf import settings
+from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess, start_http_server
+from . import tracing
+
+# Celery タスクのメトリクス（ラベルはタスク名とエラークラスのみ。ユーザー等はスパンの属性で見る）
+ENQUEUED_AT_HEADER = "enqueued_at"
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "celery_task_queue_wait_seconds",
+    "投入から実行開始までの待ち時間",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+RUNTIME_SECONDS = Histogram("celery_task_runtime_seconds", "タスクの実行時間", ["task"])
+RETRIES = Counter("celery_task_retries", "タスクの再試行回数", ["task"])
+RESULTS = Counter("celery_task_results", "タスクの結果", ["task", "outcome", "error"])
+
+# task_id -> (開始時刻, スパン)。失敗時の例外はスパンに記録するため postrun まで保持
+_running = {}
+_failures = {}
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(sender=None, headers=None, **kwargs):
+    """投入時刻とトレースコンテキストをメッセージヘッダーに載せる"""
+    if headers is None:
+        return
+    headers[ENQUEUED_AT_HEADER] = time.time()
+    tracing.inject(headers)
+
+
+@task_prerun.connect
+def start_task(sender=None, task_id=None, task=None, **kwargs):
+    request = task.request
+    enqueued_at = getattr(request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at:
+        QUEUE_WAIT_SECONDS.labels(task.name).observe(max(time.time() - enqueued_at, 0))
+
+    span = tracing.start_remote_span(
+        f"celery.task {task.name}",
+        request.__dict__,
+        kind=tracing.trace.SpanKind.CONSUMER if tracing.enabled() else None,
+        **{"celery.task_id": task_id, "celery.retries": request.retries or 0},
+    )
+    _running[task_id] = (time.perf_counter(), span)
+
+
+@task_postrun.connect
+def finish_task(sender=None, task_id=None, task=None, **kwargs):
+    started, span = _running.pop(task_id, (None, None))
+    if started is not None:
+        RUNTIME_SECONDS.labels(task.name).observe(time.perf_counter() - started)
+    tracing.end_remote_span(span, _failures.pop(task_id, None))
+
+
+@task_success.connect
+def count_success(sender=None, result=None, **kwargs):
+    # このリポジトリのタスクは失敗を例外ではなく {"success": False} で返すものが多い
+    if isinstance(result, dict) and result.get("success") is False:
+        RESULTS.labels(sender.name, "failure", "reported").inc()
+    else:
+        RESULTS.labels(sender.name, "success", "").inc()
+
+
+@task_failure.connect
+def count_failure(sender=None, task_id=None, exception=None, **kwargs):
+    RESULTS.labels(sender.name, "failure", type(exception).__name__).inc()
+    if task_id in _running:
+        _failures[task_id] = exception
+
+
+@task_retry.connect
+def count_retry(sender=None, **kwargs):
+    RETRIES.labels(sender.name).inc()
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    """WORKER_METRICS_PORT が設定されていればワーカーでも /metrics を公開する"""
+    port = settings.WORKER_METRICS_PORT
+    if not port:
+        return
+    registry = None
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    if registry is None:
+        start_http_server(port)
+    else:
+        start_http_server(port, registry=registry)
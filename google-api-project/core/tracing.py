@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# OpenTelemetry は任意の依存（未導入または TRACING_ENABLED=False なら全て何もしない）。
+# エクスポーターの設定は opentelemetry-instrument 等、SDK 側の標準の方法で行う。
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+except ImportError:  # pragma: no cover
+    trace = None
+
+TRACER_NAME = "project-api-app"
+
+
+def enabled():
+    return trace is not None and settings.TRACING_ENABLED
+
+
+@contextmanager
+def span(name, kind=None, **attributes):
+    """現在のトレースの子スパン（無効時は None を返すだけ）"""
+    if not enabled():
+        yield None
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    options = {"attributes": attributes}
+    if kind is not None:
+        options["kind"] = kind
+    with tracer.start_as_current_span(name, **options) as current:
+        yield current
+
+
+def inject(carrier):
+    """現在のトレースコンテキストを carrier（Celery のヘッダー等）へ書き込む"""
+    if enabled():
+        propagate.inject(carrier)
+
+
+def start_remote_span(name, carrier, kind=None, **attributes):
+    """carrier のトレースコンテキストを親にしたスパンを開始して現在のコンテキストにする
+
+    with で囲めない処理（Celery のシグナル間）用。end_remote_span で終了する。
+    """
+    if not enabled():
+        return None
+    parent = propagate.extract(carrier)
+    options = {"context": parent, "attributes": attributes}
+    if kind is not None:
+        options["kind"] = kind
+    current = trace.get_tracer(TRACER_NAME).start_span(name, **options)
+    token = otel_context.attach(trace.set_span_in_context(current, parent))
+    return current, token
+
+
+def end_remote_span(handle, exception=None):
+    if handle is None:
+        return
+    current, token = handle
+    if exception is not None:
+        current.record_exception(exception)
+        current.set_status(trace.Status(trace.StatusCode.ERROR, type(exception).__name__))
+    otel_context.detach(token)
+    current.end()
+
+
+class TracingMiddleware:
+    """受信した traceparent を引き継いでリクエスト全体のスパンを作る
+
+    タスク投入時にこのスパンのコンテキストがヘッダーへ伝播する。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # ASGI ではスレッドを挟まずにコルーチンのまま呼ぶ
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        return start_remote_span(
+            f"{request.method} {request.path}",
+            request.headers,
+            kind=trace.SpanKind.SERVER,
+            **{"http.request.method": request.method, "url.path": request.path},
+        )
+
+    def _finish(self, request, response, handle):
+        match = getattr(request, "resolver_match", None)
+        if match:
+            handle[0].update_name(f"{request.method} {match.route}")
+        handle[0].set_attribute("http.response.status_code", response.status_code)
+        end_remote_span(handle)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        handle = self._start(request)
+        try:
+            response = self.get_response(request)
+        except Exception as e:
+            end_remote_span(handle, e)
+            raise
+        return self._finish(request, response, handle)
+
+    async def __acall__(self, request):
+        handle = self._start(request)
+        try:
+            response = await self.get_response(request)
+        except Exception as e:
+            end_remote_span(handle, e)
+            raise
+        return self._finish(request, response, handle)
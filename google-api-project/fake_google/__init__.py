@@ -0,0 +1,3 @@
+from .server import FakeGoogle, FakeGoogleConfig, FakeGoogleServer
+
+__all__ = ("FakeGoogle", "FakeGoogleConfig", "FakeGoogleServer")
@@ -0,0 +1,37 @@
+"""代替サーバーを単独プロセスで起動する
+
+    python -m fake_google --port 8765 --latency 0.05 --error-rate 0.01 --quota 50
+    GOOGLE_API_ROOT_URL=http://127.0.0.1:8765/ celery -A core worker ...
+"""
+import argparse
+from .server import FakeGoogleConfig, FakeGoogleServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答の固定遅延（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="追加の乱数遅延の上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す割合")
+    parser.add_argument("--quota", type=float, default=0.0, help="1 秒あたりの要求数の上限")
+    parser.add_argument("--throttle-status", type=int, default=403)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = FakeGoogleConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        quota_per_second=args.quota,
+        throttle_status=args.throttle_status,
+        seed=args.seed,
+    )
+    server = FakeGoogleServer(args.host, args.port, config, verbose=args.verbose)
+    print(f"fake google listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import pytest
+from .server import FakeGoogleServer
+
+
+@pytest.fixture(scope="session")
+def fake_google_server():
+    with FakeGoogleServer() as server:
+        yield server
+
+
+@pytest.fixture
+def fake_google(fake_google_server, settings):
+    """Google API の向き先を代替サーバーに切り替える（テスト毎に状態と設定を初期化）"""
+    settings.GOOGLE_API_ROOT_URL = fake_google_server.url
+    fake = fake_google_server.fake
+    fake.configure(
+        latency=0.0, latency_jitter=0.0, error_rate=0.0, quota_per_second=0.0,
+        require_issued_tokens=False, seed=0,
+    )
+    fake.reset()
+    yield fake
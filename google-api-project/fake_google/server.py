@@ -0,0 +1,544 @@
+"""Google Calendar / OAuth の代替サーバー（負荷試験・CI 用、標準ライブラリの HTTP サーバー）
+
+実装している範囲（このリポジトリが使うもののみ）:
+    POST   /token                                        リフレッシュトークンでのアクセストークン発行
+    GET    /oauth2/v1/certs                              ID トークン検証用の証明書
+    POST   /calendar/v3/calendars/{cal}/events           insert（id 指定時は重複で 409）
+    GET    /calendar/v3/calendars/{cal}/events           list（pageToken / syncToken / updatedMin / showDeleted）
+    GET    /calendar/v3/calendars/{cal}/events/{id}      get
+    PUT    /calendar/v3/calendars/{cal}/events/{id}      update（削除済みは status 指定時のみ復活）
+    PATCH  /calendar/v3/calendars/{cal}/events/{id}      patch（削除済みは status 指定時のみ復活）
+    DELETE /calendar/v3/calendars/{cal}/events/{id}      delete（削除済みは 410、不明は 404）
+    GET    /calendar/v3/users/me/calendarList            calendarList.list（pageToken / syncToken / showDeleted）
+    POST   /calendar/v3/freeBusy                         freebusy.query（繰り返しは展開しない）
+    POST   /batch/calendar/v3                            multipart/mixed のバッチ
+操作用:
+    GET /_fake/stats, POST /_fake/config, POST /_fake/reset, POST /_fake/id_token
+"""
+import email.parser
+import email.policy
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+ISSUER = "https://accounts.google.com"
+EVENT_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$")
+CALENDAR_LIST_PATH = "/calendar/v3/users/me/calendarList"
+
+
+@dataclass
+class FakeGoogleConfig:
+    """応答の遅延・エラー・クォータ（seed を固定すると同じ順序で再現する）"""
+    latency: float = 0.0          # HTTP リクエスト毎の固定遅延（秒）
+    latency_jitter: float = 0.0   # 追加する一様乱数の遅延の上限（秒）
+    error_rate: float = 0.0       # 503 backendError を返す割合（バッチ内の個々の要求毎）
+    quota_per_second: float = 0.0 # 1 秒あたりの要求数の上限（0 で無制限、超過は rateLimitExceeded）
+    throttle_status: int = 403    # クォータ超過時のステータス（Calendar API は 403、429 も可）
+    require_issued_tokens: bool = False  # /token で発行していないアクセストークンを 401 にする
+    seed: int = 0
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _isoformat(value):
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _error(status, reason, message, domain="global"):
+    return status, {"error": {
+        "code": status,
+        "message": message,
+        "errors": [{"domain": domain, "reason": reason, "message": message}],
+    }}
+
+
+class FakeGoogle:
+    """HTTP に依存しない状態と処理（サーバーのスレッド間で共有）"""
+
+    def __init__(self, config=None):
+        self.config = config or FakeGoogleConfig()
+        self.lock = threading.Lock()
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.key_id = secrets.token_hex(8)
+        self._signer = crypt.RSASigner.from_string(
+            self._key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ),
+            key_id=self.key_id,
+        )
+        self._certificate = self._self_signed_certificate()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calendars = {}
+            self.calendar_lists = {}
+            self.sequence = itertools.count(1)
+            self.last_sequence = 0
+            self.access_tokens = {}
+            self.refresh_tokens = {}
+            self.stats = {}
+            self.random = random.Random(self.config.seed)
+            self._bucket = (time.monotonic(), self.config.quota_per_second)
+
+    def configure(self, **changes):
+        names = {field.name for field in fields(FakeGoogleConfig)}
+        with self.lock:
+            for name, value in changes.items():
+                if name not in names:
+                    raise ValueError(f"unknown option: {name}")
+                setattr(self.config, name, type(getattr(self.config, name))(value))
+            self.random = random.Random(self.config.seed)
+            self._bucket = (time.monotonic(), self.config.quota_per_second)
+
+    # --- 認証 -------------------------------------------------------------
+
+    def add_user(self, email, refresh_token=None, access_token=None):
+        """トークンとカレンダー（primary）の持ち主を登録"""
+        with self.lock:
+            if refresh_token:
+                self.refresh_tokens[refresh_token] = email
+            if access_token:
+                self.access_tokens[access_token] = email
+
+    def add_calendar(self, email, calendar_id, summary="", access_role="owner"):
+        """email の calendarList にカレンダー（共有カレンダー等）を追加"""
+        with self.lock:
+            entry = {"id": calendar_id, "summary": summary or calendar_id, "accessRole": access_role,
+                     "selected": True}
+            self._touch(entry)
+            self._calendar_list(email)[calendar_id] = entry
+
+    def remove_calendar(self, email, calendar_id):
+        """購読解除（差分取得では deleted: true で返る）"""
+        with self.lock:
+            entry = self._calendar_list(email)[calendar_id]
+            entry["deleted"] = True
+            self._touch(entry)
+
+    def _subject(self, headers):
+        authorization = headers.get("Authorization") or headers.get("authorization") or ""
+        token = authorization.removeprefix("Bearer ").strip()
+        if not token:
+            return None
+        subject = self.access_tokens.get(token)
+        if subject is None and not self.config.require_issued_tokens:
+            subject = token
+        return subject
+
+    def refresh(self, form):
+        if form.get("grant_type") != "refresh_token":
+            return 400, {"error": "unsupported_grant_type"}
+        refresh_token = form.get("refresh_token", "")
+        if not refresh_token:
+            return 400, {"error": "invalid_grant"}
+        access_token = "fake-" + secrets.token_urlsafe(24)
+        with self.lock:
+            subject = self.refresh_tokens.setdefault(refresh_token, refresh_token)
+            self.access_tokens[access_token] = subject
+        return 200, {
+            "access_token": access_token,
+            "expires_in": 3600,
+            "token_type": "Bearer",
+            "scope": form.get("scope", "https://www.googleapis.com/auth/calendar"),
+        }
+
+    def _self_signed_certificate(self):
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google")])
+        now = _now()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self._key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=365))
+            .sign(self._key, hashes.SHA256())
+        )
+        return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+    def certs(self):
+        return {self.key_id: self._certificate}
+
+    def issue_id_token(self, email, audience, lifetime=3600, **claims):
+        """このサーバーの証明書で検証できる ID トークン"""
+        now = int(time.time())
+        payload = {
+            "iss": ISSUER,
+            "aud": audience,
+            "sub": str(abs(hash(email))),
+            "email": email,
+            "email_verified": True,
+            "iat": now,
+            "exp": now + lifetime,
+            **claims,
+        }
+        return jwt.encode(self._signer, payload).decode()
+
+    # --- 障害・クォータ ---------------------------------------------------
+
+    def _throttled(self):
+        rate = self.config.quota_per_second
+        if not rate:
+            return False
+        updated, tokens = self._bucket
+        now = time.monotonic()
+        tokens = min(rate, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._bucket = (now, tokens)
+            return True
+        self._bucket = (now, tokens - 1)
+        return False
+
+    def fault(self):
+        """クォータ超過・ランダムなエラーがあればその応答"""
+        with self.lock:
+            if self._throttled():
+                return _error(
+                    self.config.throttle_status,
+                    "rateLimitExceeded",
+                    "Rate Limit Exceeded",
+                    domain="usageLimits",
+                )
+            if self.config.error_rate and self.random.random() < self.config.error_rate:
+                return _error(503, "backendError", "Backend Error")
+        return None
+
+    def delay(self):
+        with self.lock:
+            seconds = self.config.latency
+            if self.config.latency_jitter:
+                seconds += self.random.uniform(0, self.config.latency_jitter)
+        if seconds:
+            time.sleep(seconds)
+
+    def count(self, method, status):
+        with self.lock:
+            entry = self.stats.setdefault(method, {})
+            entry[str(status)] = entry.get(str(status), 0) + 1
+
+    # --- Calendar ---------------------------------------------------------
+
+    def _calendar(self, calendar_id, subject):
+        key = subject if calendar_id == "primary" else calendar_id
+        return self.calendars.setdefault(key, {})
+
+    def _calendar_list(self, subject):
+        entries = self.calendar_lists.get(subject)
+        if entries is None:
+            primary = {"id": subject, "summary": subject, "accessRole": "owner", "primary": True, "selected": True}
+            self._touch(primary)
+            entries = self.calendar_lists[subject] = {subject: primary}
+        return entries
+
+    def _touch(self, event):
+        event["_seq"] = next(self.sequence)
+        self.last_sequence = event["_seq"]
+        event["updated"] = _isoformat(_now())
+        event["etag"] = f'"{event["_seq"]}"'
+
+    @staticmethod
+    def _public(event):
+        return {key: value for key, value in event.items() if not key.startswith("_")}
+
+    def events(self, method, calendar_id, event_id, query, body, subject):
+        with self.lock:
+            calendar = self._calendar(calendar_id, subject)
+            if event_id is None:
+                if method == "POST":
+                    return self._insert(calendar, body)
+                if method == "GET":
+                    return self._list(calendar, query)
+                return _error(405, "methodNotAllowed", "Method Not Allowed")
+
+            event = calendar.get(event_id)
+            if event is None:
+                return _error(404, "notFound", "Not Found")
+            # 削除済みのイベントは update / patch で status を指定した時だけ復活する（Google と同じ）
+            if event["status"] == "cancelled" and method not in ("PUT", "PATCH"):
+                return _error(410, "deleted", "Resource has been deleted")
+            if method == "GET":
+                return 200, self._public(event)
+            if method == "DELETE":
+                event["status"] = "cancelled"
+                self._touch(event)
+                return 204, None
+            if method in ("PUT", "PATCH"):
+                if method == "PUT":
+                    kept = {key: event[key] for key in ("id", "created", "kind", "status")}
+                    event.clear()
+                    event.update(kept)
+                event.update({key: value for key, value in (body or {}).items() if key != "id"})
+                self._touch(event)
+                return 200, self._public(event)
+            return _error(405, "methodNotAllowed", "Method Not Allowed")
+
+    def _insert(self, calendar, body):
+        body = dict(body or {})
+        event_id = body.get("id") or secrets.token_hex(13)
+        if event_id in calendar:
+            return _error(409, "duplicate", "The requested identifier already exists.")
+        event = {
+            **body,
+            "kind": "calendar#event",
+            "id": event_id,
+            "status": "confirmed",
+            "created": _isoformat(_now()),
+        }
+        self._touch(event)
+        calendar[event_id] = event
+        return 200, self._public(event)
+
+    def calendar_list(self, query, subject):
+        with self.lock:
+            return self._list(
+                self._calendar_list(subject), query, kind="calendar#calendarList",
+                hidden=lambda entry: entry.get("deleted", False),
+            )
+
+    def _list(self, calendar, query, kind="calendar#events", hidden=lambda event: event["status"] == "cancelled"):
+        page_size = min(int(query.get("maxResults", 250)), 2500)
+        offset, bound = 0, self.last_sequence
+        if query.get("pageToken"):
+            offset, bound = (int(part) for part in query["pageToken"].split(":"))
+
+        sync_token = query.get("syncToken")
+        if sync_token:
+            if not sync_token.isdigit() or int(sync_token) > self.last_sequence:
+                return _error(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+            since = int(sync_token)
+            candidates = [e for e in calendar.values() if since < e["_seq"] <= bound]
+        else:
+            show_deleted = query.get("showDeleted") in ("true", "True", "1")
+            updated_min = query.get("updatedMin")
+            updated_min = _parse_time(updated_min) if updated_min else None
+            candidates = [
+                e for e in calendar.values()
+                if e["_seq"] <= bound
+                and (show_deleted or not hidden(e))
+                and (updated_min is None or _parse_time(e["updated"]) >= updated_min)
+            ]
+
+        candidates.sort(key=lambda e: e["_seq"])
+        page = candidates[offset:offset + page_size]
+        response = {"kind": kind, "items": [self._public(e) for e in page]}
+        if offset + page_size < len(candidates):
+            response["nextPageToken"] = f"{offset + page_size}:{bound}"
+        else:
+            response["nextSyncToken"] = str(bound)
+        return 200, response
+
+    def freebusy(self, body):
+        time_min = _parse_time(body["timeMin"])
+        time_max = _parse_time(body["timeMax"])
+        calendars = {}
+        with self.lock:
+            for item in body.get("items", []):
+                busy = []
+                for event in self.calendars.get(item["id"], {}).values():
+                    if event["status"] == "cancelled" or "dateTime" not in event.get("start", {}):
+                        continue
+                    start = _parse_time(event["start"]["dateTime"])
+                    end = _parse_time(event["end"]["dateTime"])
+                    if start < time_max and end > time_min:
+                        busy.append((max(start, time_min), min(end, time_max)))
+                calendars[item["id"]] = {
+                    "busy": [{"start": _isoformat(s), "end": _isoformat(e)} for s, e in sorted(busy)]
+                }
+        return 200, {
+            "kind": "calendar#freeBusy",
+            "timeMin": body["timeMin"],
+            "timeMax": body["timeMax"],
+            "calendars": calendars,
+        }
+
+    # --- ルーティング -----------------------------------------------------
+
+    def dispatch(self, method, path, headers, body):
+        """1 件の API 要求を処理して (ステータス, JSON) を返す（バッチ内の要求も同じ経路）"""
+        url = urlsplit(path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        match = EVENT_PATH.match(url.path)
+        if match:
+            name = "events." + {
+                ("POST", False): "insert", ("GET", False): "list", ("GET", True): "get",
+                ("PUT", True): "update", ("PATCH", True): "patch", ("DELETE", True): "delete",
+            }.get((method, bool(match[2])), method.lower())
+        elif url.path == "/calendar/v3/freeBusy" and method == "POST":
+            name = "freebusy.query"
+        elif url.path == CALENDAR_LIST_PATH and method == "GET":
+            name = "calendarList.list"
+        else:
+            self.count("unknown", 404)
+            return _error(404, "notFound", "Not Found")
+
+        subject = self._subject(headers)
+        if subject is None:
+            status, response = _error(401, "authError", "Invalid Credentials")
+        else:
+            status, response = self.fault() or (None, None)
+        if status is None:
+            payload = json.loads(body) if body else None
+            if name == "freebusy.query":
+                status, response = self.freebusy(payload)
+            elif name == "calendarList.list":
+                status, response = self.calendar_list(query, subject)
+            else:
+                status, response = self.events(method, unquote(match[1]), match[2], query, payload, subject)
+        self.count(name, status)
+        return status, response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGoogle/1.0"
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload=None, content_type="application/json; charset=UTF-8", raw=None):
+        data = raw if raw is not None else (b"" if payload is None else json.dumps(payload).encode())
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        body = self._body()
+        path = urlsplit(self.path).path
+        self.fake.delay()
+
+        if path == "/token" and self.command == "POST":
+            form = {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+            status, payload = self.fake.refresh(form)
+            self.fake.count("token", status)
+            return self._send(status, payload)
+        if path == "/oauth2/v1/certs" and self.command == "GET":
+            self.fake.count("certs", 200)
+            return self._send(200, self.fake.certs())
+        if path == "/batch/calendar/v3" and self.command == "POST":
+            return self._batch(body)
+        if path.startswith("/_fake/"):
+            return self._control(path, body)
+
+        status, payload = self.fake.dispatch(self.command, self.path, self.headers, body)
+        self._send(status, payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def _batch(self, body):
+        """multipart/mixed の各パートを個別の要求として処理し、同じ順で返す"""
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        boundary = "batch_" + secrets.token_hex(8)
+        chunks = []
+        for part in message.iter_parts():
+            request = part.get_payload(decode=True) or b""
+            head, _, sub_body = request.replace(b"\r\n", b"\n").partition(b"\n\n")
+            lines = head.decode().split("\n")
+            method, path, _ = lines[0].split(" ", 2)
+            headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+            status, payload = self.fake.dispatch(method, path, headers, sub_body.strip())
+            data = b"" if payload is None else json.dumps(payload).encode()
+            content_id = part["Content-ID"].strip("<>")
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n".encode() + data + b"\r\n"
+            )
+        self.fake.count("batch", 200)
+        raw = b"".join(chunks) + f"--{boundary}--\r\n".encode()
+        self._send(200, content_type=f"multipart/mixed; boundary={boundary}", raw=raw)
+
+    def _control(self, path, body):
+        payload = json.loads(body) if body else {}
+        if path == "/_fake/stats":
+            return self._send(200, {"stats": self.fake.stats, "config": asdict(self.fake.config)})
+        if path == "/_fake/reset":
+            self.fake.reset()
+            return self._send(200, {})
+        if path == "/_fake/config":
+            try:
+                self.fake.configure(**payload)
+            except (TypeError, ValueError) as e:
+                return self._send(400, {"error": str(e)})
+            return self._send(200, asdict(self.fake.config))
+        if path == "/_fake/id_token":
+            token = self.fake.issue_id_token(payload["email"], payload["aud"])
+            return self._send(200, {"id_token": token})
+        self._send(404, {"error": "not found"})
+
+
+class FakeGoogleServer:
+    """バックグラウンドスレッドで動く代替サーバー（url をそのまま GOOGLE_API_ROOT_URL に設定する）"""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None, verbose=False):
+        self.fake = FakeGoogle(config)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
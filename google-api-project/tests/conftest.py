@@ -2,6 +2,8 @@ import pytest
 from unittest.mock import patch
 from api.models import GoogleOAuthToken
 
+pytest_plugins = ["fake_google.pytest_plugin"]
+
 
 @pytest.fixture(scope="session")
 def django_db_setup():
@@ -14,6 +16,18 @@ def django_db_setup():
     }
 
 
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    """Redis を使わずローカルメモリキャッシュでテスト"""
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+
+
 @pytest.fixture
 def mock_google_token():
     """固定のダミートークンを返す"""
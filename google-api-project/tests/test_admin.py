@@ -0,0 +1,116 @@
+import pytest
+from django.contrib.admin import helpers
+from django.urls import reverse
+from api import admin as event_admin
+from api.models import CalendarEvent, GoogleOAuthToken
+from api.tasks import refresh_google_tokens
+
+
+@pytest.fixture
+def staff_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser("ops", "ops@example.com", "pw"))
+    return client
+
+
+def _events(user, count):
+    return CalendarEvent.objects.bulk_create(
+        CalendarEvent(
+            title=f"e{i}", start_time="2025-09-19T10:00:00Z", end_time="2025-09-19T11:00:00Z", created_by=user
+        )
+        for i in range(count)
+    )
+
+
+@pytest.mark.django_db
+def test_changelists_render(staff_client, django_user_model):
+    user = django_user_model.objects.create(username="owner", email="owner@example.com")
+    _events(user, 3)
+    GoogleOAuthToken.objects.create(user=user, access_token="a", refresh_token="r", client_id="c", client_secret="s")
+
+    response = staff_client.get(reverse("admin:api_calendarevent_changelist"), {"sync_state__exact": "pending"})
+    assert response.status_code == 200
+    assert response.context["cl"].result_count == 3
+    response = staff_client.get(reverse("admin:api_googleoauthtoken_changelist"))
+    assert response.status_code == 200
+    assert b'"s"' not in response.content
+
+
+@pytest.mark.django_db
+def test_resync_action_enqueues_batches(staff_client, django_user_model, mocker):
+    mocker.patch("api.admin.RECONCILE_CHUNK_SIZE", 2)
+    delay = mocker.patch("api.admin.resync_calendar_events.delay")
+    user = django_user_model.objects.create(username="owner", email="owner@example.com")
+    events = _events(user, 5)
+
+    staff_client.post(
+        reverse("admin:api_calendarevent_changelist"),
+        {"action": "resync_to_google", helpers.ACTION_CHECKBOX_NAME: [e.pk for e in events], "select_across": "1"},
+    )
+
+    batches = [call.args[0] for call in delay.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert sorted(pk for batch in batches for pk in batch) == sorted(e.pk for e in events)
+
+
+@pytest.mark.django_db
+def test_refresh_google_tokens_saves_new_access_tokens(django_user_model, fake_google, mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    users = [django_user_model.objects.create(username=f"t{i}", email=f"t{i}@example.com") for i in range(2)]
+    GoogleOAuthToken.objects.bulk_create(
+        [
+            GoogleOAuthToken(user=users[0], access_token="old", refresh_token="t0-refresh", client_id="c", client_secret="s"),
+            GoogleOAuthToken(user=users[1], access_token="old", refresh_token="", client_id="c", client_secret="s"),
+        ]
+    )
+
+    result = refresh_google_tokens([user.pk for user in users])
+
+    assert result == {"success": False, "refreshed": 1, "failed": {users[1].pk: "No refresh token"}}
+    tokens = dict(GoogleOAuthToken.objects.values_list("user_id", "access_token"))
+    assert tokens[users[0].pk].startswith("fake-")
+    assert tokens[users[1].pk] == "old"
+    assert event_admin.GoogleOAuthTokenAdmin.has_add_permission(None, None) is False
+
+
+def test_paginator_uses_planner_estimate_on_large_tables(mocker):
+    mocker.patch("api.admin.connections", {"default": mocker.Mock(vendor="postgresql")})
+    queryset = mocker.MagicMock(db="default", ordered=True)
+    queryset.explain.return_value = '{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 2500000}}'
+    assert event_admin.EstimatedCountPaginator(queryset, 100).count == 2500000
+    queryset.__len__.assert_not_called()
+
+    queryset.explain.return_value = '{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 12}}'
+    queryset.__len__.return_value = 10
+    assert event_admin.EstimatedCountPaginator(queryset, 100).count == 10
+
+
+@pytest.mark.django_db
+def test_admin_edit_marks_pending_and_enqueues_resync(
+    staff_client, django_user_model, mocker, django_capture_on_commit_callbacks
+):
+    delay = mocker.patch("api.admin.resync_calendar_events.delay")
+    user = django_user_model.objects.create(username="owner", email="owner@example.com")
+    event = _events(user, 1)[0]
+    CalendarEvent.objects.filter(pk=event.pk).update(sync_state=CalendarEvent.SYNC_SYNCED)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = staff_client.post(
+            reverse("admin:api_calendarevent_change", args=[event.pk]),
+            {
+                "title": "edited",
+                "description": "",
+                "start_time_0": "2025-09-19",
+                "start_time_1": "10:00:00",
+                "end_time_0": "2025-09-19",
+                "end_time_1": "11:00:00",
+                "created_by": user.pk,
+                "participants": "",
+                "calendar": "",
+                "recurrence": "",
+            },
+        )
+
+    assert response.status_code == 302
+    event.refresh_from_db()
+    assert (event.title, event.sync_state) == ("edited", CalendarEvent.SYNC_PENDING)
+    delay.assert_called_once_with([event.pk])
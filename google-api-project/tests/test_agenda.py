@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from api.agenda import agenda
+from api.models import AgendaEntry, CalendarEvent
+
+T0 = datetime(2025, 9, 1, 1, 0, tzinfo=timezone.utc)
+
+
+def d(days, hours=0):
+    return T0 + timedelta(days=days, hours=hours)
+
+
+@pytest.fixture
+def users(django_user_model):
+    return [
+        django_user_model.objects.create(username=f"agenda{i}", email=f"agenda{i}@example.com")
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def client(users, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    mocker.patch("api.views.update_google_calendar_event.delay")
+    api_client = APIClient()
+    api_client.force_authenticate(user=users[0])
+    return api_client
+
+
+def _titles(user, start, end):
+    return [(o["title"], o["start"], o["is_owner"]) for o in agenda(user, start, end)]
+
+
+@pytest.mark.django_db
+def test_agenda_follows_create_update_and_participants(client, users):
+    owner, guest, other = users
+    response = client.post("/api/events/", {
+        "title": "kickoff",
+        "start_time": d(1).isoformat(),
+        "end_time": d(1, 1).isoformat(),
+        "participants": [guest.id],
+    }, format="json")
+    event_id = response.data["id"]
+
+    assert _titles(owner, d(0), d(7)) == [("kickoff", d(1), True)]
+    assert _titles(guest, d(0), d(7)) == [("kickoff", d(1), False)]
+    assert _titles(other, d(0), d(7)) == []
+    response = client.get("/api/events/agenda/", {"start": d(0).isoformat(), "end": d(7).isoformat()})
+    assert [o["id"] for o in response.data["occurrences"]] == [event_id]
+
+    client.patch(f"/api/events/{event_id}/", {"title": "moved", "start_time": d(2).isoformat(),
+                                              "end_time": d(2, 1).isoformat()}, format="json")
+    assert _titles(guest, d(0), d(7)) == [("moved", d(2), False)]
+
+    event = CalendarEvent.objects.get(pk=event_id)
+    event.participants.set([other.id])
+    other.events_participating.add(event)
+    assert _titles(guest, d(0), d(7)) == []
+    assert _titles(other, d(0), d(7)) == [("moved", d(2), False)]
+
+    event.participants.clear()
+    assert AgendaEntry.objects.filter(event_id=event_id).count() == 1
+
+
+@pytest.mark.django_db
+def test_agenda_reads_without_joins(users):
+    owner = users[0]
+    CalendarEvent.objects.create(title="a", start_time=d(1), end_time=d(1, 1), created_by=owner)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert len(agenda(owner, d(0), d(2))) == 1
+    assert len(queries) == 1
+    assert "JOIN" not in queries[0]["sql"].upper()
+
+
+@pytest.mark.django_db
+def test_agenda_includes_long_and_recurring_events(users):
+    owner = users[0]
+    CalendarEvent.objects.create(title="trip", start_time=d(0), end_time=d(10), created_by=owner)
+    CalendarEvent.objects.create(
+        title="daily", start_time=d(0, 2), end_time=d(0, 3), created_by=owner, recurrence="RRULE:FREQ=DAILY"
+    )
+    CalendarEvent.objects.create(title="past", start_time=d(3), end_time=d(3, 1), created_by=owner)
+
+    assert _titles(owner, d(5), d(6)) == [("trip", d(0), True), ("daily", d(5, 2), True)]
+
+
+@pytest.mark.django_db
+def test_agenda_rows_removed_on_delete(users):
+    owner, guest, _ = users
+    events = [
+        CalendarEvent.objects.create(title=f"e{i}", start_time=d(i), end_time=d(i, 1), created_by=owner)
+        for i in range(3)
+    ]
+    for event in events:
+        event.participants.add(guest)
+
+    events[0].delete()
+    assert AgendaEntry.objects.filter(event_id=events[0].pk).count() == 0
+    CalendarEvent.objects.filter(pk__in=[e.pk for e in events[1:]]).delete()
+    assert not AgendaEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rebuild_agenda_command_restores_rows(users):
+    owner, guest, _ = users
+    event = CalendarEvent.objects.create(title="x", start_time=d(1), end_time=d(1, 1), created_by=owner)
+    event.participants.add(guest)
+    expected = set(AgendaEntry.objects.values_list("user_id", "event_id", "is_owner"))
+    AgendaEntry.objects.all().delete()
+    AgendaEntry.objects.create(user=guest, event_id=event.pk + 100, title="stale", start_time=d(0), end_time=d(0, 1))
+
+    call_command("rebuild_agenda")
+
+    assert set(AgendaEntry.objects.values_list("user_id", "event_id", "is_owner")) == expected
@@ -0,0 +1,92 @@
+import pytest
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from api.authentication import (
+    CachedJWTAuthentication,
+    CachedRefreshToken,
+    is_blacklisted,
+    warm_blacklist_cache,
+)
+from api.tasks import purge_expired_tokens
+
+
+@pytest.mark.django_db
+def test_get_user_is_cached(django_user_model, django_assert_num_queries):
+    user = django_user_model.objects.create(username="cached", email="cached@example.com")
+    token = AccessToken.for_user(user)
+    auth = CachedJWTAuthentication()
+
+    assert auth.get_user(token) == user
+    with django_assert_num_queries(0):
+        assert auth.get_user(token) == user
+
+
+@pytest.mark.django_db
+def test_cached_user_is_invalidated_on_save(django_user_model):
+    user = django_user_model.objects.create(username="changing", email="changing@example.com")
+    token = AccessToken.for_user(user)
+    auth = CachedJWTAuthentication()
+    auth.get_user(token)
+
+    user.email = "changed@example.com"
+    user.save()
+
+    assert auth.get_user(token).email == "changed@example.com"
+
+
+@pytest.mark.django_db
+def test_blacklisted_token_is_rejected_from_cache(django_user_model, django_assert_num_queries):
+    user = django_user_model.objects.create(username="logout", email="logout@example.com")
+    refresh = CachedRefreshToken.for_user(user)
+    CachedRefreshToken(str(refresh)).blacklist()
+
+    with django_assert_num_queries(0):
+        with pytest.raises(TokenError):
+            CachedRefreshToken(str(refresh))
+
+
+@pytest.mark.django_db
+def test_negative_result_is_cached_and_evicted_entries_fall_back_to_db(
+    django_user_model, django_assert_num_queries
+):
+    user = django_user_model.objects.create(username="warm", email="warm@example.com")
+    refresh = CachedRefreshToken.for_user(user)
+    warm_blacklist_cache()
+
+    with django_assert_num_queries(1):
+        assert is_blacklisted(refresh["jti"]) is False
+    with django_assert_num_queries(0):
+        assert is_blacklisted(refresh["jti"]) is False
+
+    # ブラックリスト入りは否定のキャッシュを上書きする
+    CachedRefreshToken(str(refresh)).blacklist()
+    assert is_blacklisted(refresh["jti"]) is True
+
+    # キャッシュから追い出されても DB で確認するので受け付けない
+    cache.delete(f"jwt:blacklist:{refresh['jti']}")
+    with django_assert_num_queries(1):
+        assert is_blacklisted(refresh["jti"]) is True
+
+
+@pytest.mark.django_db
+def test_purge_expired_tokens(django_user_model, mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    user = django_user_model.objects.create(username="purge", email="purge@example.com")
+    now = timezone.now()
+    expired = OutstandingToken.objects.create(
+        user=user, jti="expired", token="x", created_at=now - timedelta(days=2), expires_at=now - timedelta(days=1)
+    )
+    BlacklistedToken.objects.create(token=expired)
+    OutstandingToken.objects.create(
+        user=user, jti="alive", token="y", created_at=now, expires_at=now + timedelta(days=1)
+    )
+
+    result = purge_expired_tokens()
+
+    assert result["purged"] == 1
+    assert list(OutstandingToken.objects.values_list("jti", flat=True)) == ["alive"]
+    assert BlacklistedToken.objects.count() == 0
@@ -0,0 +1,47 @@
+import pytest
+from api.models import CalendarEvent
+from benchmarks.e2e import USER_PREFIX, clean, compare, percentile, seed, summarize
+
+
+def test_summarize_uses_nearest_rank_percentiles():
+    result = summarize([i / 1000 for i in range(100, 0, -1)], 2.0, 1, [3, 4])
+
+    assert percentile(list(range(1, 11)), 95) == 10
+    assert result["p50_ms"] == 50
+    assert result["p95_ms"] == 95
+    assert result["p99_ms"] == 99
+    assert result["throughput_rps"] == 50
+    assert result["queries_per_request"] == 3.5
+
+
+def test_compare_reports_regressions_beyond_tolerance():
+    baseline = {
+        "account": {"errors": 0, "p95_ms": 10, "throughput_rps": 100, "queries_per_request": 2},
+        "sync": {"errors": 0, "p95_ms": 1000, "throughput_rps": 10, "queries_per_request": None},
+    }
+    results = {
+        "account": {"errors": 0, "p95_ms": 11.5, "throughput_rps": 75, "queries_per_request": 3},
+        "sync": {"errors": 0, "p95_ms": 1300, "throughput_rps": 10, "queries_per_request": None},
+    }
+
+    regressions = compare(results, baseline, 0.2)
+
+    assert regressions == [
+        "account: throughput 100/s -> 75/s",
+        "account: queries 2 -> 3",
+        "sync: p95 1000ms -> 1300ms",
+    ]
+    assert compare(baseline, baseline, 0.2) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_seed_and_clean():
+    seed(users=3, events=20, participants=2, seed_value=0)
+
+    events = CalendarEvent.objects.filter(created_by__username__startswith=USER_PREFIX)
+    assert events.count() == 20
+    assert all(event.search_document for event in events.all())
+    assert events.filter(sync_state=CalendarEvent.SYNC_SYNCED).count() == 20
+
+    clean()
+    assert not events.all().exists()
@@ -0,0 +1,234 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from django.db.models import RestrictedError
+from rest_framework.test import APIClient
+from api import calendars
+from api.calendars import refresh_calendar_list
+from api.google_calendar import create_event, delete_events
+from api.models import AgendaEntry, CalendarEvent, GoogleCalendar, GoogleOAuthToken
+from api.tasks import (
+    compare_remote_events,
+    create_google_calendar_event,
+    retry_unsynced_events,
+    update_google_calendar_event,
+)
+
+T0 = datetime(2025, 9, 1, 1, 0, tzinfo=timezone.utc)
+EMAIL = "multi@example.com"
+
+
+@pytest.fixture
+def user(django_user_model, fake_google):
+    user = django_user_model.objects.create(username="multi", email=EMAIL)
+    GoogleOAuthToken.objects.create(
+        user=user, access_token="multi-access", refresh_token="multi-refresh", client_id="c", client_secret="s"
+    )
+    fake_google.add_user(EMAIL, refresh_token="multi-refresh", access_token="multi-access")
+    fake_google.add_calendar(EMAIL, "team-cal", "Team")
+    fake_google.add_calendar(EMAIL, "holidays", "Holidays", access_role="reader")
+    return user
+
+
+def _calendar_ids(rows):
+    return sorted(row.calendar_id for row in rows)
+
+
+@pytest.mark.django_db
+def test_calendar_list_is_cached_and_refreshed_incrementally(user, fake_google):
+    assert _calendar_ids(refresh_calendar_list(user.id)) == [EMAIL, "team-cal"]
+    assert GoogleOAuthToken.objects.get(user=user).calendar_list_sync_token
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    response = client.get("/api/calendars/")
+    assert [c["calendar_id"] for c in response.data] == [EMAIL, "holidays", "team-cal"]
+    assert fake_google.stats["calendarList.list"] == {"200": 1}
+
+    fake_google.remove_calendar(EMAIL, "team-cal")
+    assert _calendar_ids(refresh_calendar_list(user.id)) == [EMAIL]
+    assert GoogleCalendar.objects.get(calendar_id="team-cal").deleted
+
+
+@pytest.mark.django_db
+def test_events_sync_per_calendar_with_own_sync_tokens(user, fake_google, mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    refresh_calendar_list(user.id)
+    team = GoogleCalendar.objects.get(calendar_id="team-cal")
+    google_event_ids = []
+    for calendar in (None, team):
+        event = CalendarEvent.objects.create(
+            title="e", start_time=T0, end_time=T0 + timedelta(hours=1), created_by=user, calendar=calendar
+        )
+        google_event_id = create_event(user, event)["google_event_id"]
+        CalendarEvent.objects.filter(pk=event.pk).update(
+            google_event_id=google_event_id, sync_state=CalendarEvent.SYNC_SYNCED
+        )
+        google_event_ids.append(google_event_id)
+    assert list(fake_google.calendars["team-cal"]) == [google_event_ids[1]]
+
+    assert compare_remote_events(user.id) == {"success": True, "drifted": 0, "failed": {}}
+    tokens = dict(GoogleCalendar.objects.exclude(sync_token="").values_list("calendar_id", "sync_token"))
+
+    # 共有カレンダー側だけが変わる。どちらのカレンダーも自分の sync_token からの差分だけを取得
+    remote = fake_google.calendars["team-cal"][google_event_ids[1]]
+    remote["summary"] = "edited on Google"
+    fake_google._touch(remote)
+    fetch = mocker.spy(calendars, "fetch_calendar_changes")
+    assert compare_remote_events(user.id) == {"success": True, "drifted": 1, "failed": {}}
+    assert sorted(fetch.call_args.args[1]) == sorted(tokens.items())
+    states = dict(CalendarEvent.objects.values_list("google_event_id", "sync_state"))
+    assert states == {
+        google_event_ids[0]: CalendarEvent.SYNC_SYNCED,
+        google_event_ids[1]: CalendarEvent.SYNC_PENDING,
+    }
+
+    # 失効した sync_token はそのカレンダーだけ全件取得し直す
+    GoogleCalendar.objects.filter(pk=team.pk).update(sync_token="999999")
+    assert compare_remote_events(user.id)["success"] is True
+    assert fake_google.stats["events.list"]["410"] == 1
+
+
+@pytest.mark.django_db
+def test_event_calendar_must_be_writable(user, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    refresh_calendar_list(user.id)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    payload = {
+        "title": "x",
+        "start_time": T0.isoformat(),
+        "end_time": (T0 + timedelta(hours=1)).isoformat(),
+        "participants": [],
+    }
+
+    reader = GoogleCalendar.objects.get(calendar_id="holidays")
+    assert client.post("/api/events/", {**payload, "calendar": reader.pk}, format="json").status_code == 400
+
+    team = GoogleCalendar.objects.get(calendar_id="team-cal")
+    response = client.post("/api/events/", {**payload, "calendar": team.pk}, format="json")
+    assert response.status_code == 201
+    assert CalendarEvent.objects.get(pk=response.data["id"]).calendar == team
+
+
+@pytest.mark.django_db
+def test_participants_are_synced_as_attendees(user, fake_google, mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    refresh_calendar_list(user.id)
+    guest, other = (
+        django_user_model.objects.create(username=name, email=f"{name.title()}@Example.com")
+        for name in ("guest", "other")
+    )
+    event = CalendarEvent.objects.create(title="e", start_time=T0, end_time=T0 + timedelta(hours=1), created_by=user)
+    event.participants.add(guest)
+
+    create_google_calendar_event(event.id, user.id)
+    event.refresh_from_db()
+    remote = fake_google.calendars[EMAIL][event.google_event_id]
+    assert remote["attendees"] == [{"email": "guest@example.com"}]
+    assert event.attendees_hash
+
+    # 参加者が変わらない更新では attendees を送らない
+    event.title = "renamed"
+    event.save(update_fields=["title"])
+    remote["attendees"].append({"email": "outsider@example.org"})
+    update_google_calendar_event(event.id, user.id)
+    assert remote["summary"] == "renamed"
+    assert remote["attendees"][-1] == {"email": "outsider@example.org"}
+
+    # Google 側で参加者が入れ替わったら、照合ジョブが一括で取り込む
+    remote["attendees"] = [{"email": "OTHER@example.com"}, {"email": "outsider@example.org"}, {"email": EMAIL}]
+    fake_google._touch(remote)
+    assert compare_remote_events(user.id)["drifted"] == 0
+    event.refresh_from_db()
+    assert list(event.participants.all()) == [other]
+    assert event.sync_state == CalendarEvent.SYNC_SYNCED
+    assert set(AgendaEntry.objects.filter(event_id=event.pk).values_list("user_id", flat=True)) == {user.id, other.id}
+    assert event.external_attendees == [EMAIL, "outsider@example.org"]
+
+    # ローカルで参加者を外しても、ローカルに居ない Google 側の参加者は消さない
+    event.participants.remove(other)
+    update_google_calendar_event(event.id, user.id)
+    assert remote["attendees"] == [{"email": EMAIL}, {"email": "outsider@example.org"}]
+
+
+@pytest.mark.django_db
+def test_changes_are_streamed_page_by_page(user, fake_google):
+    for i in range(6):
+        create_event(user, CalendarEvent.objects.create(
+            title=f"p{i}", start_time=T0 + timedelta(hours=i), end_time=T0 + timedelta(hours=i + 1), created_by=user
+        ))
+
+    messages = list(calendars.fetch_calendar_changes(user, [(EMAIL, "")], 2, page_size=1))
+    assert [(kind, len(value) if kind == "page" else bool(value)) for _, kind, value in messages] == [
+        *[("page", 1)] * 6, ("done", True)
+    ]
+
+    # 読むのをやめたら取得も打ち切る（読まれていないページは数ページ分しか溜めない）
+    changes = calendars.fetch_calendar_changes(user, [(EMAIL, "")], 2, page_size=1)
+    assert next(changes)[1] == "page"
+    changes.close()
+    assert fake_google.stats["events.list"]["200"] < 12
+
+
+@pytest.mark.django_db
+def test_calendar_with_events_cannot_be_deleted(user, django_user_model):
+    refresh_calendar_list(user.id)
+    team = GoogleCalendar.objects.get(calendar_id="team-cal")
+    CalendarEvent.objects.create(
+        title="t", start_time=T0, end_time=T0 + timedelta(hours=1), created_by=user, calendar=team
+    )
+
+    with pytest.raises(RestrictedError):
+        team.delete()
+    # ユーザーの削除ではイベントと一緒に消える
+    user.delete()
+    assert not GoogleCalendar.objects.exists() and not CalendarEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_api_changes_with_participants_end_synced(user, mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mocker.patch("api.views.create_google_calendar_event.delay", side_effect=create_google_calendar_event)
+    mocker.patch("api.views.update_google_calendar_event.delay", side_effect=update_google_calendar_event)
+    guest = django_user_model.objects.create(username="api-guest", email="api-guest@example.com")
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.post(
+        "/api/events/",
+        {
+            "title": "with guest",
+            "start_time": T0.isoformat(),
+            "end_time": (T0 + timedelta(hours=1)).isoformat(),
+            "participants": [guest.pk],
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    event = CalendarEvent.objects.get(pk=response.data["id"])
+    assert event.sync_state == CalendarEvent.SYNC_SYNCED
+
+    assert client.patch(f"/api/events/{event.pk}/", {"participants": []}, format="json").status_code == 200
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_SYNCED
+    assert event.attendees_hash == ""
+
+
+@pytest.mark.django_db
+def test_event_cancelled_on_google_is_restored_by_reconciliation(user, fake_google, mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    event = CalendarEvent.objects.create(title="keep", start_time=T0, end_time=T0 + timedelta(hours=1), created_by=user)
+    create_google_calendar_event(event.id, user.id)
+    event.refresh_from_db()
+    assert compare_remote_events(user.id)["drifted"] == 0
+
+    delete_events(user, [event.google_event_id])
+    assert compare_remote_events(user.id)["drifted"] == 1
+
+    CalendarEvent.objects.filter(pk=event.pk).update(updated_at=datetime.now(timezone.utc) - timedelta(hours=1))
+    assert retry_unsynced_events() == 1
+    assert fake_google.calendars[EMAIL][event.google_event_id]["status"] == "confirmed"
+    # 取り消した後の差分では食い違わない（繰り返し pending に戻らない）
+    assert compare_remote_events(user.id)["drifted"] == 0
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_SYNCED
@@ -0,0 +1,67 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from api.models import CalendarEvent
+from core.db_routers import PrimaryReplicaRouter, replica_reads, is_pinned
+
+pytestmark = pytest.mark.filterwarnings("ignore:Overriding setting DATABASES")
+
+
+@pytest.fixture
+def with_replica(settings):
+    """SQLite 上のレプリカ設定（ルーティング判定のみ確認する）"""
+    settings.DATABASES = {
+        **settings.DATABASES,
+        "replica": {**settings.DATABASES["default"], "TEST": {"MIRROR": "default"}},
+    }
+    settings.REPLICA_STICKY_SECONDS = 5
+
+
+def test_reads_go_to_primary_outside_replica_scope(with_replica):
+    assert PrimaryReplicaRouter().db_for_read(CalendarEvent) == "default"
+
+
+def test_reads_go_to_replica_inside_scope(with_replica):
+    with replica_reads():
+        assert PrimaryReplicaRouter().db_for_read(CalendarEvent) == "replica"
+
+
+def test_reads_stay_on_primary_without_replica():
+    with replica_reads():
+        assert PrimaryReplicaRouter().db_for_read(CalendarEvent) == "default"
+
+
+def test_write_pins_following_reads_to_primary(with_replica):
+    router = PrimaryReplicaRouter()
+    with replica_reads():
+        assert router.db_for_write(CalendarEvent) == "default"
+        assert router.db_for_read(CalendarEvent) == "default"
+    assert not is_pinned()
+
+
+def test_allow_migrate_only_on_primary():
+    router = PrimaryReplicaRouter()
+    assert router.allow_migrate("default", "api") is True
+    assert router.allow_migrate("replica", "api") is False
+
+
+@pytest.mark.django_db
+def test_viewset_write_makes_user_sticky(with_replica, django_user_model, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    user = django_user_model.objects.create(username="sticky", email="sticky@example.com")
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.post(
+        "/api/events/",
+        {
+            "title": "Sticky",
+            "start_time": "2025-09-19T10:00:00Z",
+            "end_time": "2025-09-19T11:00:00Z",
+            "participants": [],
+        },
+        format="json",
+    )
+
+    assert response.status_code == 201
+    assert cache.get(f"db-pin:{user.pk}") == 1
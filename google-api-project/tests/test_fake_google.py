@@ -0,0 +1,144 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from api.google_calendar import (
+    PRIMARY_CALENDAR,
+    _get_service,
+    create_event,
+    delete_events,
+    event_snapshot,
+    fetch_calendar_changes,
+    google_event_id_for,
+    query_freebusy,
+    sync_events,
+    update_event,
+    verify_id_token,
+)
+from api.models import CalendarEvent, GoogleOAuthToken
+
+T0 = datetime(2025, 9, 1, 1, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def user(django_user_model, fake_google):
+    user = django_user_model.objects.create(username="fake", email="fake@example.com")
+    GoogleOAuthToken.objects.create(
+        user=user,
+        access_token="stale-access",
+        refresh_token="refresh-fake",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="client",
+        client_secret="secret",
+    )
+    fake_google.add_user("fake@example.com", refresh_token="refresh-fake", access_token="stale-access")
+    return user
+
+
+def _event(user, title="fake", hours=0):
+    return CalendarEvent.objects.create(
+        title=title,
+        start_time=T0 + timedelta(hours=hours),
+        end_time=T0 + timedelta(hours=hours + 1),
+        created_by=user,
+    )
+
+
+@pytest.mark.django_db
+def test_insert_update_list_and_batch_delete(user, fake_google):
+    event = _event(user)
+    google_event_id = create_event(user, event)["google_event_id"]
+    # 決定的な ID での再送は 409 になり、今回の内容で上書きする
+    event.title = "retried"
+    assert create_event(user, event)["google_event_id"] == google_event_id
+    assert fake_google.stats["events.patch"] == {"200": 1}
+
+    event.google_event_id = google_event_id
+    event.title = "renamed"
+    assert update_event(user, event)["success"]
+
+    changes = list(fetch_calendar_changes(user, [(PRIMARY_CALENDAR, None)], max_workers=1))
+    items = [item for _, kind, page in changes if kind == "page" for item in page]
+    assert changes[-1][1] == "done"
+    assert [(item["id"], item["summary"]) for item in items] == [(google_event_id, "renamed")]
+
+    result = delete_events(user, [google_event_id, "missing"])
+    assert result["success"] and set(result["deleted"]) == {google_event_id, "missing"}
+    assert fake_google.stats["events.delete"] == {"204": 1, "404": 1}
+
+
+@pytest.mark.django_db
+def test_batch_sync_and_freebusy(user):
+    events = [_event(user, f"e{i}", hours=i * 2) for i in range(3)]
+    results = sync_events(user, [event_snapshot(event) for event in events])
+    assert all(result["success"] for result in results.values())
+
+    busy, errors = query_freebusy(user, ["fake@example.com"], T0, T0 + timedelta(days=1))
+    assert errors == {}
+    assert busy["fake@example.com"] == [
+        (T0 + timedelta(hours=i * 2), T0 + timedelta(hours=i * 2 + 1)) for i in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_freebusy_reports_failed_calendars(user, fake_google, mocker):
+    mocker.patch("api.google_calendar.FREEBUSY_CALENDARS_PER_QUERY", 1)
+    fake_google.configure(error_rate=1.0)
+
+    busy, errors = query_freebusy(user, ["a@example.com", "b@example.com"], T0, T0 + timedelta(days=1))
+
+    assert busy == {}
+    assert set(errors) == {"a@example.com", "b@example.com"}
+
+
+@pytest.mark.django_db
+def test_conflicting_insert_revives_cancelled_event(user, fake_google):
+    events = [_event(user, f"e{i}", hours=i * 2) for i in range(2)]
+    for event in events:
+        create_event(user, event)
+    delete_events(user, [google_event_id_for(events[0].pk)])
+    remote = fake_google.calendars["fake@example.com"]
+
+    # status を送らない patch では削除済みのまま
+    _get_service(user).events().patch(
+        calendarId="fake@example.com", eventId=google_event_id_for(events[0].pk), body={"summary": "x"}
+    ).execute()
+    assert remote[google_event_id_for(events[0].pk)]["status"] == "cancelled"
+
+    for event in events:
+        event.title = f"{event.title}-retried"
+    results = sync_events(user, [event_snapshot(event) for event in events])
+
+    assert results == {
+        event.pk: {"success": True, "google_event_id": google_event_id_for(event.pk)} for event in events
+    }
+    assert sorted((item["summary"], item["status"]) for item in remote.values()) == [
+        ("e0-retried", "confirmed"),
+        ("e1-retried", "confirmed"),
+    ]
+
+
+@pytest.mark.django_db
+def test_unissued_token_is_refreshed(user, fake_google):
+    fake_google.configure(require_issued_tokens=True)
+    fake_google.access_tokens.pop("stale-access")
+    assert create_event(user, _event(user))["success"]
+    assert fake_google.stats["token"] == {"200": 1}
+    assert fake_google.stats["events.insert"] == {"401": 1, "200": 1}
+
+
+@pytest.mark.django_db
+def test_quota_and_errors_are_reported(user, fake_google):
+    fake_google.configure(quota_per_second=1)
+    snapshots = [event_snapshot(_event(user, f"q{i}")) for i in range(3)]
+    results = sync_events(user, snapshots)
+    assert [result["success"] for result in results.values()].count(True) == 1
+    assert fake_google.stats["events.insert"]["403"] == 2
+
+    fake_google.configure(quota_per_second=0, error_rate=1.0)
+    assert not create_event(user, _event(user))["success"]
+
+
+def test_id_token_verification(fake_google):
+    token = fake_google.issue_id_token("login@example.com", "client-id")
+    assert verify_id_token(token, "client-id")["email"] == "login@example.com"
+    with pytest.raises(ValueError):
+        verify_id_token(token, "other-client")
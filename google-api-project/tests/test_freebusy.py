@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from rest_framework.test import APIClient
+from api.freebusy import merge_intervals, union_intervals
+from api.models import CalendarEvent
+
+T0 = datetime(2025, 9, 19, 9, 0, tzinfo=timezone.utc)
+
+
+def h(hours):
+    return T0 + timedelta(hours=hours)
+
+
+def test_merge_intervals_joins_overlapping_and_adjacent():
+    intervals = [(h(3), h(4)), (h(0), h(1)), (h(0.5), h(2)), (h(2), h(2.5)), (h(5), h(6))]
+    assert merge_intervals(intervals) == [(h(0), h(2.5)), (h(3), h(4)), (h(5), h(6))]
+
+
+def test_union_intervals_merges_sorted_lists():
+    a = [(h(0), h(1)), (h(4), h(5))]
+    b = [(h(0.5), h(2)), (h(6), h(7))]
+    assert union_intervals([a, b]) == [(h(0), h(2)), (h(4), h(5)), (h(6), h(7))]
+
+
+@pytest.fixture
+def client(django_user_model, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    user = django_user_model.objects.create(username="fb", email="fb@example.com")
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+    api_client.user = user
+    return api_client
+
+
+@pytest.mark.django_db
+def test_freebusy_returns_per_user_and_merged_busy(client, django_user_model):
+    other = django_user_model.objects.create(username="fb2", email="fb2@example.com")
+    CalendarEvent.objects.create(title="mine", start_time=h(0), end_time=h(1), created_by=client.user)
+    shared = CalendarEvent.objects.create(title="shared", start_time=h(0.5), end_time=h(2), created_by=client.user)
+    shared.participants.add(other)
+    CalendarEvent.objects.create(title="outside", start_time=h(30), end_time=h(31), created_by=other)
+
+    response = client.post(
+        "/api/freebusy/",
+        {"users": [client.user.id, other.id], "time_min": h(-1), "time_max": h(10)},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    mine = response.data["calendars"][str(client.user.id)]["busy"]
+    theirs = response.data["calendars"][str(other.id)]["busy"]
+    assert mine == [{"start": h(0), "end": h(2)}]
+    assert theirs == [{"start": h(0.5), "end": h(2)}]
+    assert response.data["busy"] == [{"start": h(0), "end": h(2)}]
+
+
+@pytest.mark.django_db
+def test_freebusy_rejects_inverted_range(client):
+    response = client.post(
+        "/api/freebusy/",
+        {"users": [client.user.id], "time_min": h(2), "time_max": h(1)},
+        format="json",
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_exclusive_event_rejects_overlap(client):
+    CalendarEvent.objects.create(
+        title="focus", start_time=h(0), end_time=h(2), created_by=client.user, is_exclusive=True
+    )
+    payload = {"title": "clash", "start_time": h(1), "end_time": h(3), "participants": []}
+
+    rejected = client.post("/api/events/", {**payload, "is_exclusive": True}, format="json")
+    allowed = client.post("/api/events/", payload, format="json")
+
+    assert rejected.status_code == 400
+    assert allowed.status_code == 201
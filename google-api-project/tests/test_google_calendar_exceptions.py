@@ -2,7 +2,7 @@ import pytest
 from api.google_calendar import (
     get_credentials,
     update_event,
-    delete_event,
+    delete_events,
 )
 from api.models import GoogleOAuthToken, CalendarEvent
 from google.auth.exceptions import RefreshError
@@ -64,40 +64,9 @@ def test_update_event_missing_google_event_id(django_user_model):
 
 
 @pytest.mark.django_db
-def test_delete_event_missing_google_event_id_with_token(django_user_model):
-    """トークン有り + google_event_id 無し"""
-    user = django_user_model.objects.create(username="nogid2", email="nogid2@example.com")
-    GoogleOAuthToken.objects.create(
-        user=user,
-        access_token="dummy",
-        refresh_token="dummy",
-        token_uri="http://dummy",
-        client_id="id",
-        client_secret="secret",
-    )
-    event = CalendarEvent.objects.create(
-        title="No GID Event 2",
-        description="",
-        start_time="2025-09-19T10:00:00Z",
-        end_time="2025-09-19T11:00:00Z",
-        google_event_id=None,
-    )
-    result = delete_event(user, event)
-    assert result["success"] is False
-    assert "No google_event_id" in result["message"]
-
-
-@pytest.mark.django_db
-def test_delete_event_no_token(django_user_model):
-    """トークン無し"""
-    user = django_user_model.objects.create(username="notoken", email="notoken@example.com")
-    event = CalendarEvent.objects.create(
-        title="Event no token",
-        description="",
-        start_time="2025-09-19T10:00:00Z",
-        end_time="2025-09-19T11:00:00Z",
-        google_event_id="dummyid",
-    )
-    result = delete_event(user, event)
+def test_delete_events_no_token(django_user_model):
+    """トークン無しの一括削除"""
+    user = django_user_model.objects.create(username="notoken2", email="notoken2@example.com")
+    result = delete_events(user, ["gid-1", "gid-2"])
     assert result["success"] is False
     assert "No Google token found" in result["message"]
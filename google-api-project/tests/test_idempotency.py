@@ -0,0 +1,83 @@
+import re
+import pytest
+from unittest.mock import MagicMock
+from googleapiclient.errors import HttpError
+from rest_framework.test import APIClient
+from api.google_calendar import create_event, google_event_id_for
+from api.models import CalendarEvent
+
+PAYLOAD = {
+    "title": "Retry me",
+    "description": "",
+    "start_time": "2025-09-19T10:00:00Z",
+    "end_time": "2025-09-19T11:00:00Z",
+    "participants": [],
+}
+
+
+@pytest.fixture
+def client(django_user_model, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    user = django_user_model.objects.create(username="idem", email="idem@example.com")
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+@pytest.mark.django_db
+def test_create_with_same_key_is_replayed(client):
+    first = client.post("/api/events/", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+    second = client.post("/api/events/", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second["Idempotent-Replayed"] == "true"
+    assert second.data["id"] == first.data["id"]
+    assert CalendarEvent.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_with_reused_key_and_different_body_is_rejected(client):
+    client.post("/api/events/", PAYLOAD, format="json", HTTP_IDEMPOTENCY_KEY="key-2")
+    response = client.post(
+        "/api/events/", {**PAYLOAD, "title": "Other"}, format="json", HTTP_IDEMPOTENCY_KEY="key-2"
+    )
+
+    assert response.status_code == 422
+    assert CalendarEvent.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_without_key_is_not_deduplicated(client):
+    client.post("/api/events/", PAYLOAD, format="json")
+    client.post("/api/events/", PAYLOAD, format="json")
+
+    assert CalendarEvent.objects.count() == 2
+
+
+def test_google_event_id_is_deterministic_and_valid():
+    google_event_id = google_event_id_for(42)
+    assert google_event_id == google_event_id_for(42)
+    assert google_event_id != google_event_id_for(43)
+    assert re.fullmatch(r"[a-v0-9]{5,1024}", google_event_id)
+
+
+def test_create_event_overwrites_conflicting_event(mocker):
+    service = MagicMock()
+    service.events().insert().execute.side_effect = HttpError(MagicMock(status=409), b"duplicate")
+    mocker.patch("api.google_calendar._get_service", return_value=service)
+    snapshot = {
+        "id": 7,
+        "title": "Dup",
+        "description": "",
+        "start": "2025-09-19T10:00:00+00:00",
+        "end": "2025-09-19T11:00:00+00:00",
+        "google_event_id": None,
+    }
+
+    result = create_event(1, snapshot)
+
+    assert result == {"success": True, "google_event_id": google_event_id_for(7)}
+    kwargs = service.events().patch.call_args.kwargs
+    assert kwargs["eventId"] == google_event_id_for(7)
+    assert kwargs["body"]["status"] == "confirmed" and kwargs["body"]["summary"] == "Dup"
@@ -0,0 +1,94 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.test import APIClient
+from core.cache import InstrumentedCacheMixin
+from core.instrumentation import PerformanceMiddleware, RequestStats, _stats, google_call
+
+
+@pytest.fixture
+def instrumented(settings):
+    settings.PERF_INSTRUMENTATION = True
+    settings.PERF_SAMPLE_RATE = 1.0
+    settings.METRICS_TOKEN = ""
+    return settings
+
+
+@pytest.fixture
+def client(django_user_model):
+    user = django_user_model.objects.create(username="perf")
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+def test_middleware_is_removed_when_disabled(settings):
+    settings.PERF_INSTRUMENTATION = False
+    with pytest.raises(MiddlewareNotUsed):
+        PerformanceMiddleware(lambda request: None)
+
+
+@pytest.mark.django_db
+def test_server_timing_and_metrics_by_route(instrumented, client):
+    response = client.get("/api/events/")
+    assert response.status_code == 200
+    timing = response["Server-Timing"]
+    assert timing.startswith("total;dur=")
+    assert 'queries"' in timing and "google;dur=0.0" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    body = metrics.content.decode()
+    assert 'http_request_duration_seconds_count{method="GET",route="api/events/",status="200"}' in body
+    assert 'http_request_db_queries_total{route="api/events/"}' in body
+
+
+@pytest.mark.django_db(transaction=True)
+def test_middleware_stays_async_under_asgi(instrumented, django_user_model):
+    async def view(request):
+        await django_user_model.objects.acount()
+        return HttpResponse()
+
+    middleware = PerformanceMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    response = async_to_sync(middleware)(RequestFactory().get("/"))
+    # sync_to_async のスレッドで実行された SQL も計測される
+    assert 'desc="1 queries"' in response["Server-Timing"]
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_are_not_measured(instrumented, client):
+    instrumented.PERF_SAMPLE_RATE = 0.0
+    response = client.get("/api/events/")
+    assert "Server-Timing" not in response
+
+
+@pytest.mark.django_db
+def test_metrics_requires_token_and_enabled(instrumented, client, settings):
+    settings.METRICS_TOKEN = "secret"
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code == 200
+    settings.PERF_INSTRUMENTATION = False
+    assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code == 404
+
+
+def test_cache_hits_and_google_calls_are_counted():
+    class Cache(InstrumentedCacheMixin, LocMemCache):
+        pass
+
+    cache = Cache("perf-test", {})
+    cache.set("a", 1)
+    stats = RequestStats()
+    token = _stats.set(stats)
+    try:
+        assert cache.get("a") == 1
+        assert cache.get("missing", "default") == "default"
+        assert cache.get_many(["a", "b"]) == {"a": 1}
+        with google_call():
+            pass
+    finally:
+        _stats.reset(token)
+    assert (stats.cache_hits, stats.cache_misses, stats.google_calls) == (2, 2, 1)
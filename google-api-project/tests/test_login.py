@@ -0,0 +1,147 @@
+import kombu.exceptions
+import pytest
+import redis
+from django.db import DatabaseError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from api import google_calendar
+from api.authentication import CachedRefreshToken
+from api.login import OUTSTANDING_TOKEN_KEY, outstanding_tokens
+from api.models import GoogleOAuthToken
+from api.tasks import drain_outstanding_tokens
+
+
+class FakeRedis:
+    """OutstandingTokenBuffer が使うリスト操作だけを持つ Redis の代わり"""
+
+    def __init__(self):
+        self.lists = {}
+        self.keys = {}
+        self.down = False
+
+    def rpush(self, key, value):
+        if self.down:
+            raise redis.ConnectionError("down")
+        self.lists.setdefault(key, []).append(value.encode())
+        return len(self.lists[key])
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:None if end == -1 else end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def expire(self, key, seconds):
+        return key in self.keys
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+
+@pytest.fixture
+def login(fake_google, settings, mocker):
+    """fake_google の ID トークンでログインする（OutstandingToken は 2 件毎にまとめて投入）"""
+    settings.GOOGLE_OAUTH2_CLIENT_ID = settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = "client-id"
+    settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = "secret"
+    settings.OUTSTANDING_TOKEN_BATCH_SIZE = 2
+    google_calendar._certs_cache.clear()
+    delay = mocker.patch("api.tasks.drain_outstanding_tokens.delay")
+    # タスクを直接呼ぶテストでテスト用 DB 接続が閉じられないようにする
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mocker.patch.object(outstanding_tokens, "_client", FakeRedis())
+    client = APIClient()
+
+    def post(email, path="/api/auth/google/jwt/", **data):
+        token = fake_google.issue_id_token(email, "client-id")
+        return client.post(path, {"id_token": token, **data}, format="json")
+
+    post.delay = delay
+    post.redis = outstanding_tokens._client
+    return post
+
+
+@pytest.mark.django_db
+def test_returning_login_is_single_query(login, django_user_model, django_assert_num_queries, fake_google):
+    first = login("login@example.com")
+    assert first.status_code == 200
+
+    with django_assert_num_queries(1):
+        second = login("login@example.com")
+
+    assert second.json()["user"]["id"] == first.json()["user"]["id"]
+    assert django_user_model.objects.filter(username="login@example.com").count() == 1
+    # 証明書は 1 度だけ取得
+    assert fake_google.stats["certs"] == {"200": 1}
+
+
+@pytest.mark.django_db
+def test_outstanding_tokens_are_written_in_batches(login):
+    login("a@example.com")
+    assert not login.delay.called
+    login("b@example.com")
+
+    assert login.delay.call_count == 1
+    assert not OutstandingToken.objects.exists()
+
+    assert drain_outstanding_tokens() == {"success": True, "recorded": 2}
+    assert OutstandingToken.objects.filter(user__username__in=["a@example.com", "b@example.com"]).count() == 2
+    assert login.redis.lrange(OUTSTANDING_TOKEN_KEY, 0, -1) == []
+
+
+@pytest.mark.django_db
+def test_outstanding_tokens_survive_publish_and_write_failures(login, mocker):
+    login.delay.side_effect = kombu.exceptions.OperationalError("broker down")
+    assert login("a@example.com").status_code == 200
+    assert login("b@example.com").status_code == 200
+
+    # 書き込みに失敗した行はリストに残り、次の実行で書き込まれる
+    bulk_create = mocker.patch("api.login.OutstandingToken.objects.bulk_create", side_effect=DatabaseError("down"))
+    with pytest.raises(DatabaseError):
+        drain_outstanding_tokens()
+    mocker.stop(bulk_create)
+    assert len(login.redis.lrange(OUTSTANDING_TOKEN_KEY, 0, -1)) == 2
+    assert drain_outstanding_tokens()["recorded"] == 2
+    assert OutstandingToken.objects.count() == 2
+
+    # Redis に届かなければその場で INSERT する
+    login.redis.down = True
+    assert login("c@example.com").status_code == 200
+    assert OutstandingToken.objects.filter(user__username="c@example.com").exists()
+
+
+@pytest.mark.django_db
+def test_logout_before_flush_still_blacklists(login):
+    response = login("early@example.com")
+    refresh = CachedRefreshToken(response.json()["refresh"])
+    refresh.blacklist()
+
+    drain_outstanding_tokens()
+
+    assert OutstandingToken.objects.count() == 1
+    assert BlacklistedToken.objects.filter(token__jti=refresh["jti"]).exists()
+
+
+@pytest.mark.django_db
+def test_unchanged_google_token_is_not_rewritten(login, mocker):
+    data = {"access_token": "access", "refresh_token": "refresh", "expires_in": 3599}
+    login("token@example.com", path="/api/auth/google/login/", **data)
+    token = GoogleOAuthToken.objects.get(user__username="token@example.com")
+    assert (token.access_token, token.expires_in) == ("access", 3599)
+
+    upsert = mocker.spy(GoogleOAuthToken.objects, "bulk_create")
+    login("token@example.com", path="/api/auth/google/login/", **data)
+    assert not upsert.called
+
+    # 別経路で変更されたら次のログインで書き直す
+    token.access_token = "changed"
+    token.save()
+    login("token@example.com", path="/api/auth/google/login/", **data)
+    assert upsert.call_count == 1
+    token.refresh_from_db()
+    assert token.access_token == "access"
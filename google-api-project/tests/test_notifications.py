@@ -0,0 +1,194 @@
+import asyncio
+import json
+import pytest
+import redis
+from datetime import timedelta
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from api import notifications
+from api.authentication import mark_blacklisted
+from api.models import CalendarEvent
+from api.tasks import create_google_calendar_event
+
+
+class FakePubSub:
+    """SUBSCRIBE したチャンネル宛ての PUBLISH だけを返す Redis 購読接続の代わり"""
+
+    def __init__(self):
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, name):
+        self.channels.add(name)
+
+    async def unsubscribe(self, name):
+        self.channels.discard(name)
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def publish(self, name, data):
+        if name in self.channels:
+            self.messages.put_nowait({"type": "message", "channel": name.encode(), "data": data})
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def published(mocker):
+    """発行された (user_id, payload) を記録"""
+    messages = []
+    client = mocker.Mock()
+    client.pipeline.return_value.publish.side_effect = lambda name, data: messages.append(
+        (int(name[len(notifications.CHANNEL_PREFIX):]), json.loads(data))
+    )
+    mocker.patch("api.notifications._get_client", return_value=client)
+    mocker.patch("api.notifications._down_until", 0.0)
+    return messages
+
+
+@pytest.mark.django_db
+def test_sync_task_notifies_owner(mocker, django_user_model, published):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mocker.patch("api.tasks.create_event", return_value={"success": True, "google_event_id": "g-1"})
+    user = django_user_model.objects.create(username="live", email="live@example.com")
+    event = CalendarEvent.objects.create(
+        title="e", start_time="2025-09-19T10:00:00Z", end_time="2025-09-19T11:00:00Z", created_by=user
+    )
+
+    create_google_calendar_event(event.id, user.id)
+
+    assert published == [
+        (user.id, {"type": "sync", "id": event.id, "success": True, "google_event_id": "g-1", "message": ""})
+    ]
+
+
+@pytest.mark.django_db
+def test_event_changes_notify_owner_and_participants(
+    django_user_model, published, django_capture_on_commit_callbacks
+):
+    owner, guest = (
+        django_user_model.objects.create(username=f"u{i}", email=f"u{i}@example.com") for i in range(2)
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        event = CalendarEvent.objects.create(
+            title="e", start_time="2025-09-19T10:00:00Z", end_time="2025-09-19T11:00:00Z", created_by=owner
+        )
+        event.participants.add(guest)
+    published.clear()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CalendarEvent.objects.filter(pk=event.pk).delete()
+
+    assert sorted(published, key=lambda m: m[0]) == [
+        (owner.id, {"type": "event", "id": event.id, "action": "deleted"}),
+        (guest.id, {"type": "event", "id": event.id, "action": "deleted"}),
+    ]
+
+
+def test_publish_backs_off_while_redis_is_down(mocker, settings):
+    client = mocker.Mock()
+    client.pipeline.return_value.execute.side_effect = redis.ConnectionError
+    get_client = mocker.patch("api.notifications._get_client", return_value=client)
+    mocker.patch("api.notifications._down_until", 0.0)
+
+    assert notifications.publish([(1, {"type": "sync"})]) == 0
+    assert notifications.publish([(1, {"type": "sync"})]) == 0
+    assert get_client.call_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_delivers_only_own_notifications(mocker, django_user_model, settings):
+    settings.LIVE_HEARTBEAT_SECONDS = 0.05
+    user = django_user_model.objects.create(username="stream", email="stream@example.com")
+    token = str(AccessToken.for_user(user))
+
+    @async_to_sync
+    async def run():
+        pubsub = FakePubSub()
+        hub = notifications.Hub(pubsub)
+        mocker.patch("api.notifications.get_hub", return_value=hub)
+        client = AsyncClient()
+
+        assert (await client.get("/api/events/stream/")).status_code == 401
+
+        response = await client.get("/api/events/stream/", headers={"Authorization": f"Bearer {token}"})
+        assert response["Content-Type"] == "text/event-stream"
+        chunks = aiter(response.streaming_content)
+        assert await anext(chunks) == b"retry: 3000\n\n"
+        assert await anext(chunks) == b": ping\n\n"
+
+        pubsub.publish(notifications.channel(user.pk + 1), b'{"type": "event"}')
+        pubsub.publish(notifications.channel(user.pk), b'{"type": "sync"}')
+        assert await anext(chunks) == b'data: {"type": "sync"}\n\n'
+
+        # 切断時は ASGI ハンドラーが送信中のタスクをキャンセルする
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert pubsub.channels == set()
+        await hub.close()
+
+    run()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_ticket_is_single_use_and_stream_closes_when_token_is_revoked(mocker, django_user_model, settings):
+    settings.LIVE_HEARTBEAT_SECONDS = 0.05
+    user = django_user_model.objects.create(username="ticket", email="ticket@example.com")
+    token = AccessToken.for_user(user)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    ticket = api.post("/api/events/stream/ticket/").data["ticket"]
+
+    @async_to_sync
+    async def run():
+        hub = notifications.Hub(FakePubSub())
+        mocker.patch("api.notifications.get_hub", return_value=hub)
+        client = AsyncClient()
+
+        # アクセストークンは URL では受け付けない
+        assert (await client.get("/api/events/stream/", {"token": str(token)})).status_code == 401
+        response = await client.get("/api/events/stream/", {"ticket": ticket})
+        assert response.status_code == 200
+        assert (await client.get("/api/events/stream/", {"ticket": ticket})).status_code == 401
+
+        chunks = aiter(response.streaming_content)
+        assert await anext(chunks) == b"retry: 3000\n\n"
+        assert await anext(chunks) == b": ping\n\n"
+        await sync_to_async(mark_blacklisted)(token["jti"], datetime_from_epoch(token["exp"]))
+        assert await anext(chunks) == notifications.EXPIRED.encode()
+        with pytest.raises(StopAsyncIteration):
+            await anext(chunks)
+        await hub.close()
+
+    run()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_closes_when_token_expires(mocker, django_user_model, settings):
+    settings.LIVE_HEARTBEAT_SECONDS = 60
+    user = django_user_model.objects.create(username="expiring", email="expiring@example.com")
+    token = AccessToken.for_user(user)
+    token.set_exp(lifetime=timedelta(seconds=1))
+
+    @async_to_sync
+    async def run():
+        hub = notifications.Hub(FakePubSub())
+        mocker.patch("api.notifications.get_hub", return_value=hub)
+        response = await AsyncClient().get("/api/events/stream/", headers={"Authorization": f"Bearer {token}"})
+        chunks = aiter(response.streaming_content)
+        assert await anext(chunks) == b"retry: 3000\n\n"
+        assert await asyncio.wait_for(anext(chunks), 5) == notifications.EXPIRED.encode()
+        await hub.close()
+
+    run()
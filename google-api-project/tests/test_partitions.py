@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from api.models import CalendarEvent
+from api.partitions import add_months, month_floor, partition_month, partition_name
+
+JST = timezone(timedelta(hours=9))
+
+
+def test_month_floor_uses_utc_boundaries():
+    # JST の 10/1 00:30 は UTC では 9 月
+    assert month_floor(datetime(2025, 10, 1, 0, 30, tzinfo=JST)) == datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+
+def test_add_months_crosses_year():
+    month = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    assert add_months(month, 2) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month, -11) == datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+
+def test_partition_name_round_trip():
+    month = datetime(2025, 9, 1, tzinfo=timezone.utc)
+    assert partition_name(month) == "api_calendarevent_p202509"
+    assert partition_month(partition_name(month)) == month
+    assert partition_month("api_calendarevent_default") is None
+
+
+@pytest.mark.django_db
+def test_partition_commands_require_postgres():
+    with pytest.raises(CommandError):
+        call_command("partition_calendar_events")
+    with pytest.raises(CommandError):
+        call_command("ensure_event_partitions")
+
+
+@pytest.mark.django_db
+def test_overlapping_bounds_start_time_for_pruning():
+    start = datetime(2025, 9, 1, tzinfo=timezone.utc)
+    query = str(CalendarEvent.objects.overlapping(start, start + timedelta(days=1)).query)
+    assert '"start_time" <' in query
+
+
+class RecordingCursor:
+    """実行した SQL を記録し、継続中の系列の有無と Google 削除対象を返すカーソル"""
+
+    def __init__(self, active, rows):
+        self.active, self.rows, self.sql = active, rows, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql, params=None):
+        self.sql.append(sql)
+        self.last = sql
+
+    def fetchone(self):
+        name = self.last.split("FROM ")[1].split()[0]
+        return (1,) if name in self.active else None
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows, []
+        return rows
+
+
+@pytest.mark.django_db
+def test_archive_keeps_partitions_with_active_series_and_cleans_up_drops(mocker):
+    from api import partitions
+
+    months = [datetime(2024, m, 1, tzinfo=timezone.utc) for m in (1, 2)]
+    mocker.patch("api.partitions.is_partitioned", return_value=True)
+    mocker.patch("api.partitions.list_partitions", return_value=[(partition_name(m), m) for m in months])
+    enqueue = mocker.patch("api.tasks.enqueue_google_deletes")
+    cursor = RecordingCursor(active={partition_name(months[0])}, rows=[(1, "g-1", None)])
+    connection = mocker.Mock(alias="default", cursor=lambda: cursor)
+    connection.ops.quote_name = lambda name: f'"{name}"'
+
+    archived, kept = partitions.archive_partitions(connection, datetime(2025, 1, 1, tzinfo=timezone.utc), drop=True)
+
+    assert kept == [partition_name(months[0])]
+    assert archived == [partition_name(months[1])]
+    dropped = partition_name(months[1])
+    assert not any("DETACH PARTITION " + partition_name(months[0]) in sql for sql in cursor.sql)
+    assert any(sql.startswith("DELETE FROM api_agendaentry") and dropped in sql for sql in cursor.sql)
+    enqueue.assert_called_once_with([(1, "g-1", None)])
+    assert cursor.sql[-1] == f"DROP TABLE {dropped}"
@@ -0,0 +1,125 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from api.models import CalendarEvent, GoogleCalendar
+from api.tasks import (
+    create_google_calendar_event,
+    retry_unsynced_events,
+    compare_remote_events,
+)
+
+
+def _event(user, **kwargs):
+    defaults = {
+        "title": "Sync Event",
+        "description": "",
+        "start_time": "2025-09-19T10:00:00Z",
+        "end_time": "2025-09-19T11:00:00Z",
+        "created_by": user,
+    }
+    defaults.update(kwargs)
+    return CalendarEvent.objects.create(**defaults)
+
+
+def _age(*events):
+    """照合ジョブの猶予期間より前に更新されたことにする"""
+    CalendarEvent.objects.filter(pk__in=[e.pk for e in events]).update(
+        updated_at=timezone.now() - timedelta(hours=1)
+    )
+
+
+@pytest.mark.django_db
+def test_create_task_marks_event_synced(mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    user = django_user_model.objects.create(username="syncer", email="syncer@example.com")
+    event = _event(user)
+    mocker.patch("api.tasks.create_event", return_value={"success": True, "google_event_id": "gid-1"})
+
+    create_google_calendar_event(event.id, user.id)
+
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_SYNCED
+    assert event.google_event_id == "gid-1"
+    assert event.last_synced_at is not None
+
+
+@pytest.mark.django_db
+def test_create_task_failure_marks_event_failed(mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    user = django_user_model.objects.create(username="failer", email="failer@example.com")
+    event = _event(user)
+    mocker.patch("api.tasks.create_event", return_value={"success": False, "message": "quota"})
+
+    create_google_calendar_event(event.id, user.id)
+    create_google_calendar_event(event.id, user.id)
+
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_FAILED
+    assert event.sync_attempts == 2
+    assert event.sync_error == "quota"
+
+
+@pytest.mark.django_db
+def test_retry_unsynced_events_batches_per_user(mocker, django_user_model):
+    alice = django_user_model.objects.create(username="alice", email="alice@example.com")
+    bob = django_user_model.objects.create(username="bob", email="bob@example.com")
+    failed = _event(alice, sync_state=CalendarEvent.SYNC_FAILED, sync_attempts=1)
+    pending = _event(alice)
+    other = _event(bob, google_event_id="gid-bob")
+    synced = _event(alice, sync_state=CalendarEvent.SYNC_SYNCED, google_event_id="gid-ok")
+    fresh = _event(bob)
+    _age(failed, pending, other, synced)
+
+    def fake_sync(user_id, snapshots):
+        return {s["id"]: {"success": True, "google_event_id": f"gid-{s['id']}"} for s in snapshots}
+
+    mock_sync = mocker.patch("api.tasks.sync_events", side_effect=fake_sync)
+
+    assert retry_unsynced_events() == 3
+
+    assert mock_sync.call_count == 2
+    calls = {c.args[0]: sorted(s["id"] for s in c.args[1]) for c in mock_sync.call_args_list}
+    assert calls == {alice.id: sorted([failed.id, pending.id]), bob.id: [other.id]}
+    failed.refresh_from_db()
+    fresh.refresh_from_db()
+    assert failed.sync_state == CalendarEvent.SYNC_SYNCED
+    assert failed.sync_attempts == 0
+    assert fresh.sync_state == CalendarEvent.SYNC_PENDING
+
+
+@pytest.mark.django_db
+def test_compare_remote_events_marks_drifted(mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    user = django_user_model.objects.create(username="drift", email="drift@example.com")
+    same = _event(user, title="Same", google_event_id="gid-same", sync_state=CalendarEvent.SYNC_SYNCED)
+    changed = _event(user, title="Local", google_event_id="gid-changed", sync_state=CalendarEvent.SYNC_SYNCED)
+    times = {
+        "start": {"dateTime": "2025-09-19T10:00:00+00:00"},
+        "end": {"dateTime": "2025-09-19T11:00:00+00:00"},
+    }
+    items = [
+        {"id": "gid-same", "summary": "Same", **times},
+        {"id": "gid-changed", "summary": "Remote", **times},
+        {"id": "gid-unknown", "summary": "x", **times},
+    ]
+    primary = GoogleCalendar.objects.create(
+        user=user, calendar_id="drift@example.com", access_role="owner", is_primary=True
+    )
+    mocker.patch("api.tasks.refresh_calendar_list", return_value=[primary])
+    # 変更はページ毎に届く
+    changes = [
+        (primary.calendar_id, "page", items[:2]),
+        (primary.calendar_id, "page", items[2:]),
+        (primary.calendar_id, "done", "next"),
+    ]
+    mocker.patch("api.calendars.fetch_calendar_changes", return_value=(change for change in changes))
+
+    result = compare_remote_events(user.id)
+
+    assert result == {"success": True, "drifted": 1, "failed": {}}
+    primary.refresh_from_db()
+    assert primary.sync_token == "next"
+    same.refresh_from_db()
+    changed.refresh_from_db()
+    assert same.sync_state == CalendarEvent.SYNC_SYNCED
+    assert changed.sync_state == CalendarEvent.SYNC_PENDING
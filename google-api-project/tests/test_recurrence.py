@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from rest_framework.test import APIClient
+from api.freebusy import busy_intervals_by_user
+from api.google_calendar import _event_body, event_snapshot
+from api.models import CalendarEvent
+from api.recurrence import iter_occurrences, normalize_recurrence, series_end
+
+T0 = datetime(2025, 9, 1, 1, 0, tzinfo=timezone.utc)  # 10:00 JST（月曜）
+
+
+def d(days, hours=0):
+    return T0 + timedelta(days=days, hours=hours)
+
+
+def test_normalize_recurrence_adds_rrule_prefix():
+    assert normalize_recurrence("FREQ=DAILY;COUNT=3\r\n\nEXDATE:20250902T100000") == (
+        "RRULE:FREQ=DAILY;COUNT=3\nEXDATE:20250902T100000"
+    )
+
+
+def test_iter_occurrences_only_expands_window():
+    occurrences = list(iter_occurrences(T0, d(0, 1), "RRULE:FREQ=DAILY", d(10), d(13)))
+    assert occurrences == [(d(10), d(10, 1)), (d(11), d(11, 1)), (d(12), d(12, 1))]
+
+
+def test_iter_occurrences_includes_occurrence_overlapping_window_start():
+    occurrences = list(iter_occurrences(T0, d(0, 2), "RRULE:FREQ=DAILY", d(3, 1), d(3, 5)))
+    assert occurrences == [(d(3), d(3, 2))]
+
+
+def test_series_end_bounded_and_unbounded():
+    assert series_end(T0, d(0, 1), "RRULE:FREQ=WEEKLY;COUNT=3") == d(14, 1)
+    assert series_end(T0, d(0, 1), "RRULE:FREQ=WEEKLY") is None
+
+
+@pytest.fixture
+def client(django_user_model, mocker):
+    mocker.patch("api.views.create_google_calendar_event.delay")
+    user = django_user_model.objects.create(username="rr", email="rr@example.com")
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+    api_client.user = user
+    return api_client
+
+
+@pytest.mark.django_db
+def test_create_recurring_event_sets_recurrence_end(client):
+    response = client.post("/api/events/", {
+        "title": "daily",
+        "start_time": T0.isoformat(),
+        "end_time": d(0, 1).isoformat(),
+        "participants": [],
+        "recurrence": "FREQ=DAILY;COUNT=5",
+    }, format="json")
+    assert response.status_code == 201
+    assert response.data["recurrence"] == "RRULE:FREQ=DAILY;COUNT=5"
+    event = CalendarEvent.objects.get()
+    assert event.recurrence_end == d(4, 1)
+
+
+@pytest.mark.django_db
+def test_invalid_or_exclusive_recurrence_is_rejected(client):
+    base = {
+        "title": "bad",
+        "start_time": T0.isoformat(),
+        "end_time": d(0, 1).isoformat(),
+        "participants": [],
+    }
+    response = client.post("/api/events/", {**base, "recurrence": "FREQ=SOMETIMES"}, format="json")
+    assert response.status_code == 400
+    response = client.post(
+        "/api/events/", {**base, "recurrence": "FREQ=DAILY", "is_exclusive": True}, format="json"
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_occurrences_endpoint_expands_within_window(client):
+    CalendarEvent.objects.create(
+        title="weekly", start_time=T0, end_time=d(0, 1), created_by=client.user,
+        recurrence="RRULE:FREQ=WEEKLY",
+    )
+    CalendarEvent.objects.create(
+        title="ended", start_time=T0, end_time=d(0, 1), created_by=client.user,
+        recurrence="RRULE:FREQ=DAILY;COUNT=2",
+    )
+    CalendarEvent.objects.create(title="single", start_time=d(15), end_time=d(15, 1), created_by=client.user)
+
+    response = client.get("/api/events/occurrences/", {
+        "start": d(14).isoformat(), "end": d(22).isoformat(),
+    })
+    assert response.status_code == 200
+    titles = [(o["title"], o["start"]) for o in response.data["occurrences"]]
+    assert titles == [("weekly", d(14)), ("single", d(15)), ("weekly", d(21))]
+
+
+@pytest.mark.django_db
+def test_busy_intervals_include_recurring_occurrences(django_user_model, settings):
+    settings.RECURRENCE_CACHE_TIMEOUT = 3600
+    user = django_user_model.objects.create(username="rb")
+    CalendarEvent.objects.create(
+        title="daily", start_time=T0, end_time=d(0, 1), created_by=user,
+        recurrence="RRULE:FREQ=DAILY",
+    )
+    busy = busy_intervals_by_user([user.id], d(40), d(42, 2))
+    assert busy[user.id] == [(d(40), d(40, 1)), (d(41), d(41, 1)), (d(42), d(42, 1))]
+    # キャッシュ経由でも同じ結果
+    assert busy_intervals_by_user([user.id], d(40), d(42, 2)) == busy
+
+
+def test_event_body_sends_recurrence_with_timezone(settings):
+    event = CalendarEvent(
+        id=1, title="t", description="", start_time=T0, end_time=d(0, 1),
+        recurrence="RRULE:FREQ=DAILY\nEXDATE:20250902T100000",
+    )
+    body = _event_body(event_snapshot(event))
+    assert body["recurrence"] == ["RRULE:FREQ=DAILY", "EXDATE:20250902T100000"]
+    assert body["start"]["timeZone"] == settings.TIME_ZONE
+
+
+@pytest.mark.django_db
+def test_floating_exdate_is_applied_in_event_timezone(client):
+    response = client.post("/api/events/", {
+        "title": "daily",
+        "start_time": T0.isoformat(),
+        "end_time": d(0, 1).isoformat(),
+        "participants": [],
+        "recurrence": "FREQ=DAILY;COUNT=3\nEXDATE:20250902T100000",
+    }, format="json")
+    assert response.status_code == 201
+    assert CalendarEvent.objects.get().recurrence_end == d(2, 1)
+
+    response = client.get("/api/events/occurrences/", {"start": T0.isoformat(), "end": d(7).isoformat()})
+    assert response.status_code == 200
+    assert [o["start"] for o in response.data["occurrences"]] == [T0, d(2)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("recurrence", [
+    "FREQ=SECONDLY;COUNT=10",
+    "FREQ=MINUTELY",
+    "FREQ=DAILY;COUNT=10000000",
+    "FREQ=DAILY;UNTIL=21000101T000000Z",
+    "FREQ=HOURLY;UNTIL=20300101T000000Z",
+    "FREQ=DAILY\\nEXDATE;TZID=Nowhere/Unknown:20250902T100000",
+])
+def test_expensive_or_broken_recurrence_is_rejected(client, recurrence):
+    response = client.post("/api/events/", {
+        "title": "heavy",
+        "start_time": T0.isoformat(),
+        "end_time": d(0, 1).isoformat(),
+        "participants": [],
+        "recurrence": recurrence.replace("\\n", "\n"),
+    }, format="json")
+    assert response.status_code == 400
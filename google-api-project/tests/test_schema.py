@@ -0,0 +1,63 @@
+import json
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from core import schema
+
+
+@pytest.fixture
+def schema_path(settings, tmp_path, mocker):
+    settings.OPENAPI_SCHEMA_PATH = str(tmp_path / "openapi.json")
+    mocker.patch("core.schema._artifact", None)
+    return tmp_path / "openapi.json"
+
+
+@pytest.mark.django_db
+def test_prebuilt_schema_is_served_with_etag(client, schema_path, mocker):
+    call_command("build_openapi_schema")
+    call_command("build_openapi_schema", "--check")
+    generate = mocker.spy(schema, "generate_schema")
+
+    response = client.get("/api/schema/", {"format": "json"})
+    assert response.status_code == 200
+    assert response.content == schema_path.read_bytes()
+    assert "/api/events/" in json.loads(response.content)["paths"]
+    assert response["Cache-Control"] == schema.REVALIDATE_CACHE_CONTROL
+    etag = response["ETag"]
+
+    assert client.get("/api/schema/", {"format": "json"}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    yaml = client.get("/api/schema/")
+    assert yaml.status_code == 200 and yaml.content.startswith(b"openapi:")
+    assert yaml["ETag"] != etag
+
+    pinned = client.get(response["Content-Location"], {"format": "json"})
+    assert pinned.status_code == 200
+    assert pinned["Cache-Control"] == schema.IMMUTABLE_CACHE_CONTROL
+    assert client.get("/api/schema/0000000000000000/").status_code == 404
+    generate.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_regenerated_schema_is_picked_up(client, schema_path):
+    call_command("build_openapi_schema")
+    first = client.get("/api/schema/", {"format": "json"})["ETag"]
+
+    stale = json.loads(schema_path.read_bytes())
+    stale["info"]["title"] = "stale"
+    schema_path.write_text(json.dumps(stale))
+    with pytest.raises(CommandError):
+        call_command("build_openapi_schema", "--check")
+    assert client.get("/api/schema/", {"format": "json"})["ETag"] != first
+
+    call_command("build_openapi_schema")
+    assert client.get("/api/schema/", {"format": "json"})["ETag"] == first
+
+
+@pytest.mark.django_db
+def test_missing_schema_is_generated_once_per_process(client, schema_path, mocker):
+    generate = mocker.spy(schema, "generate_schema")
+
+    assert client.get("/api/schema/", {"format": "json"}).status_code == 200
+    assert client.get("/api/schema/").status_code == 200
+    assert generate.call_count == 1
+    assert not schema_path.exists()
@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from rest_framework.test import APIClient
+from api.models import CalendarEvent
+from api.search import _tsquery, build_search_document, search_terms
+
+T0 = datetime(2025, 9, 1, 1, 0, tzinfo=timezone.utc)
+
+
+def test_build_search_document_uses_bigrams_for_japanese():
+    assert build_search_document("定例会議", "Sprint ﾚﾋﾞｭｰ") == "定例 例会 会議 sprint レビ ビュ ュー"
+
+
+def test_search_terms_prefix_for_words_and_single_characters():
+    terms = search_terms("会議 Sprint 室 会議")
+    assert terms == [("会議", False), ("sprint", True), ("室", True)]
+    assert _tsquery(terms) == "'会議' & 'sprint':* & '室':*"
+
+
+@pytest.fixture
+def client(django_user_model):
+    user = django_user_model.objects.create(username="se", email="se@example.com")
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+    api_client.user = user
+    return api_client
+
+
+def _event(user, title, days=0, description=""):
+    return CalendarEvent.objects.create(
+        title=title,
+        description=description,
+        start_time=T0 + timedelta(days=days),
+        end_time=T0 + timedelta(days=days, hours=1),
+        created_by=user,
+    )
+
+
+@pytest.mark.django_db
+def test_search_matches_own_and_participating_events(client, django_user_model):
+    other = django_user_model.objects.create(username="se2")
+    _event(client.user, "定例会議", days=1)
+    _event(client.user, "ランチ", description="会議室の前で集合", days=2)
+    shared = _event(other, "全体会議", days=3)
+    shared.participants.add(client.user)
+    _event(other, "他人の会議", days=4)
+
+    response = client.get("/api/events/search/", {"q": "会議"})
+    assert response.status_code == 200
+    assert response.data["count"] == 3
+    assert {event["title"] for event in response.data["results"]} == {"定例会議", "ランチ", "全体会議"}
+
+
+@pytest.mark.django_db
+def test_search_is_paginated(client):
+    for day in range(25):
+        _event(client.user, f"Weekly sync {day}", days=day)
+    response = client.get("/api/events/search/", {"q": "week", "page_size": 10, "page": 3})
+    assert response.data["count"] == 25
+    assert len(response.data["results"]) == 5
+
+
+@pytest.mark.django_db
+def test_search_requires_query(client):
+    assert client.get("/api/events/search/").status_code == 400
+    response = client.get("/api/events/search/", {"q": "！？"})
+    assert response.status_code == 200
+    assert response.data["count"] == 0
+
+
+@pytest.mark.django_db
+def test_bulk_writes_keep_search_document(client):
+    created = CalendarEvent.objects.bulk_create(
+        CalendarEvent(title=f"朝会 {i}", start_time=T0, end_time=T0 + timedelta(hours=1), created_by=client.user)
+        for i in range(2)
+    )
+    for event in created:
+        event.description = "Retro"
+    CalendarEvent.objects.bulk_update(created, ["description"])
+    event = CalendarEvent.objects.get(pk=created[0].pk)
+    event.title = "夕会"
+    event.save(update_fields=["title"])
+
+    assert sorted(CalendarEvent.objects.values_list("search_document", flat=True)) == ["夕会 retro", "朝会 1 retro"]
+    with pytest.raises(TypeError):
+        CalendarEvent.objects.filter(pk=event.pk).update(title="x")
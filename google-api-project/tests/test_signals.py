@@ -1,10 +1,11 @@
 import pytest
 from django.contrib.auth.models import User
 from api.models import CalendarEvent
+from api.views import CalendarEventViewSet
 
 @pytest.mark.django_db
-def test_event_deleted_triggers_task(mocker):
-    """google_event_id と created_by がある場合にタスクが呼ばれる"""
+def test_event_deleted_triggers_task(mocker, django_capture_on_commit_callbacks):
+    """google_event_id と created_by がある場合にコミット後タスクが呼ばれる"""
     user = User.objects.create(username="deleter", email="deleter@example.com")
     event = CalendarEvent.objects.create(
         title="To be deleted",
@@ -14,10 +15,110 @@ def test_event_deleted_triggers_task(mocker):
         google_event_id="gid-123",
         created_by=user,
     )
-    event_id = event.id  # 削除前に保持しておく
 
-    mock_task = mocker.patch("api.signals.delete_google_calendar_event.delay")
+    mock_task = mocker.patch("api.tasks.delete_google_calendar_events.delay")
 
-    event.delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        event.delete()
 
-    mock_task.assert_called_once_with(event_id, user.id)
+    mock_task.assert_called_once_with(user.id, ["gid-123"])
+
+
+@pytest.mark.django_db
+def test_event_deleted_without_google_id_does_not_trigger_task(mocker, django_capture_on_commit_callbacks):
+    """google_event_id が無い場合はタスクを投入しない"""
+    user = User.objects.create(username="nogid", email="nogid@example.com")
+    event = CalendarEvent.objects.create(
+        title="Local only",
+        start_time="2025-09-19T10:00:00Z",
+        end_time="2025-09-19T11:00:00Z",
+        created_by=user,
+    )
+
+    mock_task = mocker.patch("api.tasks.delete_google_calendar_events.delay")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        event.delete()
+
+    mock_task.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_perform_destroy_dispatches_once(mocker, django_capture_on_commit_callbacks):
+    """ViewSet 経由の削除でもタスクは 1 回だけ投入される"""
+    user = User.objects.create(username="viewer", email="viewer@example.com")
+    event = CalendarEvent.objects.create(
+        title="Destroy me",
+        start_time="2025-09-19T10:00:00Z",
+        end_time="2025-09-19T11:00:00Z",
+        google_event_id="gid-view",
+        created_by=user,
+    )
+
+    mock_task = mocker.patch("api.tasks.delete_google_calendar_events.delay")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CalendarEventViewSet().perform_destroy(event)
+
+    mock_task.assert_called_once_with(user.id, ["gid-view"])
+
+
+@pytest.mark.django_db
+def test_queryset_delete_batches_per_user(mocker, django_capture_on_commit_callbacks):
+    """QuerySet の一括削除はユーザー単位でまとめて投入される"""
+    alice = User.objects.create(username="alice", email="alice@example.com")
+    bob = User.objects.create(username="bob", email="bob@example.com")
+    for i, user in enumerate([alice, alice, alice, bob]):
+        CalendarEvent.objects.create(
+            title=f"Bulk {i}",
+            start_time="2025-09-19T10:00:00Z",
+            end_time="2025-09-19T11:00:00Z",
+            google_event_id=f"gid-{i}",
+            created_by=user,
+        )
+
+    mock_task = mocker.patch("api.tasks.delete_google_calendar_events.delay")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CalendarEvent.objects.all().delete()
+
+    assert mock_task.call_count == 2
+    mock_task.assert_any_call(alice.id, ["gid-0", "gid-1", "gid-2"])
+    mock_task.assert_any_call(bob.id, ["gid-3"])
+
+
+@pytest.mark.django_db
+def test_participant_change_during_sync_is_not_marked_synced():
+    """同期中に参加者が変わったら、古いスナップショットの結果で synced に戻さない（ユーザー側の clear も含む）"""
+    from api.google_calendar import attendees_hash, event_snapshot
+    from api.tasks import _mark_synced
+
+    owner = User.objects.create(username="owner", email="owner@example.com")
+    guest = User.objects.create(username="guest", email="guest@example.com")
+    event = CalendarEvent.objects.create(
+        title="Meeting", start_time="2025-09-19T10:00:00Z", end_time="2025-09-19T11:00:00Z", created_by=owner
+    )
+    event.refresh_from_db()
+    snapshot = event_snapshot(event)
+
+    event.participants.add(guest)
+    _mark_synced(snapshot, google_event_id="gid-1")
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_PENDING
+    assert event.attendees_hash == ""
+
+    _mark_synced(event_snapshot(event))
+    event.refresh_from_db()
+    assert (event.sync_state, event.attendees_hash) == (CalendarEvent.SYNC_SYNCED, attendees_hash([guest.email]))
+
+    # 照合ジョブが Google 側の参加者を取り込んでいたら、そのハッシュを上書きしない
+    stale = event_snapshot(event)
+    CalendarEvent.objects.filter(pk=event.pk).update(attendees_hash="from-google")
+    _mark_synced(stale)
+    event.refresh_from_db()
+    assert (event.sync_state, event.attendees_hash) == (CalendarEvent.SYNC_PENDING, "from-google")
+
+    CalendarEvent.objects.filter(pk=event.pk).update(sync_state=CalendarEvent.SYNC_SYNCED)
+    guest.events_participating.clear()
+    event.refresh_from_db()
+    assert event.sync_state == CalendarEvent.SYNC_PENDING
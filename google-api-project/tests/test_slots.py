@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+from datetime import datetime, time, timedelta, timezone
+from rest_framework.test import APIClient
+from api.models import CalendarEvent
+from api.slots import find_slots, free_gaps, to_epoch_arrays, working_windows
+
+MONDAY = datetime(2025, 9, 22, tzinfo=timezone.utc)
+
+
+def at(day, hour, minute=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_free_gaps_handles_unsorted_overlaps():
+    starts = np.array([50, 10, 20], dtype=np.int64)
+    ends = np.array([60, 30, 25], dtype=np.int64)
+    gap_starts, gap_ends = free_gaps(starts, ends, 0, 100)
+    assert list(zip(gap_starts, gap_ends)) == [(0, 10), (30, 50), (60, 100)]
+
+
+def test_find_slots_skips_busy_and_off_hours():
+    work_starts, work_ends = working_windows(at(0, 0), at(3, 0), "UTC", time(9), time(12), range(5))
+    busy_starts, busy_ends = to_epoch_arrays([(at(0, 9), at(0, 10)), (at(0, 9, 30), at(0, 11, 10))])
+
+    slots = find_slots(busy_starts, busy_ends, work_starts, work_ends, 1800, 3, 900)
+
+    assert slots == [
+        (at(0, 11, 15), at(0, 11, 45)),
+        (at(0, 11, 30), at(0, 12)),
+        (at(1, 9), at(1, 9, 30)),
+    ]
+
+
+def test_find_slots_skips_weekends():
+    saturday = at(5, 0)
+    work_starts, work_ends = working_windows(saturday, saturday + timedelta(days=3), "UTC", time(9), time(10), range(5))
+    empty = np.empty(0, dtype=np.int64)
+
+    slots = find_slots(empty, empty, work_starts, work_ends, 3600, 1, 900)
+
+    assert slots == [(at(7, 9), at(7, 10))]
+
+
+@pytest.mark.django_db
+def test_find_slots_api(django_user_model):
+    alice = django_user_model.objects.create(username="alice", email="alice@example.com")
+    bob = django_user_model.objects.create(username="bob", email="bob@example.com")
+    CalendarEvent.objects.create(title="a", start_time=at(0, 9), end_time=at(0, 10), created_by=alice)
+    meeting = CalendarEvent.objects.create(title="b", start_time=at(0, 10), end_time=at(0, 11), created_by=alice)
+    meeting.participants.add(bob)
+    client = APIClient()
+    client.force_authenticate(user=alice)
+
+    response = client.post(
+        "/api/freebusy/slots/",
+        {
+            "users": [alice.id, bob.id],
+            "duration_minutes": 60,
+            "time_min": at(0, 0),
+            "time_max": at(1, 0),
+            "timezone": "UTC",
+            "limit": 2,
+            "granularity_minutes": 30,
+        },
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert response.data["slots"] == [
+        {"start": at(0, 11), "end": at(0, 12)},
+        {"start": at(0, 11, 30), "end": at(0, 12, 30)},
+    ]
+
+
+@pytest.mark.django_db
+def test_find_slots_excludes_users_without_google_busy(django_user_model, mocker):
+    alice = django_user_model.objects.create(username="alice", email="alice@example.com")
+    bob = django_user_model.objects.create(username="bob", email="bob@example.com")
+    CalendarEvent.objects.create(title="b", start_time=at(0, 9), end_time=at(0, 10), created_by=bob)
+    query = mocker.patch(
+        "api.views.query_freebusy",
+        return_value=({"alice@example.com": [(at(0, 9), at(0, 11))]}, {"bob@example.com": "notFound"}),
+    )
+    client = APIClient()
+    client.force_authenticate(user=alice)
+    payload = {
+        "users": [alice.id, bob.id],
+        "duration_minutes": 60,
+        "time_min": at(0, 0),
+        "time_max": at(1, 0),
+        "timezone": "UTC",
+        "limit": 1,
+        "include_google": True,
+    }
+
+    response = client.post("/api/freebusy/slots/", payload, format="json")
+
+    assert response.status_code == 200
+    assert response.data == {"slots": [{"start": at(0, 11), "end": at(0, 12)}], "unavailable": [bob.id]}
+
+    query.return_value = ({}, {"alice@example.com": "notFound", "bob@example.com": "notFound"})
+    response = client.post("/api/freebusy/slots/", payload, format="json")
+    assert response.status_code == 502
+    assert response.data["unavailable"] == [alice.id, bob.id]
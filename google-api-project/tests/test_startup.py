@@ -0,0 +1,42 @@
+import os
+import pytest
+import subprocess
+import sys
+from django.conf import settings
+from api import google_calendar
+from core.celery import preload_worker
+
+
+def test_web_process_does_not_import_google_clients():
+    code = (
+        "import sys, django; django.setup(); import core.urls; "
+        "print(sorted(m for m in ('googleapiclient', 'google.oauth2') if m in sys.modules))"
+    )
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings")}
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True, env=env,
+        cwd=settings.BASE_DIR,
+    ).stdout
+
+    assert output.strip().splitlines()[-1] == "[]"
+
+
+@pytest.mark.django_db
+def test_preload_worker_parses_discovery_document(mocker, settings):
+    settings.WORKER_PRELOAD = True
+    close_all = mocker.patch("django.db.connections.close_all")
+    google_calendar._discovery_document.cache_clear()
+
+    preload_worker()
+
+    assert google_calendar._discovery_document.cache_info().currsize == 1
+    close_all.assert_called_once()
+
+
+def test_preload_worker_can_be_disabled(settings):
+    settings.WORKER_PRELOAD = False
+    google_calendar._discovery_document.cache_clear()
+
+    preload_worker()
+
+    assert google_calendar._discovery_document.cache_info().currsize == 0
@@ -0,0 +1,54 @@
+import pytest
+from types import SimpleNamespace
+from googleapiclient.errors import HttpError
+from prometheus_client import REGISTRY
+from api.google_calendar import _execute
+from core import task_instrumentation as ti
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def _task(name="api.tasks.bench", **request):
+    return SimpleNamespace(name=name, request=SimpleNamespace(retries=0, **request))
+
+
+def test_publish_stamps_enqueue_time():
+    headers = {}
+    ti.stamp_enqueued_at(headers=headers)
+    assert headers[ti.ENQUEUED_AT_HEADER] > 0
+
+
+def test_task_signals_record_wait_runtime_and_results(mocker):
+    mocker.patch("core.task_instrumentation.time.time", return_value=1002.0)
+    task = _task(enqueued_at=1000.0)
+    before = _value("celery_task_queue_wait_seconds_sum", task=task.name)
+    runs = _value("celery_task_runtime_seconds_count", task=task.name)
+
+    ti.start_task(task_id="t1", task=task)
+    ti.finish_task(task_id="t1", task=task)
+    ti.count_success(sender=task, result={"success": False, "message": "x"})
+    ti.count_failure(sender=task, task_id="t1", exception=ValueError("boom"))
+    ti.count_retry(sender=task)
+
+    assert _value("celery_task_queue_wait_seconds_sum", task=task.name) - before == pytest.approx(2.0)
+    assert _value("celery_task_runtime_seconds_count", task=task.name) - runs == 1
+    assert _value("celery_task_results_total", task=task.name, outcome="failure", error="reported") >= 1
+    assert _value("celery_task_results_total", task=task.name, outcome="failure", error="ValueError") >= 1
+    assert _value("celery_task_retries_total", task=task.name) >= 1
+    assert "t1" not in ti._running
+
+
+def test_execute_records_latency_per_method_and_status(mocker):
+    ok = mocker.Mock()
+    ok.execute.return_value = {"id": "x"}
+    before = _value("google_api_request_seconds_count", method="insert", outcome="ok")
+    assert _execute(ok, "insert", 1) == {"id": "x"}
+    assert _value("google_api_request_seconds_count", method="insert", outcome="ok") - before == 1
+
+    failing = mocker.Mock()
+    failing.execute.side_effect = HttpError(SimpleNamespace(status=404, reason="Not Found"), b"")
+    with pytest.raises(HttpError):
+        _execute(failing, "delete", 1)
+    assert _value("google_api_request_seconds_count", method="delete", outcome="404") >= 1
@@ -1,6 +1,11 @@
 import pytest
-from api.models import CalendarEvent
-from api.tasks import create_google_calendar_event, update_google_calendar_event, delete_google_calendar_event
+from api.models import CalendarEvent, SyncFailure
+from api.tasks import (
+    create_google_calendar_event,
+    update_google_calendar_event,
+    delete_google_calendar_event,
+    delete_google_calendar_events,
+)
 
 
 @pytest.mark.django_db
@@ -65,12 +70,13 @@ def test_delete_google_calendar_event_success(mocker, django_user_model):
         end_time="2025-09-19T11:00:00Z",
     )
 
-    mock_delete = mocker.patch("api.tasks.delete_event")
-    mock_delete.return_value = {"success": True}
+    mock_delete = mocker.patch("api.tasks.delete_events")
+    mock_delete.return_value = {"success": True, "deleted": ["google-event-123"], "failed": {}}
 
     result = delete_google_calendar_event(event.id, user.id, "google-event-123")
 
     assert result["success"] is True
+    mock_delete.assert_called_once_with(user.id, ["google-event-123"], None)
 
 
 @pytest.mark.django_db
@@ -88,3 +94,63 @@ def test_delete_google_calendar_event_missing_google_event_id(mocker, django_use
 
     assert result["success"] is False
     assert f"Event {event.id} has No google_event_id" in result["message"]
+
+
+@pytest.mark.django_db
+def test_delete_google_calendar_events_deduplicates(mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mock_delete = mocker.patch("api.tasks.delete_events")
+    mock_delete.return_value = {"success": True, "deleted": ["gid-1", "gid-2"], "failed": {}}
+
+    delete_google_calendar_events(1, ["gid-1", "gid-2"])
+    result = delete_google_calendar_events(1, ["gid-1", "gid-2"])
+
+    mock_delete.assert_called_once_with(1, ["gid-1", "gid-2"], None)
+    assert result["skipped"] == ["gid-1", "gid-2"]
+
+
+@pytest.mark.django_db
+def test_delete_google_calendar_events_releases_failed_keys(mocker):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mock_delete = mocker.patch("api.tasks.delete_events")
+    mock_delete.return_value = {"success": False, "deleted": ["gid-1"], "failed": {"gid-2": "boom"}}
+
+    delete_google_calendar_events(1, ["gid-1", "gid-2"])
+    delete_google_calendar_events(1, ["gid-1", "gid-2"])
+
+    assert mock_delete.call_args_list[1].args == (1, ["gid-2"], None)
+
+
+@pytest.mark.django_db
+def test_create_google_calendar_event_with_snapshot_skips_fetch(mocker, django_assert_num_queries):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    mock_create = mocker.patch("api.tasks.create_event")
+    mock_create.return_value = {"success": True, "google_event_id": "google-event-123"}
+    snapshot = {
+        "id": 1,
+        "title": "Snapshot Event",
+        "description": "",
+        "start": "2025-09-19T10:00:00+00:00",
+        "end": "2025-09-19T11:00:00+00:00",
+        "google_event_id": None,
+    }
+
+    # スナップショットがあれば取得は不要で、結果の書き戻し UPDATE のみ
+    with django_assert_num_queries(1):
+        result = create_google_calendar_event(1, 42, snapshot)
+
+    assert result["success"] is True
+    mock_create.assert_called_once_with(42, snapshot)
+
+
+@pytest.mark.django_db
+def test_create_google_calendar_event_failure_is_recorded(mocker, django_user_model):
+    mocker.patch("api.tasks.close_old_connections", autospec=True)
+    user = django_user_model.objects.create(username="failer", email="failer@example.com")
+
+    create_google_calendar_event(event_id=999, user_id=user.id)
+
+    failure = SyncFailure.objects.get()
+    assert failure.operation == SyncFailure.OPERATION_CREATE
+    assert failure.event_id == 999
+    assert "Event 999 not found" in failure.message